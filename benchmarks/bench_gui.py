@@ -0,0 +1,350 @@
+"""
+Benchmark building, painting, recoloring, zooming, and panning a wafer map.
+
+Builds a :class:`wafer_map.wm_core.WaferMapPanel` for synthetic wafers of
+increasing die count, in each render mode, and times:
+
++ ``construct``: the whole ``WaferMapPanel.__init__``.
++ ``_init_ui`` and ``draw_die``: the parts of it that create the canvas and
+  the die.
++ ``first_paint``: ``_on_first_paint``, which zooms to fit and draws the
+  canvas for the first time.
++ ``recolor``: ``on_color_change``, once per color change.
++ ``zoom``: one step of a scripted zoom in and back out.
++ ``pan``: one step of a scripted pan around the wafer.
+
+The results are written as a JSON report (see :mod:`benchutils`)::
+
+    python benchmarks/bench_gui.py -o gui.json
+    python benchmarks/bench_gui.py --sizes 1000 10000 --compare gui.json
+
+Needs wxPython and a display. If ``DISPLAY`` isn't set, a virtual X server
+is started with ``Xvfb``, which must be installed. Times include drawing to
+the screen, so they depend on the display as well as the machine.
+"""
+import argparse
+import contextlib
+import functools
+import math
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+import benchutils
+import numpy as np
+
+SIZES = (1000, 10000, 100000)
+RENDER_MODES = ("rectangle", "batched", "raster")
+SEED = 42
+FRAME_SIZE = (1000, 800)
+
+# The scripted interactions. Zooming uses the same factor as one wheel click.
+ZOOM_STEPS = [1.1] * 10 + [1 / 1.1] * 10
+PAN_STEPS = [(40, 0)] * 5 + [(0, 40)] * 5 + [(-40, 0)] * 5 + [(0, -40)] * 5
+RECOLOR_STEPS = 5
+
+# How long to wait for the first paint event.
+PAINT_TIMEOUT = 30
+
+# The panel methods timed while building the panel.
+_TIMED_METHODS = ("_init_ui", "draw_die", "_on_first_paint")
+
+
+def synthetic_wafer(die, seed=SEED):
+    """
+    Make a 150 mm wafer with about ``die`` die.
+
+    Returns
+    -------
+    wafer_info : :class:`wafer_map.wm_info.WaferInfo`
+    xyd : list of 3-tuples
+        Random normal values with a radial trend.
+    """
+    from wafer_map import wm_info
+
+    # Only die that are fully on the wafer are kept, so start a bit smaller.
+    size = math.sqrt(math.pi * 75**2 / die) * 0.95
+    side = int(math.ceil(150 / size)) + 2
+    center = side / 2
+    grid_x, grid_y = np.meshgrid(np.arange(side), np.arange(side))
+    grid_x, grid_y = grid_x.ravel(), grid_y.ravel()
+    # The farthest corner of each die from the wafer center.
+    far_x = (np.abs(grid_x - center) + 0.5) * size
+    far_y = (np.abs(grid_y - center) + 0.5) * size
+    radius = np.hypot(far_x, far_y)
+    keep = radius <= 75
+    grid_x, grid_y, radius = grid_x[keep], grid_y[keep], radius[keep]
+
+    rng = np.random.default_rng(seed)
+    values = radius / 75 + rng.normal(scale=0.1, size=radius.size)
+    wafer_info = wm_info.WaferInfo((size, size), (center, center), dia=150)
+    xyd = list(zip(grid_x.tolist(), grid_y.tolist(), values.tolist()))
+    return (wafer_info, xyd)
+
+
+@contextlib.contextmanager
+def virtual_display(size=(1280, 1024)):
+    """
+    Run a virtual X server if there is no display.
+
+    Does nothing if ``DISPLAY`` is set, or on Windows and macOS.
+
+    Yields
+    ------
+    display : str
+        The display that is used, or ``None`` if it's not X.
+    """
+    if sys.platform in ("win32", "darwin"):
+        yield None
+        return
+    if os.environ.get("DISPLAY"):
+        yield os.environ["DISPLAY"]
+        return
+
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        raise RuntimeError("DISPLAY is not set and Xvfb is not installed")
+
+    # Xvfb picks a free display and writes its number to the pipe.
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen(
+        [
+            xvfb,
+            "-displayfd",
+            str(write_fd),
+            "-screen",
+            "0",
+            "{}x{}x24".format(*size),
+            "-nolisten",
+            "tcp",
+        ],
+        pass_fds=(write_fd,),
+        stderr=subprocess.DEVNULL,
+    )
+    os.close(write_fd)
+    try:
+        with os.fdopen(read_fd) as pipe:
+            number = pipe.readline().strip()
+        if not number:
+            raise RuntimeError("Xvfb didn't start")
+        display = ":" + number
+        os.environ["DISPLAY"] = display
+        try:
+            yield display
+        finally:
+            del os.environ["DISPLAY"]
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextlib.contextmanager
+def timed_methods(cls, names, timings):
+    """
+    Add the time spent in each method of ``cls`` to ``timings[name]``.
+
+    The methods are patched on the class, so instances made in the ``with``
+    block are timed even if they bind the methods as event handlers.
+    """
+    originals = {_name: cls.__dict__[_name] for _name in names}
+
+    def timed(name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                timings[name] = timings.get(name, 0) + elapsed
+
+        return wrapper
+
+    for name, method in originals.items():
+        setattr(cls, name, timed(name, method))
+    try:
+        yield timings
+    finally:
+        for name, method in originals.items():
+            setattr(cls, name, method)
+
+
+def run_once(wafer_info, xyd, render_mode):
+    """
+    Build a panel in a frame, paint it, and run the scripted interactions.
+
+    Returns
+    -------
+    timings : dict
+        ``{stage: [seconds, ...]}``. Each interaction has one time per
+        step.
+    """
+    import wx
+
+    from wafer_map import wm_core
+
+    app = wx.GetApp()
+    timings = {}
+    with timed_methods(wm_core.WaferMapPanel, _TIMED_METHODS, timings):
+        frame = wx.Frame(None, size=FRAME_SIZE)
+        start = time.perf_counter()
+        panel = wm_core.WaferMapPanel(frame, xyd, wafer_info, render_mode=render_mode)
+        timings["construct"] = time.perf_counter() - start
+        frame.Show()
+        frame.Layout()
+
+        deadline = time.monotonic() + PAINT_TIMEOUT
+        while "_on_first_paint" not in timings:
+            if time.monotonic() > deadline:
+                frame.Destroy()
+                raise RuntimeError("the panel was never painted")
+            app.Yield(True)
+            time.sleep(0.001)
+
+    result = {_name: [_time] for _name, _time in timings.items()}
+    result["first_paint"] = result.pop("_on_first_paint")
+
+    def steps(name, func, args):
+        result[name] = []
+        for arg in args:
+            start = time.perf_counter()
+            func(arg)
+            panel.canvas.Update()
+            result[name].append(time.perf_counter() - start)
+            app.Yield(True)
+
+    colors = [(255, _i * 255 // RECOLOR_STEPS, 0) for _i in range(RECOLOR_STEPS)]
+    steps(
+        "recolor",
+        lambda color: panel.on_color_change({"high": color, "low": None}),
+        colors,
+    )
+    steps("zoom", panel.zoom, ZOOM_STEPS)
+    steps("pan", panel.pan, PAN_STEPS)
+
+    frame.Destroy()
+    app.Yield(True)
+    return result
+
+
+def run(sizes, render_modes, repeat=3, progress=None):
+    """
+    Run the benchmarks.
+
+    Parameters
+    ----------
+    sizes : list of int
+        About how many die the wafers have.
+    render_modes : list of str
+        The :class:`wafer_map.wm_constants.RenderMode` values to run.
+    repeat : int, optional
+        How many panels to build for each size and render mode. Defaults to
+        `3`.
+    progress : callable, optional
+        Called with each result as it finishes.
+
+    Returns
+    -------
+    results : list of dict
+    """
+    import wx
+
+    from wafer_map import wm_cache
+
+    app = wx.App(False)
+    # Time the work itself rather than cache lookups from the last repeat.
+    old_cache = wm_cache.get_cache()
+    wm_cache.set_cache(None)
+    results = []
+    try:
+        for die in sizes:
+            wafer_info, xyd = synthetic_wafer(die)
+            for render_mode in render_modes:
+                times = {}
+                for _ in range(repeat):
+                    for name, values in run_once(wafer_info, xyd, render_mode).items():
+                        times.setdefault(name, []).extend(values)
+                for name, values in times.items():
+                    result = {
+                        "benchmark": "{}[{}]".format(name, render_mode),
+                        "die": die,
+                        "actual_die": len(xyd),
+                        "runs": len(values),
+                        "best": min(values),
+                        "median": statistics.median(values),
+                        "peak_memory": None,
+                    }
+                    results.append(result)
+                    if progress is not None:
+                        progress(result)
+    finally:
+        wm_cache.set_cache(old_cache)
+        app.Destroy()
+    return results
+
+
+def _print_result(result):
+    line = "{:<28} {:>9}  best {:>9}  median {:>9}  ({} runs)".format(
+        result["benchmark"],
+        result["actual_die"],
+        benchutils.format_time(result["best"]),
+        benchutils.format_time(result["median"]),
+        result["runs"],
+    )
+    print(line, file=sys.stderr)
+
+
+def main(argv=None):
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="Write the JSON report here. Defaults to stdout.",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=SIZES,
+        help="About how many die. Defaults to 1k, 10k, and 100k.",
+    )
+    parser.add_argument(
+        "--render-modes",
+        nargs="+",
+        choices=RENDER_MODES,
+        default=RENDER_MODES,
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Panels to build per size and mode."
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="BASELINE",
+        help="Compare to this report. Exits with 1 if anything is slower.",
+    )
+    args = parser.parse_args(argv)
+
+    with virtual_display() as display:
+        results = run(args.sizes, args.render_modes, args.repeat, _print_result)
+    report = benchutils.write_report(
+        args.output,
+        "gui",
+        results,
+        display=display,
+        frame_size=list(FRAME_SIZE),
+        sizes=list(args.sizes),
+    )
+    if args.compare:
+        baseline = benchutils.read_report(args.compare)
+        if benchutils.compare(baseline, report, stream=sys.stderr):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
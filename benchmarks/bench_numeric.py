@@ -0,0 +1,289 @@
+"""
+Benchmark the numeric hot paths of wafer_map.
+
+Times each function, and finds its peak memory use, at die counts from 1k to
+1M, then writes a JSON report (see :mod:`benchutils`)::
+
+    python benchmarks/bench_numeric.py -o numeric.json
+    python benchmarks/bench_numeric.py --quick --compare numeric.json
+
+The scalar functions (``linear_gradient``, ``rescale``, ...) are called once
+per die, the way the GUI used to call them. Their vectorized counterparts are
+benchmarked alongside so that the two can be compared. All inputs are made
+from a fixed seed, so runs are repeatable.
+
+A full run takes several minutes, mostly in the scalar color gradients at 1M
+die. Use ``--sizes`` or ``--quick`` for a shorter run.
+"""
+import argparse
+import contextlib
+import io
+import math
+import random
+import sys
+
+import benchutils
+import numpy as np
+
+from wafer_map import gen_fake_data
+from wafer_map import wm_utils
+
+SIZES = (1000, 10000, 100000, 1000000)
+QUICK_SIZES = (1000, 10000)
+SEED = 42
+
+LOW_COLOR = (0, 0, 255)
+HIGH_COLOR = (255, 0, 0)
+COLORS = [(0, 0, 255), (0, 255, 0), (255, 0, 0)]
+DIE_SIZE = (5.43, 6.3)
+GRID_CENTER = (29, 21.5)
+
+
+class Inputs(object):
+    """
+    Synthetic die data, made from a fixed seed.
+
+    Attributes
+    ----------
+    grid_x, grid_y : :class:`numpy.ndarray`
+        Die grid coordinates, on a square grid.
+    values : :class:`numpy.ndarray`
+        Normally-distributed values with about 1% NaN.
+    fractions : :class:`numpy.ndarray`
+        Values from 0 to 1, as given to the color gradients.
+    coords : list of tuple
+        The ``(x, y)`` panel coordinate of each die center.
+    xyd : list of tuple
+        ``(grid_x, grid_y, value)`` tuples.
+    """
+
+    def __init__(self, die, seed=SEED):
+        rng = np.random.default_rng(seed)
+        side = int(math.ceil(math.sqrt(die)))
+        index = np.arange(die)
+        self.grid_x = index % side
+        self.grid_y = index // side
+        self.values = rng.normal(size=die)
+        self.values[rng.random(die) < 0.01] = np.nan
+        self.fractions = rng.random(die)
+        self.coords = list(
+            zip(
+                (DIE_SIZE[0] * (self.grid_x - GRID_CENTER[0])).tolist(),
+                (DIE_SIZE[1] * (GRID_CENTER[1] - self.grid_y)).tolist(),
+            )
+        )
+        self.xyd = list(
+            zip(self.grid_x.tolist(), self.grid_y.tolist(), self.values.tolist())
+        )
+
+
+def benchmarks(inputs):
+    """
+    Return the benchmarks to run on ``inputs``.
+
+    Returns
+    -------
+    benchmarks : list of tuple
+        ``(name, func)`` pairs. ``func`` takes no arguments.
+    """
+    fractions = inputs.fractions.tolist()
+    values = inputs.values.tolist()
+    grids = list(zip(inputs.grid_x.tolist(), inputs.grid_y.tolist()))
+
+    def linear_gradient():
+        for value in fractions:
+            wm_utils.linear_gradient(LOW_COLOR, HIGH_COLOR, value)
+
+    def linear_gradient_array():
+        wm_utils.linear_gradient_array(LOW_COLOR, HIGH_COLOR, inputs.fractions)
+
+    def polylinear_gradient():
+        for value in fractions:
+            wm_utils.polylinear_gradient(COLORS, value)
+
+    def rescale():
+        for value in values:
+            wm_utils.rescale(value, (-3, 3))
+
+    def rescale_array():
+        wm_utils.rescale_array(inputs.values, (-3, 3))
+
+    def nanpercentile():
+        wm_utils.nanpercentile(inputs.values, 2)
+        wm_utils.nanpercentile(inputs.values, 98)
+
+    def summary_stats():
+        wm_utils.summary_stats(inputs.values)
+
+    def coord_to_grid():
+        for coord in inputs.coords:
+            wm_utils.coord_to_grid(coord, DIE_SIZE, GRID_CENTER)
+
+    def grid_to_rect_coord():
+        for grid in grids:
+            wm_utils.grid_to_rect_coord(grid, DIE_SIZE, GRID_CENTER)
+
+    def max_dist_sqrd():
+        for coord in inputs.coords:
+            wm_utils.max_dist_sqrd(coord, DIE_SIZE)
+
+    def xyd_to_arrays():
+        wm_utils.xyd_to_arrays(inputs.xyd)
+
+    return [
+        ("linear_gradient", linear_gradient),
+        ("linear_gradient_array", linear_gradient_array),
+        ("polylinear_gradient", polylinear_gradient),
+        ("rescale", rescale),
+        ("rescale_array", rescale_array),
+        ("nanpercentile", nanpercentile),
+        ("summary_stats", summary_stats),
+        ("coord_to_grid", coord_to_grid),
+        ("grid_to_rect_coord", grid_to_rect_coord),
+        ("max_dist_sqrd", max_dist_sqrd),
+        ("xyd_to_dict", _xyd_to_dict(inputs.xyd)),
+        ("xyd_to_arrays", xyd_to_arrays),
+    ]
+
+
+def fake_data_benchmark(die):
+    """
+    Return a ``generate_fake_data`` benchmark that makes about ``die`` die.
+
+    The die size is picked so that a 150 mm wafer holds ``die`` die.
+    """
+    size = math.sqrt(math.pi * 75**2 / die)
+
+    def generate_fake_data():
+        random.seed(SEED)
+        # It prints the wafer info and die count; keep the report clean.
+        with contextlib.redirect_stdout(io.StringIO()):
+            gen_fake_data.generate_fake_data(
+                die_x=size,
+                die_y=size,
+                dia=150,
+                edge_excl=0,
+                flat_excl=0,
+                x_offset=0,
+                y_offset=0,
+            )
+
+    return ("generate_fake_data", generate_fake_data)
+
+
+def run(sizes, only=None, repeat=5, max_time=2.0, progress=None):
+    """
+    Run the benchmarks.
+
+    Parameters
+    ----------
+    sizes : list of int
+        The die counts to run at.
+    only : list of str, optional
+        Only run the benchmarks with these names.
+    repeat, max_time :
+        Passed to :func:`benchutils.measure`.
+    progress : callable, optional
+        Called with each result as it finishes.
+
+    Returns
+    -------
+    results : list of dict
+    """
+    results = []
+    for die in sizes:
+        inputs = Inputs(die)
+        cases = benchmarks(inputs) + [fake_data_benchmark(die)]
+        for name, func in cases:
+            if only and name not in only:
+                continue
+            result = {"benchmark": name, "die": die}
+            if isinstance(func, str):
+                result["skipped"] = func
+            else:
+                result.update(benchutils.measure(func, repeat, max_time))
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    return results
+
+
+def _xyd_to_dict(xyd):
+    """
+    Return the ``xyd_to_dict`` benchmark, or why it is skipped.
+
+    ``xyd_to_dict`` lives in :mod:`wafer_map.wm_core`, which needs wxPython.
+    """
+    try:
+        from wafer_map import wm_core
+    except ImportError:
+        return "needs wxPython"
+
+    def xyd_to_dict():
+        wm_core.xyd_to_dict(xyd)
+
+    return xyd_to_dict
+
+
+def _print_result(result):
+    if "skipped" in result:
+        line = "{benchmark:<24} {die:>9}  skipped: {skipped}".format(**result)
+    else:
+        line = "{:<24} {:>9}  best {:>9}  median {:>9}  peak {:>9}".format(
+            result["benchmark"],
+            result["die"],
+            benchutils.format_time(result["best"]),
+            benchutils.format_time(result["median"]),
+            benchutils.format_bytes(result["peak_memory"]),
+        )
+    print(line, file=sys.stderr)
+
+
+def main(argv=None):
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="Write the JSON report here. Defaults to stdout.",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=SIZES,
+        help="Die counts to run at. Defaults to 1k, 10k, 100k, and 1M.",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Only run at 1k and 10k die."
+    )
+    parser.add_argument("--only", nargs="+", help="Only run these benchmarks.")
+    parser.add_argument("--repeat", type=int, default=5, help="Most timed runs.")
+    parser.add_argument(
+        "--max-time",
+        type=float,
+        default=2.0,
+        help="Stop timing a benchmark after this many seconds.",
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="BASELINE",
+        help="Compare to this report. Exits with 1 if anything is slower.",
+    )
+    args = parser.parse_args(argv)
+
+    sizes = QUICK_SIZES if args.quick else args.sizes
+    results = run(sizes, args.only, args.repeat, args.max_time, _print_result)
+    report = benchutils.write_report(
+        args.output, "numeric", results, seed=SEED, sizes=list(sizes)
+    )
+    if args.compare:
+        baseline = benchutils.read_report(args.compare)
+        if benchutils.compare(baseline, report, stream=sys.stderr):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
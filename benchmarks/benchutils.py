@@ -0,0 +1,239 @@
+"""
+Timing, memory, and report helpers shared by the benchmark scripts.
+
+A report is a JSON file::
+
+    {
+        "format": 1,
+        "suite": "numeric",
+        "environment": {"python": ..., "numpy": ..., "wafer_map": ...},
+        "results": [
+            {"benchmark": "rescale", "die": 1000, "runs": 5,
+             "best": 0.0012, "median": 0.0013, "peak_memory": 81920},
+            {"benchmark": "xyd_to_dict", "die": 1000,
+             "skipped": "needs wxPython"},
+        ]
+    }
+
+Times are in seconds and memory in bytes. Reports from different runs can be
+compared with :func:`compare`, or ``--compare`` on the command line.
+"""
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# Slower than this, relative to the baseline, is reported as a regression.
+REGRESSION_RATIO = 1.25
+
+
+def measure(func, repeat=5, max_time=2.0, trace_memory=True):
+    """
+    Time ``func()`` and find its peak memory use.
+
+    The first call is traced by :mod:`tracemalloc`, which also warms up any
+    caches. The following calls are timed, stopping early once ``max_time``
+    seconds have been spent, but always timing at least one call.
+
+    Parameters
+    ----------
+    func : callable
+        Called with no arguments.
+    repeat : int, optional
+        The most calls to time. Defaults to `5`.
+    max_time : float, optional
+        Stop timing after this many seconds. Defaults to `2.0`.
+    trace_memory : bool, optional
+        If ``False``, the first call is not traced and ``peak_memory`` is
+        ``None``. Defaults to ``True``.
+
+    Returns
+    -------
+    result : dict
+        ``runs``, ``best``, and ``median`` times, and ``peak_memory``.
+    """
+    gc.collect()
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    else:
+        func()
+
+    times = []
+    spent = 0.0
+    while len(times) < repeat and (not times or spent < max_time):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+        spent += times[-1]
+    return {
+        "runs": len(times),
+        "best": min(times),
+        "median": statistics.median(times),
+        "peak_memory": peak,
+    }
+
+
+def environment():
+    """Return a description of the machine and package versions."""
+    env = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+        "wafer_map": _package_version("wafer_map"),
+        "wxpython": _package_version("wxPython"),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "commit": _git_commit(),
+    }
+    return env
+
+
+def write_report(path, suite, results, **extra):
+    """
+    Write a report to ``path``, or to stdout if ``path`` is ``"-"``.
+
+    Returns the report as a dict.
+    """
+    report = {
+        "format": FORMAT_VERSION,
+        "suite": suite,
+        "environment": environment(),
+        "results": results,
+    }
+    report.update(extra)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w") as openf:
+            openf.write(text + "\n")
+    return report
+
+
+def read_report(path):
+    """Read a report written by :func:`write_report`."""
+    with open(path) as openf:
+        report = json.load(openf)
+    if report.get("format") != FORMAT_VERSION:
+        raise ValueError(
+            "{} is report format {}, not {}".format(
+                path, report.get("format"), FORMAT_VERSION
+            )
+        )
+    return report
+
+
+def compare(baseline, current, ratio=REGRESSION_RATIO, stream=sys.stdout):
+    """
+    Print the change of each benchmark from ``baseline`` to ``current``.
+
+    Benchmarks are matched on their ``benchmark`` and ``die`` keys, and
+    compared on their best time.
+
+    Returns
+    -------
+    regressions : list of tuple
+        The ``(benchmark, die)`` keys that are ``ratio`` times slower or
+        more.
+    """
+    old = {_key(_r): _r for _r in baseline["results"] if "best" in _r}
+    regressions = []
+    row = "{:<32} {:>9} {:>12} {:>12} {:>8} {:>8}"
+    print(
+        row.format("benchmark", "die", "baseline", "current", "time", "memory"),
+        file=stream,
+    )
+    for result in current["results"]:
+        key = _key(result)
+        if "best" not in result or key not in old:
+            continue
+        before = old[key]
+        change = result["best"] / before["best"] if before["best"] else float("inf")
+        memory = ""
+        if result.get("peak_memory") and before.get("peak_memory"):
+            memory = "{:.2f}x".format(result["peak_memory"] / before["peak_memory"])
+        flag = ""
+        if change >= ratio:
+            regressions.append(key)
+            flag = "  SLOWER"
+        print(
+            row.format(
+                key[0],
+                key[1],
+                format_time(before["best"]),
+                format_time(result["best"]),
+                "{:.2f}x".format(change),
+                memory,
+            )
+            + flag,
+            file=stream,
+        )
+    return regressions
+
+
+def format_time(seconds):
+    """Format a time with a readable unit."""
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return "{:.3g} {}".format(seconds / scale, unit)
+    return "{:.3g} ns".format(seconds / 1e-9)
+
+
+def format_bytes(size):
+    """Format a size in bytes with a readable unit."""
+    if size is None:
+        return "-"
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return "{:.0f} {}".format(size, unit)
+        size /= 1024
+    return "{:.1f} GiB".format(size)
+
+
+def _key(result):
+    return (result["benchmark"], result["die"])
+
+
+def _package_version(name):
+    try:
+        from importlib import metadata
+    except ImportError:
+        return None
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
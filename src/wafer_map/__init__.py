@@ -17,12 +17,17 @@ if os.getenv("READTHEDOCS", "False") == "True":
 else:
     # Fix hashing for wx.Colour
     # See https://groups.google.com/forum/#!topic/wxpython-dev/NLd4CZv9rII
-    import wx
-
-    ok = getattr(wx.Colour, "__hash__")
-    if ok is None:
-
-        def _Colour___hash(self):
-            return hash(tuple(self.Get()))
-
-        wx.Colour.__hash__ = _Colour___hash
+    try:
+        import wx
+    except ImportError:
+        # Headless install: only wm_raster and the other numpy-only modules
+        # can be used.
+        pass
+    else:
+        ok = getattr(wx.Colour, "__hash__")
+        if ok is None:
+
+            def _Colour___hash(self):
+                return hash(tuple(self.Get()))
+
+            wx.Colour.__hash__ = _Colour___hash
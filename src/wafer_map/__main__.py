@@ -1,8 +1,18 @@
 """
 Main entry point for wafer_map.
 
-Runs the examples when called with `python -m wafer_map`.
+Runs the examples when called with `python -m wafer_map`. Any arguments are
+handled by :mod:`wafer_map.wm_cli`, such as
+`python -m wafer_map render <files> -o <dir>`.
 """
-from wafer_map import example
+import sys
 
-example.main()
+if len(sys.argv) > 1:
+    # Doesn't need wx, so don't import the examples.
+    from wafer_map import wm_cli
+
+    sys.exit(wm_cli.main())
+else:
+    from wafer_map import example
+
+    example.main()
@@ -15,8 +15,9 @@ class WaferMapApp(object):
 
     Parameters
     ----------
-    xyd : list of 3-tuples
-        The data to plot.
+    xyd : list of 3-tuples, or arrays
+        The data to plot. May be empty or partial when ``stream`` is given.
+        See :class:`wafer_map.wm_core.WaferMapPanel`.
     die_size : tuple
         The die size in mm as a ``(width, height)`` tuple.
     center_xy : tuple, optional
@@ -46,6 +47,19 @@ class WaferMapApp(object):
     show_die_gridlines : bool, optional
         If ``True``, displayes gridlines along the die edges. Defaults to
         ``True``.
+    render_mode : :class:`wm_constants.RenderMode` or str, optional
+        How to draw the die. Must be one of `rectangle`, `raster`,
+        `batched`, or `auto`. See :class:`wafer_map.wm_core.WaferMapPanel`.
+        Defaults to `auto`.
+    stream : :class:`queue.Queue` or iterable, optional
+        Die results to add to the map as they arrive, such as from a prober
+        that is still running. See
+        :meth:`wafer_map.wm_core.WaferMapPanel.stream_data`. Defaults to
+        ``None``.
+    instrument : callable, optional
+        Called with a :class:`wm_instrument.Span` after each phase of
+        building and drawing the map. See
+        :class:`wafer_map.wm_core.WaferMapPanel`. Defaults to ``None``.
     """
 
     def __init__(
@@ -62,6 +76,9 @@ class WaferMapApp(object):
         plot_range=None,
         plot_die_centers=False,
         show_die_gridlines=True,
+        render_mode=wm_const.RenderMode.AUTO,
+        stream=None,
+        instrument=None,
     ):
         self.app = wx.App()
 
@@ -79,6 +96,8 @@ class WaferMapApp(object):
         self.plot_range = plot_range
         self.plot_die_centers = plot_die_centers
         self.show_die_gridlines = show_die_gridlines
+        self.render_mode = render_mode
+        self.instrument = instrument
 
         self.frame = wm_frame.WaferMapWindow(
             "Wafer Map Phoenix",
@@ -93,9 +112,13 @@ class WaferMapApp(object):
             size=(600, 500),
             plot_die_centers=self.plot_die_centers,
             show_die_gridlines=self.show_die_gridlines,
+            render_mode=self.render_mode,
+            instrument=self.instrument,
         )
 
         self.frame.Show()
+        if stream is not None:
+            self.frame.stream_data(stream)
         self.app.MainLoop()
 
 
@@ -0,0 +1,337 @@
+"""
+A cache of rendered wafer maps and die colors.
+
+Entries are keyed on a hash of everything that goes into them: the die data,
+the :class:`wafer_map.wm_info.WaferInfo` fields, the plot range, and the
+color settings. So reopening the same wafer, or rendering it again in a
+batch, skips the work.
+
+Entries are numpy arrays and are kept in memory, least recently used first
+out, up to a size in bytes. A :class:`RenderCache` can also keep entries on
+disk, so that later runs can use them. The disk tier is also bounded: when it
+grows past its size, the least recently used files are deleted.
+
+:class:`wafer_map.wm_core.WaferMapPanel` and :mod:`wafer_map.wm_raster` use
+the process-wide cache from :func:`get_cache`. Use :func:`set_cache` to
+replace it, or to turn caching off with ``None``.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from enum import Enum
+
+import numpy as np
+
+from wafer_map import wm_constants as wm_const
+from wafer_map import wm_info
+
+# Change this when the rendering changes, so that entries on disk from an
+# older version aren't used.
+_KEY_VERSION = b"1"
+
+
+class RenderCache(object):
+    """
+    A size-bounded LRU cache of numpy arrays, with an optional disk tier.
+
+    Safe to use from several threads.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        The most memory, in bytes, that the in-memory entries may use.
+        Defaults to `wm_CACHE_MAX_BYTES`.
+    directory : str, optional
+        If given, entries are also saved here as ``.npy`` files and are
+        read back on a memory miss. Defaults to ``None``.
+    max_disk_bytes : int, optional
+        The most disk space, in bytes, that the ``.npy`` files in
+        ``directory`` may use. When a save goes past it, the least recently
+        used files, by modification time, are deleted until they use three
+        quarters of it. Reading a file counts as using it. Defaults to
+        `wm_CACHE_MAX_DISK_BYTES`.
+
+    Attributes
+    ----------
+    nbytes : int
+        The memory used by the in-memory entries.
+    hits, misses : int
+        The number of :meth:`get` calls that did and didn't find an entry.
+    """
+
+    def __init__(
+        self,
+        max_bytes=wm_const.wm_CACHE_MAX_BYTES,
+        directory=None,
+        max_disk_bytes=wm_const.wm_CACHE_MAX_DISK_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        # An estimate of the disk space used, so that the directory is only
+        # listed when it may be full. Other processes may share it.
+        self._disk_bytes = None
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        """
+        Return the entry for ``key``, or ``default`` if there is none.
+
+        The returned array is read-only; copy it before changing it.
+        """
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._load(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        """Add a copy of the array ``value`` to the cache."""
+        value = np.array(value)
+        value.setflags(write=False)
+        with self._lock:
+            self._remember(key, value)
+        self._save(key, value)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the entry for ``key``, calling ``compute()`` to make it if
+        it isn't cached.
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Remove all in-memory entries. Entries on disk are kept."""
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def _remember(self, key, value):
+        """Add an entry to memory and evict old ones. Hold the lock."""
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        if value.nbytes > self.max_bytes:
+            return
+        self._items[key] = value
+        self.nbytes += value.nbytes
+        while self.nbytes > self.max_bytes:
+            _, old = self._items.popitem(last=False)
+            self.nbytes -= old.nbytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def _load(self, key):
+        """Read an entry from disk, or return ``None``."""
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            value = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        try:
+            # Mark it as recently used, so that it's pruned last.
+            os.utime(path)
+        except OSError:
+            pass
+        value.setflags(write=False)
+        return value
+
+    def _save(self, key, value):
+        """Write an entry to disk, if there's a disk tier."""
+        if self.directory is None or value.dtype.kind == "O":
+            return
+        path = self._path(key)
+        # Write then rename so that other processes never see half a file.
+        temp = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+        try:
+            with open(temp, "wb") as openf:
+                np.save(openf, value, allow_pickle=False)
+            os.replace(temp, path)
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(_s for _, _, _s in self._disk_entries())
+            else:
+                self._disk_bytes += value.nbytes
+            if self._disk_bytes > self.max_disk_bytes:
+                self._prune_disk()
+
+    def _disk_entries(self):
+        """Return ``(mtime, path, size)`` of each entry file on disk."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Deleted by another process.
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _prune_disk(self):
+        """Delete the oldest entry files on disk. Hold the lock."""
+        entries = sorted(self._disk_entries())
+        total = sum(_s for _, _, _s in entries)
+        # Prune below the limit so that this doesn't run on every save.
+        target = self.max_disk_bytes * 3 // 4
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        self._disk_bytes = total
+
+
+def die_colors(values, data_type, legend):
+    """
+    Return ``legend.get_colors(values)``, using the cache from
+    :func:`get_cache` if there is one.
+
+    The key includes every legend setting that changes the colors, so
+    legends with different colors never share entries.
+
+    Parameters
+    ----------
+    values : :class:`numpy.ndarray`
+        The die values.
+    data_type : :class:`wm_constants.DataType`
+        The type of the data.
+    legend : :class:`wafer_map.wm_legend.Legend`
+        The legend that colors the die: a ``DiscreteLegend`` for discrete
+        data or a ``ContinuousLegend`` for continuous data.
+
+    Returns
+    -------
+    colors : :class:`numpy.ndarray`
+        A ``(N, 3)`` array of die colors. Read-only if it came from the
+        cache.
+    """
+    cache = get_cache()
+    if cache is None:
+        return legend.get_colors(values)
+    key = content_key(
+        "WaferMapPanel colors", values, data_type, _color_settings(data_type, legend)
+    )
+    return cache.get_or_compute(key, lambda: legend.get_colors(values))
+
+
+def _color_settings(data_type, legend):
+    """Return the settings of ``legend`` that change the die colors."""
+    if data_type == wm_const.DataType.DISCRETE:
+        return legend.color_dict
+    return (
+        legend.plot_range,
+        legend.low_color,
+        legend.high_color,
+        legend.oor_low_color,
+        legend.oor_high_color,
+        legend.invalid_color,
+    )
+
+
+def content_key(*parts):
+    """
+    Return a hash of ``parts`` to use as a cache key.
+
+    Parts may be numpy arrays, :class:`wafer_map.wm_info.WaferInfo`
+    objects, enums, colors (tuples or :class:`wx.Colour`), numbers,
+    strings, ``None``, and lists, tuples, or dicts of those.
+
+    Returns
+    -------
+    str
+        A hex string.
+    """
+    digest = hashlib.blake2b(_KEY_VERSION, digest_size=20)
+    for part in parts:
+        _update(digest, part)
+    return digest.hexdigest()
+
+
+def _update(digest, obj):
+    """Add ``obj`` to a hash. Each type is tagged so they don't collide."""
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == "O":
+            _update(digest, obj.tolist())
+            return
+        digest.update("a{}{}".format(obj.dtype.str, obj.shape).encode())
+        digest.update(np.ascontiguousarray(obj).data)
+    elif isinstance(obj, (list, tuple)):
+        digest.update("l{}(".format(len(obj)).encode())
+        for item in obj:
+            _update(digest, item)
+        digest.update(b")")
+    elif isinstance(obj, dict):
+        _update(digest, ["d"] + list(obj.items()))
+    elif isinstance(obj, wm_info.WaferInfo):
+        _update(digest, ["w"] + sorted(vars(obj).items()))
+    elif isinstance(obj, Enum):
+        digest.update("e{!r}".format(obj).encode())
+    elif obj is None or isinstance(obj, (bool, int, float, str, bytes)):
+        digest.update("s{!r}".format(obj).encode())
+    else:
+        # Colors such as wx.Colour, and numpy scalars.
+        try:
+            obj = tuple(obj)
+        except TypeError:
+            digest.update("r{!r}".format(obj).encode())
+        else:
+            _update(digest, obj)
+
+
+_cache = RenderCache()
+
+
+def get_cache():
+    """Return the process-wide :class:`RenderCache`, or ``None``."""
+    return _cache
+
+
+def set_cache(cache):
+    """
+    Replace the process-wide :class:`RenderCache`.
+
+    Pass ``None`` to turn caching off.
+    """
+    global _cache
+    _cache = cache
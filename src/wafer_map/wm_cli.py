@@ -0,0 +1,410 @@
+"""
+Command line interface for wafer_map.
+
+Render every wafer of a lot to PNG without opening the GUI::
+
+    python -m wafer_map render lot_42/ -o maps/
+    python -m wafer_map render "lot_42/*.csv" -o maps/ --params Vth Idsat
+
+Files are read by :func:`wafer_map.wm_io.read`, which memory-maps ``.npy``
+and ``.npz`` files, and each parameter is rendered to
+``<output>/<file name>_<parameter>.png`` on a process pool.
+"""
+import argparse
+import collections
+import concurrent.futures
+import glob
+import math
+import os
+import re
+import sys
+
+from wafer_map import wm_cache
+from wafer_map import wm_constants as wm_const
+from wafer_map import wm_io
+from wafer_map import wm_raster
+
+# The file extensions to render when given a directory.
+_EXTENSIONS = (".csv", ".tsv", ".txt", ".npy", ".npz")
+
+
+class RenderResult(object):
+    """
+    The outcome of rendering one parameter of one file.
+
+    Attributes
+    ----------
+    path : str
+        The input file.
+    parameter : str
+        The parameter, or ``None`` if the file itself couldn't be read.
+    output : str
+        The PNG that was written, or ``None`` on error.
+    error : str
+        The error message, or ``None`` on success.
+    """
+
+    def __init__(self, path, parameter, output=None, error=None):
+        self.path = path
+        self.parameter = parameter
+        self.output = output
+        self.error = error
+
+    def __str__(self):
+        name = self.path
+        if self.parameter is not None:
+            name += ": " + self.parameter
+        if self.error is not None:
+            return "{} FAILED: {}".format(name, self.error)
+        return "{} -> {}".format(name, self.output)
+
+
+def find_files(inputs):
+    """
+    Expand directories and glob patterns to a sorted list of files.
+
+    Directories are searched, not recursively, for ``.csv``, ``.tsv``,
+    ``.txt``, ``.npy``, and ``.npz`` files.
+    """
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in os.listdir(item):
+                if name.lower().endswith(_EXTENSIONS):
+                    paths.add(os.path.join(item, name))
+        elif os.path.isfile(item):
+            paths.add(item)
+        else:
+            paths.update(_p for _p in glob.glob(item) if os.path.isfile(_p))
+    return sorted(paths)
+
+
+def render_files(
+    paths,
+    out_dir,
+    parameters=None,
+    jobs=None,
+    progress=None,
+    wafer_info=None,
+    cache_dir=None,
+    **render_kwargs
+):
+    """
+    Render every parameter of every file to PNG on a process pool.
+
+    An error in one file or parameter is recorded in its result and does not
+    stop the others.
+
+    Images are named ``<file>_<parameter>.png``. Files with the same name
+    in different directories are named by their path from the directory
+    that they share, such as ``lotA_w01_Vth.png``, so they don't overwrite
+    each other. An image whose name still clashes with another's fails.
+
+    Parameters
+    ----------
+    paths : list of str
+        The wafer data files.
+    out_dir : str
+        The directory to write the images to. Created if needed.
+    parameters : list of str, optional
+        The parameters to render. If ``None``, renders all of them. Defaults
+        to ``None``.
+    jobs : int, optional
+        The number of worker processes. If ``None``, uses one per CPU. If
+        `1`, renders in this process. Defaults to ``None``.
+    progress : callable, optional
+        Called as ``progress(done, total, result)`` after each image.
+    wafer_info : dict, optional
+        :class:`wafer_map.wm_info.WaferInfo` arguments that override the
+        values in the files.
+    cache_dir : str, optional
+        A directory to cache the images in, so that rendering them again is
+        nearly free. It is kept under ``wm_CACHE_MAX_DISK_BYTES`` by deleting
+        the least recently used images. If ``None``, nothing is cached.
+        Defaults to ``None``.
+    render_kwargs :
+        Passed to :func:`wafer_map.wm_raster.render`.
+
+    Returns
+    -------
+    results : list of :class:`RenderResult`
+        One per image, in the order they finished.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    wafer_info = wafer_info or {}
+
+    results = []
+    tasks = []
+    for path in paths:
+        try:
+            _, columns = wm_io.read_header(path)
+        except (OSError, ValueError) as err:
+            results.append(RenderResult(path, None, error=str(err)))
+            continue
+        names = columns[2:] if parameters is None else list(parameters)
+        if not names:
+            results.append(RenderResult(path, None, error="no parameters"))
+            continue
+        tasks.extend((path, _name) for _name in names)
+
+    stems = _output_stems(sorted({_path for _path, _ in tasks}))
+    outputs = {}
+    named_tasks = []
+    for path, name in tasks:
+        output = "{}_{}.png".format(stems[path], _safe_name(name))
+        if output in outputs:
+            error = "{} is also the image of {}: {}".format(output, *outputs[output])
+            results.append(RenderResult(path, name, error=error))
+        else:
+            outputs[output] = (path, name)
+            named_tasks.append((path, name, output))
+    tasks = named_tasks
+    total = len(tasks) + len(results)
+    for done, result in enumerate(results, 1):
+        if progress is not None:
+            progress(done, total, result)
+
+    # Keep a few tasks per worker so that a large lot doesn't read every
+    # file at once, but each worker reads a file once for several
+    # parameters rather than once per parameter.
+    chunk_size = max(1, min(16, math.ceil(len(tasks) / (jobs * 4))))
+    chunks = [tasks[_i : _i + chunk_size] for _i in range(0, len(tasks), chunk_size)]
+    args = (out_dir, wafer_info, render_kwargs)
+
+    if jobs == 1:
+        old_cache = wm_cache.get_cache()
+        _init_worker(cache_dir)
+        try:
+            for chunk in chunks:
+                for result in _render_chunk(chunk, *args):
+                    results.append(result)
+                    if progress is not None:
+                        progress(len(results), total, result)
+        finally:
+            wm_cache.set_cache(old_cache)
+        return results
+
+    with concurrent.futures.ProcessPoolExecutor(
+        jobs, initializer=_init_worker, initargs=(cache_dir,)
+    ) as executor:
+        pending = {}
+        chunks = iter(chunks)
+        while True:
+            # Bounded queue: only submit more work as results come back.
+            while len(pending) < jobs * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending[executor.submit(_render_chunk, chunk, *args)] = chunk
+            if not pending:
+                break
+            finished, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in finished:
+                chunk = pending.pop(future)
+                try:
+                    chunk_results = future.result()
+                except Exception as err:
+                    # The worker died; fail only this chunk.
+                    chunk_results = [
+                        RenderResult(_path, _name, error=repr(err))
+                        for _path, _name, _ in chunk
+                    ]
+                for result in chunk_results:
+                    results.append(result)
+                    if progress is not None:
+                        progress(len(results), total, result)
+    return results
+
+
+def _init_worker(cache_dir):
+    """Set up the render cache of a worker."""
+    # Each image is only rendered once per run, so keeping them in memory
+    # would only use up memory in every worker.
+    cache = None
+    if cache_dir is not None:
+        cache = wm_cache.RenderCache(max_bytes=0, directory=cache_dir)
+    wm_cache.set_cache(cache)
+
+
+def _render_chunk(chunk, out_dir, wafer_info, render_kwargs):
+    """
+    Render a list of ``(path, parameter, output name)`` tasks. Runs in a
+    worker.
+    """
+    results = []
+    data = {}
+    for path, name, output in chunk:
+        try:
+            if path not in data:
+                data[path] = wm_io.read(path, [_n for _p, _n, _ in chunk if _p == path])
+            wafer = data[path]
+            kwargs = dict(render_kwargs)
+            kwargs.setdefault("data_type", wafer.data_type(name))
+            png = wm_raster.render_png(
+                wafer.arrays(name), wafer.wafer_info(**wafer_info), **kwargs
+            )
+            output = os.path.join(out_dir, output)
+            with open(output, "wb") as openf:
+                openf.write(png)
+            results.append(RenderResult(path, name, output=output))
+        except Exception as err:
+            results.append(RenderResult(path, name, error=str(err)))
+    return results
+
+
+def _output_stems(paths):
+    """
+    Return ``{path: stem}`` of the image names of each file.
+
+    The stem is the file's name without its extension. Files whose names
+    clash use their path from the directory they share instead, and then
+    their extension too if that still clashes.
+    """
+    stems = {_p: os.path.splitext(os.path.basename(_p))[0] for _p in paths}
+    clashes = _clashes(stems)
+    if clashes:
+        root = os.path.commonpath(
+            [os.path.dirname(os.path.abspath(_p)) for _p in clashes]
+        )
+        for path in clashes:
+            stems[path] = os.path.splitext(
+                os.path.relpath(os.path.abspath(path), root)
+            )[0]
+        for path in _clashes(stems):
+            stems[path] = os.path.relpath(os.path.abspath(path), root)
+    return {_p: _safe_name(_s) for _p, _s in stems.items()}
+
+
+def _clashes(stems):
+    """Return the paths in ``{path: stem}`` whose stem isn't unique."""
+    counts = collections.Counter(stems.values())
+    return [_p for _p, _s in stems.items() if counts[_s] > 1]
+
+
+def _safe_name(name):
+    """Replace the characters of ``name`` that may not be in a file name."""
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def _parser():
+    """Create the argument parser."""
+    parser = argparse.ArgumentParser(
+        prog="python -m wafer_map",
+        description="Semiconductor wafer mapping. Runs the example GUI if no "
+        "command is given.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    render = subparsers.add_parser(
+        "render",
+        help="Render wafer data files to PNG.",
+        description="Render each parameter of each wafer data file to PNG.",
+    )
+    render.add_argument(
+        "inputs",
+        nargs="+",
+        help="Wafer data files, directories, or glob patterns.",
+    )
+    render.add_argument(
+        "-o", "--output", required=True, help="The directory to write to."
+    )
+    render.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes. Defaults to one per CPU.",
+    )
+    render.add_argument("--params", nargs="+", help="Only render these parameters.")
+    render.add_argument(
+        "--size",
+        type=int,
+        default=wm_const.wm_RASTER_SIZE,
+        help="Wafer image size in px.",
+    )
+    render.add_argument(
+        "--plot-range",
+        nargs=2,
+        type=float,
+        metavar=("LOW", "HIGH"),
+        help="Plot range for continuous data. Defaults to the 2nd and 98th "
+        "percentiles of each image.",
+    )
+    render.add_argument(
+        "--discrete",
+        action="store_true",
+        help="Treat all parameters as discrete, such as numeric bins.",
+    )
+    render.add_argument("--legend", action="store_true", help="Add the legend colors.")
+    render.add_argument("--die-size", nargs=2, type=float, metavar=("X", "Y"))
+    render.add_argument("--center-xy", nargs=2, type=float, metavar=("X", "Y"))
+    render.add_argument("--dia", type=float)
+    render.add_argument("--edge-excl", type=float)
+    render.add_argument("--flat-excl", type=float)
+    render.add_argument(
+        "--cache-dir",
+        help="Cache images here. Images that are already cached are not "
+        "rendered again. The least recently used images are deleted when the "
+        "cache grows past wm_constants.wm_CACHE_MAX_DISK_BYTES.",
+    )
+    render.add_argument(
+        "-q", "--quiet", action="store_true", help="Only report errors."
+    )
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the command line interface.
+
+    Returns
+    -------
+    int
+        The exit code: `0` on success, `1` if any image failed.
+    """
+    args = _parser().parse_args(argv)
+
+    paths = find_files(args.inputs)
+    if not paths:
+        print("No files found.", file=sys.stderr)
+        return 1
+
+    wafer_info = {
+        "die_size": args.die_size,
+        "center_xy": args.center_xy,
+        "dia": args.dia,
+        "edge_excl": args.edge_excl,
+        "flat_excl": args.flat_excl,
+    }
+    render_kwargs = {"size": args.size, "show_legend": args.legend}
+    if args.plot_range is not None:
+        render_kwargs["plot_range"] = tuple(args.plot_range)
+    if args.discrete:
+        render_kwargs["data_type"] = wm_const.DataType.DISCRETE
+
+    def progress(done, total, result):
+        if result.error is not None:
+            print("[{}/{}] {}".format(done, total, result), file=sys.stderr)
+        elif not args.quiet:
+            print("[{}/{}] {}".format(done, total, result))
+
+    results = render_files(
+        paths,
+        args.output,
+        parameters=args.params,
+        jobs=args.jobs,
+        progress=progress,
+        wafer_info=wafer_info,
+        cache_dir=args.cache_dir,
+        **render_kwargs
+    )
+    failed = sum(_r.error is not None for _r in results)
+    print(
+        "Rendered {} of {} images.".format(len(results) - failed, len(results)),
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
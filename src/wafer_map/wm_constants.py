@@ -3,24 +3,47 @@ Constants for the wafer_map package.
 """
 from enum import Enum
 
-import wx
+try:
+    import wx
+except ImportError:
+    # wx is not needed for headless rendering with wm_raster.
+    wx = None
+
+
+def _colour(red, green, blue, alpha=255):
+    """Return a :class:`wx.Colour`, or an RGBA tuple if wx isn't installed."""
+    if wx is None:
+        return (red, green, blue, alpha)
+    return wx.Colour(red, green, blue, alpha)
 
 
 # Colors
-wm_OOR_HIGH_COLOR = wx.Colour(255, 0, 128, 255)
-wm_OOR_LOW_COLOR = wx.Colour(255, 128, 0, 255)
+wm_OOR_HIGH_COLOR = _colour(255, 0, 128, 255)
+wm_OOR_LOW_COLOR = _colour(255, 128, 0, 255)
 # wm_HIGH_COLOR = wx.Colour(255, 0, 0, 255)
-wm_HIGH_COLOR = wx.Colour(0, 255, 128, 255)
+wm_HIGH_COLOR = _colour(0, 255, 128, 255)
 # wm_LOW_COLOR = wx.Colour(0, 192, 0, 255)
-wm_LOW_COLOR = wx.Colour(128, 0, 255, 255)
-wm_INVALID_COLOR = wx.Colour(255, 255, 255, 255)
-wm_OUTLINE_COLOR = wx.Colour(255, 255, 0, 255)  # yellow
-wm_WAFER_EDGE_COLOR = wx.Colour(255, 0, 0, 255)  # red
-wm_WAFER_CENTER_DOT_COLOR = wx.Colour(255, 0, 0, 255)  # red
-wm_DIE_CENTER_DOT_COLOR = wx.Colour(255, 0, 0, 255)  # red
-wm_CROSSHAIR_COLOR = wx.Colour(0, 255, 255, 255)  # cyan
+wm_LOW_COLOR = _colour(128, 0, 255, 255)
+wm_INVALID_COLOR = _colour(255, 255, 255, 255)
+wm_OUTLINE_COLOR = _colour(255, 255, 0, 255)  # yellow
+wm_WAFER_EDGE_COLOR = _colour(255, 0, 0, 255)  # red
+wm_WAFER_CENTER_DOT_COLOR = _colour(255, 0, 0, 255)  # red
+wm_DIE_CENTER_DOT_COLOR = _colour(255, 0, 0, 255)  # red
+wm_CROSSHAIR_COLOR = _colour(0, 255, 255, 255)  # cyan
+wm_DIE_GRIDLINE_COLOR = _colour(64, 64, 64, 255)  # dark grey
+wm_RETICLE_GRIDLINE_COLOR = _colour(0, 0, 255, 255)  # blue
+wm_THUMBNAIL_PLACEHOLDER_COLOR = _colour(48, 48, 48, 255)  # grey
+wm_SELECT_BOX_COLOR = _colour(255, 255, 255, 255)  # white
 wm_TICK_COUNT = 11
 
+# Die center dot diameter in px.
+wm_DIE_CENTER_DOT_SIZE = 3
+
+# Defect markers: their size in px, and how close in px the mouse must be
+# to a defect to show it in the status bar.
+wm_DEFECT_SIZE = 5
+wm_DEFECT_HOVER_PX = 10
+
 # Continuous Data Gradient sizez in px.
 wm_GRAD_W = 30
 wm_GRAD_H = 500
@@ -29,6 +52,45 @@ wm_SPACER = 5
 
 wm_ZOOM_FACTOR = 1.1 / 120
 
+# The percentiles of the values that continuous data is auto-ranged to.
+wm_PLOT_RANGE_PERCENTILES = (2, 98)
+
+# Zoom boxes smaller than this in px are ignored, so that a click doesn't
+# zoom.
+wm_ZOOM_BOX_MIN_PX = 5
+
+# Size in px of the wafer area of images made by wm_raster.
+wm_RASTER_SIZE = 500
+
+# Size in px of the wafer thumbnails in the gallery.
+wm_THUMBNAIL_SIZE = 200
+
+# Level of detail thresholds, in px. When the die are smaller than this on
+# screen, less detail is drawn.
+wm_LOD_DETAIL_PX = 4  # Drop die borders, die centers, and gridlines
+wm_LOD_AGGREGATE_PX = 1  # Draw at most one die per pixel
+
+# RenderMode.AUTO draws maps with more die than this, or that start empty
+# for streaming, as RenderMode.BATCHED. Smaller maps use RECTANGLE.
+wm_AUTO_BATCHED_DIE = 10000
+
+# Streaming: how often, in ms, to add streamed die to the map, and the most
+# die to add at once.
+wm_STREAM_INTERVAL_MS = 100
+wm_STREAM_MAX_BATCH = 100000
+
+# The most memory, in bytes, that the render cache may use.
+wm_CACHE_MAX_BYTES = 256 * 2**20
+
+# The most disk space, in bytes, that the render cache's directory may use.
+wm_CACHE_MAX_DISK_BYTES = 2**30
+
+# How many wafers wm_stack reduces at a time.
+wm_STACK_CHUNK_SIZE = 64
+
+# How many bytes of an STDF file wm_stdf reads at a time.
+wm_STDF_BLOCK_SIZE = 2**20
+
 # Wafer Flat lengths, defined by SEMI M1-0302
 wm_FLAT_LENGTHS = {50: 15.88, 75: 22.22, 100: 32.5, 125: 42.5, 150: 57.5}
 
@@ -46,3 +108,21 @@ class DataType(NoValueEnum):
 class CoordType(NoValueEnum):
     ABSOLUTE = "absolute"
     RELATIVE = "relative"
+
+
+class RenderMode(NoValueEnum):
+    RECTANGLE = "rectangle"
+    RASTER = "raster"
+    BATCHED = "batched"
+    AUTO = "auto"
+
+
+class Statistic(NoValueEnum):
+    MEAN = "mean"
+    MEDIAN = "median"
+    STD = "std"
+    MIN = "min"
+    MAX = "max"
+    COUNT = "count"
+    YIELD = "yield"
+    MODE = "mode"
@@ -2,13 +2,19 @@
 The core of ``wafer_map``.
 """
 import math
+import queue
+import threading
 
 import numpy as np
 import wx
 import wx.lib.colourselect as csel
+import wx.lib.newevent
 from wx.lib.floatcanvas import FloatCanvas
+from wx.lib.floatcanvas.Utilities import BBox
 
+from wafer_map import wm_cache
 from wafer_map import wm_constants as wm_const
+from wafer_map import wm_instrument
 from wafer_map import wm_legend
 from wafer_map import wm_utils
 
@@ -18,6 +24,33 @@ from wafer_map import wm_utils
 # TODO: Add function to update wafer map with new die size and the like.
 
 
+# Posted by WaferMapPanel.select_box. ``event.positions`` holds the positions
+# of the selected die in the data and ``event.defects`` the positions of the
+# selected defects.
+SelectEvent, EVT_WAFER_MAP_SELECT = wx.lib.newevent.NewCommandEvent()
+
+
+class _GrowableAttribute(object):
+    """
+    A numpy array attribute backed by a :class:`wm_utils.GrowableArray`.
+
+    Reading the attribute gives the filled part of the array and assigning
+    to it replaces the array. The GrowableArray itself is stored as
+    ``<name>_buffer`` so that new items can be appended.
+    """
+
+    def __set_name__(self, owner, name):
+        self.buffer_name = name + "_buffer"
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return getattr(obj, self.buffer_name).data
+
+    def __set__(self, obj, value):
+        setattr(obj, self.buffer_name, wm_utils.GrowableArray(value))
+
+
 class WaferMapPanel(wx.Panel):
     """
     The Canvas that the wafer map resides on.
@@ -26,8 +59,14 @@ class WaferMapPanel(wx.Panel):
     ----------
     parent : :class:`wx.Panel`
         The panel that this panel belongs to, if any.
-    xyd : list of 3-tuples
-        The data to plot.
+    xyd : list of 3-tuples, or arrays
+        The data to plot. May be empty or partial if more die will be added
+        with :meth:`append_data` or :meth:`stream_data`. When empty,
+        ``plot_range`` (or ``discrete_legend_values`` for discrete data)
+        must be given. Instead of ``(grid_x, grid_y, value)`` tuples, may
+        be a ``(grid_x, grid_y, values)`` tuple of arrays, a structured
+        array, or a DataFrame; see :func:`wm_utils.xyd_to_arrays`. Arrays
+        are used without copying them and are never changed.
     wafer_info : :class:`wx_info.WaferInfo`
         The wafer information.
     data_type : :class:`wm_constants.DataType` or str, optional
@@ -59,8 +98,36 @@ class WaferMapPanel(wx.Panel):
         A list of strings for die bins. Every data value in ``xyd`` must
         be in this list. This will define the legend order. Only used when
         ``data_type`` is ``discrete``.
+    show_reticle_gridlines : bool, optional
+        If ``True``, displays gridlines along the reticle edges. Requires
+        ``wafer_info.reticle_size``. Defaults to ``False``.
+    render_mode : :class:`wm_constants.RenderMode` or str, optional
+        How to draw the die. ``RenderMode.RECTANGLE`` draws each die as its
+        own rectangle. ``RenderMode.RASTER`` draws all die as a single
+        scaled bitmap with one pixel per die, which keeps zoom and pan fast
+        no matter how many die there are, but does not draw die borders.
+        ``RenderMode.BATCHED`` draws all die with a single
+        :class:`DieCollection`, which keeps the die borders. Only
+        ``BATCHED`` has viewport culling and level of detail;
+        ``RECTANGLE`` always draws every die, so it gets slow on large
+        maps. ``RenderMode.AUTO`` uses ``BATCHED`` when there are more
+        than ``wm_constants.wm_AUTO_BATCHED_DIE`` die or when ``xyd`` is
+        empty, and ``RECTANGLE`` otherwise. The mode that was picked is in
+        :attr:`render_mode`. Defaults to ``RenderMode.AUTO``.
+    instrument : callable, optional
+        Called with a :class:`wm_instrument.Span` after each phase of
+        building and drawing the map, such as a
+        :class:`wm_instrument.Timings`. See :mod:`wafer_map.wm_instrument`
+        for the phases. Defaults to ``None``.
     """
 
+    # The die data, in the order that the die were given. Die streamed in by
+    # append_data() are appended to these in amortized O(1).
+    _grid_x = _GrowableAttribute()
+    _grid_y = _GrowableAttribute()
+    _values = _GrowableAttribute()
+    _colors = _GrowableAttribute()
+
     def __init__(
         self,
         parent,
@@ -75,6 +142,9 @@ class WaferMapPanel(wx.Panel):
         discrete_legend_values=None,
         show_die_gridlines=True,
         discrete_legend_colors=None,
+        render_mode=wm_const.RenderMode.AUTO,
+        show_reticle_gridlines=False,
+        instrument=None,
     ):
         wx.Panel.__init__(self, parent)
 
@@ -96,15 +166,48 @@ class WaferMapPanel(wx.Panel):
         self.discrete_legend_values = discrete_legend_values
         self.discrete_legend_colors = discrete_legend_colors
         self.die_gridlines_bool = show_die_gridlines
+        self.reticle_gridlines_bool = show_reticle_gridlines
+        # backwards compatability
+        if isinstance(render_mode, str):
+            render_mode = wm_const.RenderMode(render_mode)
+        self.render_mode = render_mode
+        self.instrument = instrument
 
         ### Other Attributes ################################################
-        self.xyd_dict = xyd_to_dict(self.xyd)  # data duplication!
+        self._grid_x, self._grid_y, self._values = wm_utils.xyd_to_arrays(self.xyd)
+        # Columnar values are the caller's array, or a view of it, so they
+        # are copied before the first in-place update.
+        self._values_owned = isinstance(self.xyd, list)
+        self._grid_index = wm_utils.GridIndex(self._grid_x, self._grid_y)
+        if self.render_mode == wm_const.RenderMode.AUTO:
+            # Maps that start empty are streamed into and may grow large.
+            die = len(self._values)
+            if die == 0 or die > wm_const.wm_AUTO_BATCHED_DIE:
+                self.render_mode = wm_const.RenderMode.BATCHED
+            else:
+                self.render_mode = wm_const.RenderMode.RECTANGLE
+        self._summary_stats = None
         self.drag = False
         self.wfr_outline_bool = True
         self.crosshairs_bool = True
-        self.reticle_gridlines_bool = False
         self.legend_bool = True
         self.die_centers = None
+        self.die_gridlines = None
+        self.reticle_gridlines = None
+        self._dirty_bb = None
+        self._repaint_pending = False
+        self.die_raster = None
+        self._raster_dirty = False
+        self.defects = None
+        self.defect_index = None
+        self.defect_classes = None
+        self.defects_bool = True
+        self.hover_defect = -1
+        self.selected = np.zeros(0, dtype=int)
+        self.selected_defects = np.zeros(0, dtype=int)
+        self._box_drag = None
+        self._stream_queue = None
+        self._stream_timer = None
 
         # timer to give a delay when moving so that buffers aren't
         # re-built too many times.
@@ -119,23 +222,26 @@ class WaferMapPanel(wx.Panel):
     def _init_ui(self):
         """Create the UI Elements and bind various events."""
         # Create items to add to our layout
-        self.canvas = FloatCanvas.FloatCanvas(
+        self.canvas = _InstrumentedCanvas(
             self,
             BackgroundColor="BLACK",
         )
+        self.canvas.instrument = self.instrument
 
         # Initialize the FloatCanvas. Needs to come before adding items!
         self.canvas.InitAll()
 
         # Create the legend
-        self._create_legend()
+        with wm_instrument.span(self.instrument, "create_legend"):
+            self._create_legend()
 
         # Draw the die and wafer objects (outline, crosshairs, etc) on the canvas
         self.draw_die()
         if self.plot_die_centers:
             self.die_centers = self.draw_die_center()
             self.canvas.AddObject(self.die_centers)
-        self.draw_wafer_objects()
+        with wm_instrument.span(self.instrument, "draw_wafer_objects"):
+            self.draw_wafer_objects()
 
         # Bind events to the canvas
         self._bind_events()
@@ -165,15 +271,19 @@ class WaferMapPanel(wx.Panel):
         self.canvas.Bind(FloatCanvas.EVT_MOUSEWHEEL, self.on_mouse_wheel)
         self.canvas.Bind(FloatCanvas.EVT_MIDDLE_DOWN, self.on_mouse_middle_down)
         self.canvas.Bind(FloatCanvas.EVT_MIDDLE_UP, self.on_mouse_middle_up)
+        # The FloatCanvas mouse events are raised by the canvas's own
+        # wx.EVT_LEFT_DOWN handler, which skips the wx event, so binding
+        # them doesn't cause Issue #24 (see below).
+        self.canvas.Bind(FloatCanvas.EVT_LEFT_DOWN, self.on_mouse_left_down)
+        self.canvas.Bind(FloatCanvas.EVT_LEFT_UP, self.on_mouse_left_up)
+        self.canvas.Bind(FloatCanvas.EVT_RIGHT_DOWN, self.on_mouse_right_down)
+        self.canvas.Bind(FloatCanvas.EVT_RIGHT_UP, self.on_mouse_right_up)
         self.canvas.Bind(wx.EVT_PAINT, self._on_first_paint)
         # XXX: Binding the EVT_LEFT_DOWN seems to cause Issue #24.
         #      What seems to happen is: If I bind EVT_LEFT_DOWN, then the
         #      parent panel or application can't set focus to this
         #      panel, which prevents the EVT_MOUSEWHEEL event from firing
         #      properly.
-        #  self.canvas.Bind(wx.EVT_LEFT_DOWN, self.on_mouse_left_down)
-        #  self.canvas.Bind(wx.EVT_RIGHT_DOWN, self.on_mouse_right_down)
-        #  self.canvas.Bind(wx.EVT_LEFT_UP, self.on_mouse_left_up)
         #  self.canvas.Bind(wx.EVT_KEY_DOWN, self._on_key_down)
 
         # This is supposed to fix flicker on mouse move, but it doesn't work.
@@ -186,13 +296,23 @@ class WaferMapPanel(wx.Panel):
         """
         Create the legend.
 
-        For Continuous data, uses min(data) and max(data) for plot range.
-
-        Might change to 5th percentile and 95th percentile.
+        For Continuous data, uses the 2nd and 98th percentiles of the data
+        for the plot range, from :meth:`summary_stats`.
         """
+        if len(self._values) == 0:
+            # Streaming into an empty map: there's no data to size the
+            # legend from.
+            if self.data_type == wm_const.DataType.DISCRETE:
+                if self.discrete_legend_values is None:
+                    raise ValueError(
+                        "discrete_legend_values must be given when xyd is empty"
+                    )
+            elif self.plot_range is None:
+                raise ValueError("plot_range must be given when xyd is empty")
+
         if self.data_type == wm_const.DataType.DISCRETE:
             if self.discrete_legend_values is None:
-                unique_items = list({_die[2] for _die in self.xyd})
+                unique_items = list(set(self._values.tolist()))
             else:
                 unique_items = self.discrete_legend_values
             self.legend = wm_legend.DiscreteLegend(
@@ -202,72 +322,575 @@ class WaferMapPanel(wx.Panel):
             )
         else:
             if self.plot_range is None:
-                p_98 = float(wm_utils.nanpercentile([_i[2] for _i in self.xyd], 98))
-                p_02 = float(wm_utils.nanpercentile([_i[2] for _i in self.xyd], 2))
-
-                data_min = min([die[2] for die in self.xyd])
-                data_max = max([die[2] for die in self.xyd])
-                self.plot_range = (data_min, data_max)
-                self.plot_range = (p_02, p_98)
+                self.plot_range = self.summary_stats().percentiles
 
             self.legend = wm_legend.ContinuousLegend(
                 self,
                 self.plot_range,
                 self.high_color,
                 self.low_color,
+                instrument=self.instrument,
+            )
+
+    def summary_stats(self):
+        """
+        Return the :class:`wm_utils.SummaryStats` of the die values.
+
+        The percentiles are ``wm_constants.wm_PLOT_RANGE_PERCENTILES``. The
+        statistics are computed once and kept until the die values change,
+        so changing the plot range or colors doesn't compute them again.
+        Only for continuous data.
+        """
+        if self._summary_stats is None:
+            self._summary_stats = wm_utils.summary_stats(
+                self._values, wm_const.wm_PLOT_RANGE_PERCENTILES
             )
+        return self._summary_stats
 
     def _clear_canvas(self):
         """Clear the canvas."""
         self.canvas.ClearAll(ResetBB=False)
 
+    def _color_all_die(self):
+        """
+        Color every die in a single pass.
+
+        The colors are kept in the :func:`wm_cache.get_cache` cache, so
+        reopening the same wafer doesn't color it again.
+        """
+        with wm_instrument.span(self.instrument, "color_die", die=len(self._values)):
+            return self._color_all_die_cached()
+
+    def _color_all_die_cached(self):
+        """Color every die, using the cache if there is one."""
+        colors = wm_cache.die_colors(self._values, self.data_type, self.legend)
+        if not colors.flags.writeable:
+            # Cached arrays are read-only, but die colors are updated in place.
+            colors = np.array(colors)
+        return colors
+
     def draw_die(self):
         """Draw and add the die on the canvas."""
-        color_dict = None
-        for die in self.xyd:
-            # define the die color
-            if self.data_type == wm_const.DataType.DISCRETE:
-                color_dict = self.legend.color_dict
-                color = color_dict[die[2]]
-            else:
-                color = self.legend.get_color(die[2])
+        colors = self._color_all_die()
+        self._colors = colors
+
+        with wm_instrument.span(self.instrument, "draw_die") as info:
+            if self.render_mode == wm_const.RenderMode.RASTER:
+                self.draw_die_raster(colors)
+                info["objects"] = int(self.die_raster is not None)
+                return
+            elif self.render_mode == wm_const.RenderMode.BATCHED:
+                self.draw_die_batched(colors)
+                info["objects"] = 1
+                return
+
+            self.draw_die_rectangles(colors)
+            info["objects"] = len(self.die_rects)
+
+    def draw_die_rectangles(self, colors):
+        """
+        Draw and add each die on the canvas as its own rectangle.
+
+        Parameters
+        ----------
+        colors : :class:`numpy.ndarray`
+            A ``(N, 3)`` array of die colors, in the same order as ``xyd``.
+        """
+        # FloatCanvas caches pens and brushes keyed by color, so the colors
+        # need to be hashable.
+        colors = [tuple(_c) for _c in colors.tolist()]
 
+        self.die_rects = []
+        grid_xy = zip(self._grid_x.tolist(), self._grid_y.tolist())
+        for die, color in zip(grid_xy, colors):
             # Determine the die's lower-left coordinate
             lower_left_coord = wm_utils.grid_to_rect_coord(
-                die[:2], self.die_size, self.grid_center
+                die, self.die_size, self.grid_center
             )
 
             # Draw the die on the canvas
-            self.canvas.AddRectangle(
+            rect = self.canvas.AddRectangle(
                 lower_left_coord,
                 self.die_size,
                 LineWidth=1,
                 FillColor=color,
             )
+            self.die_rects.append(rect)
 
-    def draw_die_center(self):
-        """Plot the die centers as a small dot."""
-        centers = []
-        for die in self.xyd:
-            # Determine the die's lower-left coordinate
-            lower_left_coord = wm_utils.grid_to_rect_coord(
-                die[:2], self.die_size, self.grid_center
+    def recolor_die(self):
+        """
+        Update the die colors without rebuilding anything else.
+
+        The die objects that are already on the canvas are kept and only
+        their fill colors are changed. The canvas is not redrawn.
+        """
+        with wm_instrument.span(self.instrument, "recolor") as info:
+            colors = self._color_all_die()
+
+            if self.render_mode == wm_const.RenderMode.BATCHED:
+                # Start a fresh palette so that unused colors don't pile up.
+                self.die_collection.set_colors(*wm_utils.palettize(colors))
+                info["changed"] = len(colors)
+            else:
+                # Only touch the die whose color actually changed.
+                changed = np.flatnonzero((colors != self._colors).any(axis=1))
+                self._set_die_colors(changed, colors[changed])
+                self._flush_raster()
+                info["changed"] = len(changed)
+
+            self._colors = colors
+
+    def set_values(self, values):
+        """
+        Replace the value of every die.
+
+        See :meth:`update_data`.
+
+        Parameters
+        ----------
+        values : array-like
+            The new die values, in the same order as ``xyd``.
+        """
+        values = np.asarray(values)
+        if values.shape != self._values.shape:
+            raise ValueError(
+                "Expected {} values, got {}".format(len(self._values), len(values))
+            )
+        self._apply_values(np.arange(len(values)), values)
+
+    def update_data(self, xyd):
+        """
+        Change the values of some die.
+
+        Only the die whose color changed are recolored, and only the part
+        of the canvas that they cover is repainted. Repaints are deferred
+        until the GUI is idle, so many updates in a row only cost a single
+        repaint.
+
+        The legend is not changed: continuous values outside of the plot
+        range use the out-of-range colors, and discrete values must already
+        be in the legend.
+
+        Parameters
+        ----------
+        xyd : list of 3-tuples, or arrays
+            The ``(grid_x, grid_y, value)`` of each die to update. Every die
+            must already be on the wafer map.
+        """
+        grid_x, grid_y, values = wm_utils.xyd_to_arrays(xyd)
+        positions = self._grid_index.lookup_array(grid_x, grid_y)
+        if (positions < 0).any():
+            missing = np.flatnonzero(positions < 0)[0]
+            raise ValueError(
+                "Die x{}y{} is not on the wafer map".format(
+                    grid_x[missing], grid_y[missing]
+                )
             )
+        self._apply_values(positions, values)
+
+    def _apply_values(self, positions, values):
+        """Store new die values and recolor and repaint the changed die."""
+        changed = wm_utils.values_changed(self._values[positions], values)
+        positions = positions[changed]
+        values = values[changed]
+        if len(positions) == 0:
+            return
+        self._summary_stats = None
+
+        # Make room for values that the current dtype can't hold, such as
+        # floats in an int array or longer bin names.
+        dtype = np.result_type(self._values, values)
+        if dtype != self._values.dtype or not self._values_owned:
+            self._values = self._values.astype(dtype)
+            self._values_owned = True
+        self._values[positions] = values
+
+        colors = self.legend.get_colors(values)
+        recolor = (colors != self._colors[positions]).any(axis=1)
+        positions = positions[recolor]
+        colors = colors[recolor]
+        if len(positions) == 0:
+            return
+
+        self._colors[positions] = colors
+        self._set_die_colors(positions, colors)
+        self._invalidate_die(positions)
+
+    def _set_die_colors(self, positions, colors):
+        """Set the colors of the die objects at ``positions``."""
+        if len(positions) == 0:
+            return
 
-            # then adjust back to the die center
-            lower_left_coord = (
-                lower_left_coord[0] + self.die_size[0] / 2,
-                lower_left_coord[1] + self.die_size[1] / 2,
+        if self.render_mode == wm_const.RenderMode.RASTER:
+            # New die may fill holes, which are transparent, so this sets
+            # the alpha too.
+            wm_utils.paint_die(
+                self._raster_image,
+                self._raster_origin,
+                self._grid_x[positions],
+                self._grid_y[positions],
+                colors,
             )
+            # The bitmap is rebuilt once per repaint, not once per update.
+            self._raster_dirty = True
+        elif self.render_mode == wm_const.RenderMode.BATCHED:
+            self.die_collection.update_colors(positions, colors)
+        else:
+            for _i, color in zip(positions.tolist(), colors.tolist()):
+                self.die_rects[_i].SetFillColor(tuple(color))
 
-            circ = FloatCanvas.Circle(
-                lower_left_coord,
-                0.5,
-                FillColor=wm_const.wm_DIE_CENTER_DOT_COLOR,
+    def _flush_raster(self):
+        """Rebuild the die bitmap if die colors changed since it was built."""
+        if not self._raster_dirty:
+            return
+        self._raster_dirty = False
+        rows, cols = self._raster_image.shape[:2]
+        self.die_raster.set_bitmap(
+            wx.Bitmap.FromBufferRGBA(cols, rows, self._raster_image)
+        )
+
+    def append_data(self, xyd):
+        """
+        Add die results to the map.
+
+        New die are appended to the map and drawn without rebuilding
+        anything else. Die that are already on the map are updated as in
+        :meth:`update_data`. Like :meth:`update_data`, the legend is not
+        changed and only the affected part of the canvas is repainted.
+
+        Parameters
+        ----------
+        xyd : list of 3-tuples, or arrays
+            The ``(grid_x, grid_y, value)`` of each die.
+        """
+        grid_x, grid_y, values = wm_utils.xyd_to_arrays(xyd)
+        if len(grid_x) == 0:
+            return
+        positions = self._grid_index.lookup_array(grid_x, grid_y)
+
+        existing = positions >= 0
+        if existing.any():
+            self._apply_values(positions[existing], values[existing])
+
+        new = ~existing
+        if not new.any():
+            return
+        grid_x, grid_y, values = grid_x[new], grid_y[new], values[new]
+
+        # A new die may be in the batch more than once. Keep the last one.
+        reversed_xy = np.column_stack((grid_x, grid_y))[::-1]
+        _, first = np.unique(reversed_xy, axis=0, return_index=True)
+        last = np.sort(len(grid_x) - 1 - first)
+        grid_x, grid_y, values = grid_x[last], grid_y[last], values[last]
+
+        colors = self.legend.get_colors(values)
+        start = len(self._values)
+        positions = np.arange(start, start + len(grid_x))
+
+        self._grid_x_buffer.extend(grid_x)
+        self._grid_y_buffer.extend(grid_y)
+        self._values_buffer.extend(values)
+        self._summary_stats = None
+        # Extending the caller's array always reallocates it.
+        self._values_owned = True
+        self._colors_buffer.extend(colors)
+        self._grid_index.add(grid_x, grid_y, positions)
+
+        self._draw_new_die(positions, colors)
+        if self.die_centers is not None:
+            self.die_centers.SetPoints(self._die_center_coords())
+        self._invalidate_die(positions)
+
+    def _draw_new_die(self, positions, colors):
+        """Draw die that were just appended to the die arrays."""
+        if self.render_mode == wm_const.RenderMode.RASTER:
+            raster_extent = None
+            if self.die_raster is not None:
+                rows, cols = self._raster_image.shape[:2]
+                x_min, y_min = self._raster_origin
+                raster_extent = (x_min, y_min, x_min + cols - 1, y_min + rows - 1)
+            if raster_extent == self._grid_index.extent:
+                self._set_die_colors(positions, colors)
+            else:
+                # Cover the whole index, which grows with headroom, so that
+                # the bitmap is rebuilt as rarely as the index is.
+                self.draw_die_raster(self._colors, self._grid_index.extent)
+            return
+
+        lower_left_coords = np.column_stack(
+            wm_utils.grid_to_rect_coord(
+                (self._grid_x[positions], self._grid_y[positions]),
+                self.die_size,
+                self.grid_center,
+            )
+        )
+
+        if self.render_mode == wm_const.RenderMode.BATCHED:
+            self.die_collection.append(lower_left_coords, self.die_size, colors)
+            return
+
+        draw_list = self.canvas._DrawList
+        for coord, color in zip(lower_left_coords.tolist(), colors.tolist()):
+            rect = self.canvas.AddRectangle(
+                coord,
+                self.die_size,
+                LineWidth=1,
+                FillColor=tuple(color),
+            )
+            # Move it down with the other die so that it stays under the
+            # wafer outline and gridlines.
+            draw_list.insert(len(self.die_rects), draw_list.pop())
+            self.die_rects.append(rect)
+
+    def stream_data(self, source, interval=wm_const.wm_STREAM_INTERVAL_MS):
+        """
+        Append die results from ``source`` as they arrive.
+
+        Items are collected every ``interval`` ms and appended to the map
+        in a single :meth:`append_data` call, so a fast source only costs
+        one repaint per interval.
+
+        Parameters
+        ----------
+        source : :class:`queue.Queue` or iterable
+            Where the die come from. Each item is either a single
+            ``(grid_x, grid_y, value)`` tuple or a list of them. A queue is
+            polled without blocking and the stream ends when ``None`` is
+            put on it. Any other iterable, such as a generator that waits
+            on the prober, is read in a background thread and the stream
+            ends when it is exhausted.
+        interval : int, optional
+            How often, in ms, to add the new die to the map. Defaults to
+            ``wm_constants.wm_STREAM_INTERVAL_MS``.
+        """
+        self.stop_stream()
+
+        if isinstance(source, queue.Queue):
+            self._stream_queue = source
+        else:
+            self._stream_queue = queue.Queue()
+            thread = threading.Thread(
+                target=_feed_queue,
+                args=(source, self._stream_queue),
+                daemon=True,
+            )
+            thread.start()
+
+        self._stream_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self._on_stream_timer, self._stream_timer)
+        self._stream_timer.Start(interval)
+
+    def stop_stream(self):
+        """Stop reading from the source given to :meth:`stream_data`."""
+        if self._stream_timer is not None:
+            self._stream_timer.Stop()
+            self.Unbind(wx.EVT_TIMER, source=self._stream_timer)
+        self._stream_timer = None
+        self._stream_queue = None
+
+    def _on_stream_timer(self, event):
+        """Append everything that has arrived since the last tick."""
+        batch = []
+        done = False
+        while len(batch) < wm_const.wm_STREAM_MAX_BATCH:
+            try:
+                item = self._stream_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                done = True
+                break
+            if len(item) == 3 and np.isscalar(item[0]):
+                batch.append(item)
+            else:
+                batch.extend(item)
+
+        if batch:
+            self.append_data(batch)
+        if done:
+            self.stop_stream()
+
+    def _invalidate_die(self, positions):
+        """Mark the canvas region covered by the die at ``positions`` dirty."""
+        lower_left = np.column_stack(
+            wm_utils.grid_to_rect_coord(
+                (self._grid_x[positions], self._grid_y[positions]),
+                self.die_size,
+                self.grid_center,
+            )
+        )
+        bb = np.array(
+            (lower_left.min(axis=0), (lower_left + self.die_size).max(axis=0))
+        )
+        if self._dirty_bb is not None:
+            bb = np.array(
+                (
+                    np.minimum(bb[0], self._dirty_bb[0]),
+                    np.maximum(bb[1], self._dirty_bb[1]),
+                )
+            )
+        self._dirty_bb = bb
+
+        if not self._repaint_pending:
+            self._repaint_pending = True
+            wx.CallAfter(self._repaint_dirty)
+
+    def _repaint_dirty(self):
+        """
+        Repaint only the dirty part of the canvas.
+
+        The region is redrawn straight into the canvas's buffer and then
+        refreshed on screen, rather than redrawing the whole canvas.
+        """
+        # The panel may have been destroyed before we were called.
+        if not self:
+            return
+
+        self._repaint_pending = False
+        self._flush_raster()
+        world_bb, self._dirty_bb = self._dirty_bb, None
+        canvas = self.canvas
+        viewport = getattr(canvas, "ViewPortBB", None)
+        buffer = getattr(canvas, "_Buffer", None)
+        if world_bb is None or viewport is None or buffer is None:
+            # Never been drawn: the first draw will pick up the new colors.
+            return
+        if canvas._ForeDrawList:
+            # The foreground buffer would need rebuilding too.
+            canvas.Draw(True)
+            return
+
+        world_bb = BBox.asBBox(world_bb)
+        if not world_bb.Overlaps(BBox.asBBox(viewport)):
+            # Off screen. The buffer is rebuilt on the next zoom or pan.
+            return
+
+        # Pad by a few pixels to cover the die borders.
+        pad = 2
+        corners = canvas.WorldToPixel(world_bb)
+        x0, y0 = np.maximum(corners.min(axis=0) - pad, 0)
+        x1, y1 = np.minimum(corners.max(axis=0) + pad, canvas.PanelSize)
+        if x1 <= x0 or y1 <= y0:
+            return
+        rect = wx.Rect(int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+        region_bb = BBox.fromPoints(canvas.PixelToWorld(((x0, y0), (x1, y1))))
+
+        with wm_instrument.span(self.instrument, "repaint") as info:
+            dc = wx.MemoryDC(buffer)
+            dc.SetClippingRegion(rect)
+            dc.SetPen(wx.TRANSPARENT_PEN)
+            dc.SetBrush(canvas.BackgroundBrush)
+            dc.DrawRectangle(rect)
+
+            # Our draw objects cull themselves to the viewport, so narrow it
+            # to the dirty region while redrawing.
+            canvas.ViewPortBB = region_bb
+            info["objects"] = 0
+            try:
+                for obj in canvas._DrawList:
+                    if obj.Visible and obj.BoundingBox.Overlaps(region_bb):
+                        obj._Draw(dc, canvas.WorldToPixel, canvas.ScaleWorldToPixel)
+                        info["objects"] += 1
+            finally:
+                canvas.ViewPortBB = viewport
+            dc.SelectObject(wx.NullBitmap)
+
+        canvas.RefreshRect(rect, eraseBackground=False)
+
+    def draw_die_batched(self, colors):
+        """
+        Draw and add the die on the canvas as a single DieCollection.
+
+        Parameters
+        ----------
+        colors : :class:`numpy.ndarray`
+            A ``(N, 3)`` array of die colors, in the same order as ``xyd``.
+        """
+        lower_left_coords = np.column_stack(
+            wm_utils.grid_to_rect_coord(
+                (self._grid_x, self._grid_y), self.die_size, self.grid_center
             )
-            centers.append(circ)
+        )
+        palette, color_index = wm_utils.palettize(colors)
 
-        return FloatCanvas.Group(centers)
+        self.die_collection = DieCollection(
+            lower_left_coords,
+            self.die_size,
+            color_index,
+            palette,
+            LineWidth=1,
+        )
+        self.canvas.AddObject(self.die_collection)
+
+    def draw_die_raster(self, colors, extent=None):
+        """
+        Draw and add the die on the canvas as a single scaled bitmap.
+
+        If the die are already drawn, the bitmap is replaced instead.
+
+        Parameters
+        ----------
+        colors : :class:`numpy.ndarray`
+            A ``(N, 3)`` array of die colors, in the same order as ``xyd``.
+        extent : tuple, optional
+            The ``(x_min, y_min, x_max, y_max)`` grid coordinates for the
+            bitmap to cover. Defaults to the bounding box of the die.
+        """
+        if len(colors) == 0:
+            return
+
+        image, origin = wm_utils.rasterize_die(
+            self._grid_x, self._grid_y, colors, extent
+        )
+        rows, cols = image.shape[:2]
+        bitmap = wx.Bitmap.FromBufferRGBA(cols, rows, image)
+        # Kept so that single die can be recolored.
+        self._raster_image = image
+        self._raster_origin = origin
+        self._raster_dirty = False
+
+        # The bitmap is placed by its top-left corner, which is the top edge
+        # of the die at the origin.
+        lower_left_coord = wm_utils.grid_to_rect_coord(
+            origin, self.die_size, self.grid_center
+        )
+        top_left_coord = (
+            lower_left_coord[0],
+            lower_left_coord[1] + self.die_size[1],
+        )
+        height = rows * self.die_size[1]
+        width = cols * self.die_size[0]
+
+        if self.die_raster is not None:
+            self.die_raster.set_bitmap(bitmap, top_left_coord, height, width)
+            return
+
+        self.die_raster = DieRaster(
+            bitmap,
+            top_left_coord,
+            Height=height,
+            Width=width,
+            Position="tl",
+        )
+        self.canvas.AddObject(self.die_raster)
+        # Keep the die underneath everything else if other objects are
+        # already on the canvas.
+        draw_list = self.canvas._DrawList
+        draw_list.insert(0, draw_list.pop())
+
+    def draw_die_center(self):
+        """Plot the die centers as a small dot."""
+        return DieCenters(self._die_center_coords(), self.die_size)
+
+    def _die_center_coords(self):
+        """Return a ``(N, 2)`` array of the die center coordinates."""
+        # Same transform as the die rectangles, then shift to the center.
+        lower_left_coords = np.column_stack(
+            wm_utils.grid_to_rect_coord(
+                (self._grid_x, self._grid_y), self.die_size, self.grid_center
+            )
+        )
+        return lower_left_coords + np.asarray(self.die_size, dtype=float) / 2
 
     def draw_wafer_objects(self):
         """Draw and add the various wafer objects."""
@@ -278,6 +901,12 @@ class WaferMapPanel(wx.Panel):
         if self.die_gridlines_bool:
             self.die_gridlines = draw_die_gridlines(self.wafer_info)
             self.canvas.AddObject(self.die_gridlines)
+        if self.reticle_gridlines_bool:
+            self.reticle_gridlines = draw_reticle_gridlines(self.wafer_info)
+            if self.reticle_gridlines is None:
+                self.reticle_gridlines_bool = False
+            else:
+                self.canvas.AddObject(self.reticle_gridlines)
         self.crosshairs = draw_crosshairs(self.wafer_info.dia, dot=False)
         self.canvas.AddObject(self.crosshairs)
 
@@ -285,6 +914,116 @@ class WaferMapPanel(wx.Panel):
         """Zoom so that everything is displayed."""
         self.canvas.ZoomToBB()
 
+    def zoom(self, factor, pos=None):
+        """
+        Zoom in or out, keeping one point of the canvas still.
+
+        Parameters
+        ----------
+        factor : float
+            How much to zoom. ``factor > 1`` zooms in and ``factor < 1``
+            zooms out.
+        pos : tuple, optional
+            The ``(x, y)`` pixel position, relative to the canvas, that
+            stays under the mouse. If ``None``, uses the center of the
+            canvas. Defaults to ``None``.
+        """
+        if pos is None:
+            width, height = self.canvas.GetClientSize()
+            pos = (width // 2, height // 2)
+
+        # Changes to FloatCanvas.Zoom mean we need to do the following
+        # rather than calling the zoom() function.
+        # Note that SetToNewScale() changes the pixel center (?). This is why
+        # we can call PixelToWorld(pos) again and get a different value!
+        oldpoint = self.canvas.PixelToWorld(pos)
+        self.canvas.Scale = self.canvas.Scale * factor
+        self.canvas.SetToNewScale(False)  # sets new scale but no redraw
+        newpoint = self.canvas.PixelToWorld(pos)
+        delta = newpoint - oldpoint
+        self.canvas.MoveImage(-delta, "World")  # performs the redraw
+
+    def zoom_to_box(self, corner1, corner2):
+        """
+        Zoom so that a box fills the canvas.
+
+        Parameters
+        ----------
+        corner1, corner2 : tuple
+            Opposite corners of the box, as ``(x, y)`` world coordinates.
+        """
+        self.canvas.ZoomToBB(BBox.fromPoints(np.array((corner1, corner2), dtype=float)))
+
+    def zoom_out_box(self, corner1, corner2):
+        """
+        Zoom out so that what the canvas shows now fits in a box.
+
+        Parameters
+        ----------
+        corner1, corner2 : tuple
+            Opposite corners of the box, as ``(x, y)`` world coordinates.
+            Does nothing if the box has no area.
+        """
+        corners = np.array((corner1, corner2), dtype=float)
+        box_w, box_h = np.abs(corners[1] - corners[0]) * self.canvas.Scale
+        width, height = self.canvas.GetClientSize()
+        factor = min(box_w / width, box_h / height)
+        if factor <= 0:
+            return
+
+        # Move the view so that its old center ends up in the box's center.
+        center = (width // 2, height // 2)
+        old_center = self.canvas.PixelToWorld(center)
+        new_center = old_center - (corners.mean(axis=0) - old_center) / factor
+        self.canvas.Scale = self.canvas.Scale * factor
+        self.canvas.SetToNewScale(False)  # sets new scale but no redraw
+        self.canvas.MoveImage(new_center - self.canvas.PixelToWorld(center), "World")
+
+    def select_box(self, corner1, corner2):
+        """
+        Select the die and defects in a box.
+
+        Only the part of the die index and the defect index inside the box
+        is searched, so it takes about the same time for any size of wafer.
+        Posts an ``EVT_WAFER_MAP_SELECT`` event.
+
+        Parameters
+        ----------
+        corner1, corner2 : tuple
+            Opposite corners of the box, as ``(x, y)`` world coordinates.
+
+        Returns
+        -------
+        positions : :class:`numpy.ndarray`
+            The position in the data of each die that the box touches. Also
+            stored in :attr:`selected`, and the positions of the shown
+            defects in the box in :attr:`selected_defects`.
+        """
+        x0, y0 = wm_utils.coord_to_grid(corner1, self.die_size, self.grid_center)
+        x1, y1 = wm_utils.coord_to_grid(corner2, self.die_size, self.grid_center)
+        self.selected = self._grid_index.query_box(x0, y0, x1, y1)
+        if self.defect_index is not None and self.defects_bool:
+            self.selected_defects = self.defect_index.query_box(
+                corner1[0], corner1[1], corner2[0], corner2[1]
+            )
+        else:
+            self.selected_defects = np.zeros(0, dtype=int)
+
+        event = SelectEvent(
+            self.GetId(), positions=self.selected, defects=self.selected_defects
+        )
+        wx.PostEvent(self, event)
+        return self.selected
+
+    def pan(self, delta):
+        """
+        Move the view by ``delta``, an ``(x, y)`` distance in pixels.
+
+        Positive values move the view right and down, so the wafer moves
+        left and up.
+        """
+        self.canvas.MoveImage(np.asarray(delta), "Pixel", ReDraw=True)
+
     def toggle_outline(self):
         """Toggle the wafer outline and edge exclusion on and off."""
         if self.wfr_outline_bool:
@@ -311,10 +1050,27 @@ class WaferMapPanel(wx.Panel):
             self.canvas.RemoveObject(self.die_gridlines)
             self.die_gridlines_bool = False
         else:
+            if self.die_gridlines is None:
+                self.die_gridlines = draw_die_gridlines(self.wafer_info)
             self.canvas.AddObject(self.die_gridlines)
             self.die_gridlines_bool = True
         self.canvas.Draw()
 
+    def toggle_reticle_gridlines(self):
+        """Toggle the reticle gridlines on and off."""
+        if self.reticle_gridlines_bool:
+            self.canvas.RemoveObject(self.reticle_gridlines)
+            self.reticle_gridlines_bool = False
+        else:
+            if self.reticle_gridlines is None:
+                self.reticle_gridlines = draw_reticle_gridlines(self.wafer_info)
+            if self.reticle_gridlines is None:
+                # The wafer doesn't have a reticle size.
+                return
+            self.canvas.AddObject(self.reticle_gridlines)
+            self.reticle_gridlines_bool = True
+        self.canvas.Draw()
+
     def toggle_die_centers(self):
         """Toggle the die centers on and off."""
         if self.die_centers is None:
@@ -328,6 +1084,58 @@ class WaferMapPanel(wx.Panel):
             self.plot_die_centers = True
         self.canvas.Draw()
 
+    def set_defects(self, x, y, classes=None, class_colors=None):
+        """
+        Draw defects on top of the die, replacing any that were set before.
+
+        All defects are drawn as one :class:`DefectMarkers`, colored by
+        class. Hovering over a defect shows it in the status bar.
+
+        Parameters
+        ----------
+        x, y : array-like
+            The defect positions in mm from the wafer center, such as from
+            :class:`wafer_map.wm_klarf.KlarfWafer`.
+        classes : array-like, optional
+            The class of each defect, such as its name. If ``None``, all
+            defects are one class. Defaults to ``None``.
+        class_colors : dict, optional
+            ``{class: RGB tuple}``. Classes that aren't given get colors
+            from :func:`wm_utils.create_discrete_colors`.
+        """
+        x = np.asarray(x, dtype=float).ravel()
+        y = np.asarray(y, dtype=float).ravel()
+        if classes is None:
+            classes = np.zeros(x.size, dtype=int)
+        names, class_index = np.unique(np.asarray(classes).ravel(), return_inverse=True)
+        palette = wm_utils.create_discrete_colors(len(names)) if len(names) else []
+        class_colors = class_colors or {}
+        palette = [
+            class_colors.get(_name, _color)
+            for _name, _color in zip(names.tolist(), palette)
+        ]
+
+        if self.defects is not None and self.defects_bool:
+            self.canvas.RemoveObject(self.defects)
+        self.defects = DefectMarkers(np.column_stack((x, y)), class_index, palette)
+        self.defect_index = wm_utils.PointIndex(x, y)
+        self.defect_classes = names[class_index]
+        self.hover_defect = -1
+        if self.defects_bool:
+            self.canvas.AddObject(self.defects)
+        self.canvas.Draw(True)
+
+    def toggle_defects(self):
+        """Toggle the defects on and off."""
+        self.defects_bool = not self.defects_bool
+        if self.defects is None:
+            return
+        if self.defects_bool:
+            self.canvas.AddObject(self.defects)
+        else:
+            self.canvas.RemoveObject(self.defects)
+        self.canvas.Draw(True)
+
     def toggle_legend(self):
         """Toggle the legend on and off."""
         if self.legend_bool:
@@ -364,6 +1172,9 @@ class WaferMapPanel(wx.Panel):
             C:      Toggle wafer crosshairs
             L:      Toggle the legend
             D:      Toggle die centers
+            G:      Toggle die gridlines
+            R:      Toggle reticle gridlines
+            F:      Toggle defects
         """
         # TODO: Decide if I want to move this to a class attribute
         keycodes = {
@@ -377,6 +1188,12 @@ class WaferMapPanel(wx.Panel):
             76: self.toggle_legend,
             # "D"
             68: self.toggle_die_centers,
+            # "G"
+            71: self.toggle_die_gridlines,
+            # "R"
+            82: self.toggle_reticle_gridlines,
+            # "F"
+            70: self.toggle_defects,
         }
 
         #  print("panel event!")
@@ -398,15 +1215,12 @@ class WaferMapPanel(wx.Panel):
 
     def on_color_change(self, event):
         """Update the wafer map canvas with the new color."""
-        self._clear_canvas()
         if self.data_type == wm_const.DataType.CONTINUOUS:
             # call the continuous legend on_color_change() code
             self.legend.on_color_change(event)
-        self.draw_die()
-        if self.plot_die_centers:
-            self.die_centers = self.draw_die_center()
-            self.canvas.AddObject(self.die_centers)
-        self.draw_wafer_objects()
+        # The die geometry, outline, and gridlines don't change, so only
+        # the die colors need to be updated.
+        self.recolor_die()
         self.canvas.Draw(True)
         #  self.canvas.Unbind(FloatCanvas.EVT_MOUSEWHEEL)
         #  self.canvas.Bind(FloatCanvas.EVT_MOUSEWHEEL, self.on_mouse_wheel)
@@ -435,17 +1249,7 @@ class WaferMapPanel(wx.Panel):
         #   factor < 1: zoom out. factor > 1: zoom in
         sign = abs(speed) / speed
         factor = (abs(speed) * wm_const.wm_ZOOM_FACTOR) ** sign
-
-        # Changes to FloatCanvas.Zoom mean we need to do the following
-        # rather than calling the zoom() function.
-        # Note that SetToNewScale() changes the pixel center (?). This is why
-        # we can call PixelToWorld(pos) again and get a different value!
-        oldpoint = self.canvas.PixelToWorld(pos)
-        self.canvas.Scale = self.canvas.Scale * factor
-        self.canvas.SetToNewScale(False)  # sets new scale but no redraw
-        newpoint = self.canvas.PixelToWorld(pos)
-        delta = newpoint - oldpoint
-        self.canvas.MoveImage(-delta, "World")  # performs the redraw
+        self.zoom(factor, pos)
 
     def on_mouse_move(self, event):
         """Update the status bar with the world coordinates."""
@@ -461,12 +1265,11 @@ class WaferMapPanel(wx.Panel):
         )
 
         # lookup the die value
-        grid = "x{}y{}"
-        die_grid = grid.format(dc_x, dc_y)
-        try:
-            die_val = self.xyd_dict[die_grid]
-        except KeyError:
+        die_pos = self._grid_index.lookup(dc_x, dc_y)
+        if die_pos < 0:
             die_val = "N/A"
+        else:
+            die_val = self._values.item(die_pos)
 
         # create the status bar string
         coord_str = "{x:0.3f}, {y:0.3f}"
@@ -487,12 +1290,20 @@ class WaferMapPanel(wx.Panel):
         status_str = "Die {d_grid} :: Radius = {d_rad:0.3f} :: Value = {d_val}   "
         status_str += "Mouse {m_coord} :: Radius = {m_rad:0.3f}"
         status_str = status_str.format(
-            d_grid=die_grid,  # grid
+            d_grid="x{}y{}".format(dc_x, dc_y),  # grid
             d_val=die_val,  # value
             d_rad=die_radius,  # radius
             m_coord=mouse_coord,  # coord
             m_rad=mouse_radius,  # radius
         )
+        self.hover_defect = self._nearest_defect(event.Coords)
+        if self.hover_defect >= 0:
+            status_str += "   Defect {} ({}) at ({:0.3f}, {:0.3f})".format(
+                self.hover_defect,
+                self.defect_classes[self.hover_defect],
+                self.defect_index.x[self.hover_defect],
+                self.defect_index.y[self.hover_defect],
+            )
         try:
             parent.SetStatusText(status_str)
         except:  # TODO: put in exception types.
@@ -502,12 +1313,25 @@ class WaferMapPanel(wx.Panel):
         if self.drag:
             self.end_move_loc = np.array(event.GetPosition())
             self.diff_loc = self.mid_move_loc - self.end_move_loc
-            self.canvas.MoveImage(self.diff_loc, "Pixel", ReDraw=True)
+            self.pan(self.diff_loc)
             self.mid_move_loc = self.end_move_loc
 
             # doesn't appear to do anything...
             self.move_timer.Start(30, oneShot=True)
 
+        if self._box_drag is not None:
+            self._update_box(event.Coords)
+
+    def _nearest_defect(self, coords):
+        """
+        Return the position of the shown defect nearest to ``coords``, or
+        `-1` if none is within ``wm_constants.wm_DEFECT_HOVER_PX``.
+        """
+        if self.defect_index is None or not self.defects_bool:
+            return -1
+        max_distance = wm_const.wm_DEFECT_HOVER_PX / self.canvas.Scale
+        return self.defect_index.nearest(coords[0], coords[1], max_distance)
+
     def on_mouse_middle_down(self, event):
         """Start the drag."""
         self.drag = True
@@ -529,33 +1353,664 @@ class WaferMapPanel(wx.Panel):
         if self.start_move_loc is not None:
             self.end_move_loc = np.array(event.GetPosition())
             self.diff_loc = self.mid_move_loc - self.end_move_loc
-            self.canvas.MoveImage(self.diff_loc, "Pixel", ReDraw=True)
+            self.pan(self.diff_loc)
 
         # change the cursor back to normal
         self.SetCursor(wx.Cursor(wx.CURSOR_ARROW))
 
     def on_mouse_left_down(self, event):
-        """Start making the zoom-to-box box."""
-        #  print("Left mouse down!")
-        #  pcoord = event.GetPosition()
-        #  wcoord = self.canvas.PixelToWorld(pcoord)
-        #  string = "Pixel Coord = {}    \tWorld Coord = {}"
-        #  print(string.format(pcoord, wcoord))
-        # TODO: Look into what I was doing here. Why no 'self' on parent?
-        parent = wx.GetTopLevelParent(self)
-        wx.PostEvent(self.parent, event)
+        """
+        Start making the zoom-to-box box.
+
+        If Shift is held down, the box selects die instead.
+        """
+        if event.ShiftDown():
+            self._start_box(event, self.select_box)
+        else:
+            self._start_box(event, self.zoom_to_box)
 
     def on_mouse_left_up(self, event):
         """End making the zoom-to-box box and execute the zoom."""
-        print("Left mouse up!")
+        self._end_box(event)
 
     def on_mouse_right_down(self, event):
         """Start making the zoom-out box."""
-        print("Right mouse down!")
+        self._start_box(event, self.zoom_out_box)
 
     def on_mouse_right_up(self, event):
         """Stop making the zoom-out box and execute the zoom."""
-        print("Right mouse up!")
+        self._end_box(event)
+
+    def _start_box(self, event, action):
+        """Start dragging a box that calls ``action`` when released."""
+        start = np.array(event.Coords, dtype=float)
+        box = FloatCanvas.Rectangle(
+            start,
+            (0, 0),
+            LineColor=wm_const.wm_SELECT_BOX_COLOR,
+            LineStyle="Dot",
+            FillStyle="Transparent",
+            InForeground=True,
+        )
+        self._box_drag = (action, start, np.array(event.GetPosition()), box)
+        self.canvas.AddObject(box)
+
+    def _update_box(self, coords):
+        """Stretch the dragged box to ``coords``."""
+        _, start, _, box = self._box_drag
+        box.SetShape(np.minimum(start, coords), np.abs(coords - start))
+        # Only the foreground is redrawn, so this is fast for any number
+        # of die.
+        self.canvas.Draw()
+
+    def _end_box(self, event):
+        """Remove the dragged box and call its action."""
+        if self._box_drag is None:
+            return
+        action, start, start_pixel, box = self._box_drag
+        self._box_drag = None
+        self.canvas.RemoveObject(box)
+
+        dragged = np.abs(np.array(event.GetPosition()) - start_pixel)
+        if action != self.select_box and dragged.min() < wm_const.wm_ZOOM_BOX_MIN_PX:
+            # A click, not a box.
+            self.canvas.Draw()
+            return
+        action(start, event.Coords)
+        if action == self.select_box:
+            self.canvas.Draw()
+
+
+class DieCollection(FloatCanvas.DrawObject):
+    """
+    A FloatCanvas DrawObject that draws many die at once.
+
+    All die are held as arrays and drawn with ``dc.DrawRectangleList``.
+    The die are grouped by color so that the brush is only set once per
+    color rather than once per die. Unlike a scaled bitmap, the die are
+    drawn as vectors so edges stay sharp when zoomed in.
+
+    Only die inside the viewport are drawn. Die borders are dropped once
+    the die are smaller than ``wm_constants.wm_LOD_DETAIL_PX`` on screen,
+    and die smaller than ``wm_constants.wm_LOD_AGGREGATE_PX`` are drawn at
+    most once per pixel.
+
+    Parameters
+    ----------
+    lower_left : array-like
+        A ``(N, 2)`` array of the lower-left world coordinate of each die.
+    size : array-like
+        The ``(width, height)`` of the die in world units. May also be
+        a ``(N, 2)`` array if die sizes differ.
+    color_index : array-like of ints
+        A length ``N`` array giving each die's index into ``palette``.
+    palette : array-like
+        A ``(M, 3)`` array of ``uint8`` RGB colors.
+    LineColor : color, optional
+        The die border color. Defaults to ``"Black"``.
+    LineStyle : str, optional
+        The die border style. Defaults to ``"Solid"``.
+    LineWidth : int, optional
+        The die border width in pixels. Defaults to ``1``.
+    InForeground : bool, optional
+        Put the object in the foreground. Defaults to ``False``.
+    """
+
+    def __init__(
+        self,
+        lower_left,
+        size,
+        color_index,
+        palette,
+        LineColor="Black",
+        LineStyle="Solid",
+        LineWidth=1,
+        InForeground=False,
+    ):
+        FloatCanvas.DrawObject.__init__(self, InForeground)
+
+        # Kept in GrowableArrays so that die can be appended cheaply.
+        lower_left = np.asarray(lower_left, dtype=float).reshape(-1, 2)
+        self._lower_left = wm_utils.GrowableArray(lower_left)
+        self._size = wm_utils.GrowableArray(
+            np.broadcast_to(np.asarray(size, dtype=float), lower_left.shape).copy()
+        )
+        self.lower_left = self._lower_left.data
+        self.size = self._size.data
+        self._min_size = self.size.min(axis=0) if len(self.size) else np.zeros(2)
+        self.LineColor = LineColor
+        self.LineStyle = LineStyle
+        self.LineWidth = LineWidth
+        self.SetPen(LineColor, LineStyle, LineWidth)
+
+        self.set_colors(color_index, palette)
+        self.CalcBoundingBox()
+
+    def set_colors(self, color_index, palette):
+        """
+        Set the die colors.
+
+        Parameters
+        ----------
+        color_index : array-like of ints
+            A length ``N`` array giving each die's index into ``palette``.
+        palette : array-like
+            A ``(M, 3)`` array of ``uint8`` RGB colors.
+        """
+        self._color_index = wm_utils.GrowableArray(
+            np.asarray(color_index, dtype=int).ravel()
+        )
+        self.color_index = self._color_index.data
+        self.palette = np.asarray(palette, dtype=np.uint8).reshape(-1, 3)
+        self.brushes = [wx.Brush(wx.Colour(*_c)) for _c in self.palette.tolist()]
+        self._palette_lookup = {
+            tuple(_c): _i for _i, _c in enumerate(self.palette.tolist())
+        }
+        self._sort()
+
+    def update_colors(self, positions, colors):
+        """
+        Change the colors of only some die.
+
+        Colors that aren't in the palette yet are added to it. The die are
+        re-sorted by color the next time they are drawn, so many updates
+        between draws only pay for one sort.
+
+        Parameters
+        ----------
+        positions : array-like of ints
+            The positions of the die to change.
+        colors : array-like
+            A ``(len(positions), 3)`` array of ``uint8`` RGB colors.
+        """
+        positions = np.asarray(positions, dtype=int).ravel()
+        self.color_index[positions] = self._palette_indices(colors)
+        self._sorted = False
+
+    def append(self, lower_left, size, colors):
+        """
+        Add die.
+
+        Like :meth:`update_colors`, the die are re-sorted the next time
+        they are drawn.
+
+        Parameters
+        ----------
+        lower_left : array-like
+            A ``(K, 2)`` array of the lower-left world coordinate of each
+            new die.
+        size : array-like
+            The ``(width, height)`` of the new die, or a ``(K, 2)`` array.
+        colors : array-like
+            A ``(K, 3)`` array of ``uint8`` RGB colors.
+        """
+        lower_left = np.asarray(lower_left, dtype=float).reshape(-1, 2)
+        size = np.broadcast_to(np.asarray(size, dtype=float), lower_left.shape)
+        color_index = self._palette_indices(colors)
+
+        self.lower_left = self._lower_left.extend(lower_left)
+        self.size = self._size.extend(size)
+        self.color_index = self._color_index.extend(color_index)
+        self._min_size = self.size.min(axis=0)
+        self._sorted = False
+        self.CalcBoundingBox()
+
+    def _palette_indices(self, colors):
+        """Return the palette index of each color, adding new colors."""
+        new_palette, new_index = wm_utils.palettize(colors)
+
+        lookup = []
+        for color in new_palette.tolist():
+            key = tuple(color)
+            if key not in self._palette_lookup:
+                self._palette_lookup[key] = len(self.brushes)
+                self.brushes.append(wx.Brush(wx.Colour(*color)))
+                self.palette = np.vstack((self.palette, [color])).astype(np.uint8)
+            lookup.append(self._palette_lookup[key])
+
+        return np.asarray(lookup, dtype=int)[new_index]
+
+    def _sort(self):
+        """Sort the die by color so each color is a contiguous block."""
+        self._order = np.argsort(self.color_index, kind="stable")
+        self._sorted_index = self.color_index[self._order]
+        self._sorted_lower_left = self.lower_left[self._order]
+        self._sorted_upper_right = self._sorted_lower_left + self.size[self._order]
+        self._sorted = True
+
+    def CalcBoundingBox(self):
+        """Calculate the bounding box of all die."""
+        if len(self.lower_left) == 0:
+            self.BoundingBox = BBox.NullBBox()
+        else:
+            self.BoundingBox = BBox.fromPoints(
+                np.vstack(
+                    (
+                        self.lower_left.min(axis=0),
+                        (self.lower_left + self.size).max(axis=0),
+                    )
+                )
+            )
+        if self._Canvas:
+            self._Canvas.BoundingBoxDirty = True
+
+    def _visible(self):
+        """Return the color-sorted positions of the die in the viewport."""
+        viewport = _viewport_bb(self)
+        if viewport is None:
+            return np.arange(len(self._order))
+
+        (view_x0, view_y0), (view_x1, view_y1) = viewport
+        lower_left = self._sorted_lower_left
+        upper_right = self._sorted_upper_right
+        in_view = (
+            (upper_right[:, 0] >= view_x0)
+            & (lower_left[:, 0] <= view_x1)
+            & (upper_right[:, 1] >= view_y0)
+            & (lower_left[:, 1] <= view_y1)
+        )
+        return np.flatnonzero(in_view)
+
+    def _Draw(self, dc, WorldToPixel, ScaleWorldToPixel, HTdc=None):
+        if not self._sorted:
+            self._sort()
+
+        visible = self._visible()
+        if visible.size == 0:
+            return
+
+        # Convert both corners rather than scaling the size so that
+        # neighboring die share their edges exactly.
+        lower_left = self._sorted_lower_left[visible]
+        upper_right = self._sorted_upper_right[visible]
+        top_left = WorldToPixel(np.column_stack((lower_left[:, 0], upper_right[:, 1])))
+        bottom_right = WorldToPixel(
+            np.column_stack((upper_right[:, 0], lower_left[:, 1]))
+        )
+        rects = np.column_stack((top_left, bottom_right - top_left)).astype(int)
+        color_index = self._sorted_index[visible]
+
+        # Level of detail: borders on tiny die just hide the die color, and
+        # die smaller than a pixel are drawn at most once per pixel.
+        die_px = _pixel_size(ScaleWorldToPixel, self._min_size)
+        pen = self.Pen
+        if die_px < wm_const.wm_LOD_DETAIL_PX:
+            pen = wx.TRANSPARENT_PEN
+        if die_px < wm_const.wm_LOD_AGGREGATE_PX:
+            rects, color_index = _one_per_pixel(rects, color_index)
+
+        slices = np.searchsorted(color_index, np.arange(len(self.palette) + 1))
+        for _i, brush in enumerate(self.brushes):
+            start, stop = slices[_i], slices[_i + 1]
+            if start == stop:
+                continue
+            dc.DrawRectangleList(rects[start:stop].tolist(), pen, brush)
+
+
+class LineSegments(FloatCanvas.DrawObject):
+    """
+    Many unconnected line segments drawn with a single ``DrawLineList``.
+
+    Gridlines turn into noise once the die are only a few pixels across, so
+    they are skipped entirely. Segments outside of the viewport are also
+    skipped.
+
+    Parameters
+    ----------
+    segments : array-like
+        A ``(N, 4)`` array of ``(x0, y0, x1, y1)`` world coordinates.
+    detail_size : tuple
+        The ``(width, height)``, in world units, of the detail that the
+        segments are showing. Typically the die or reticle size.
+    LineColor : color, optional
+        The line color. Defaults to black.
+    LineStyle : str, optional
+        The line style. Defaults to ``"Solid"``.
+    LineWidth : int, optional
+        The line width in px. Defaults to 1.
+    min_pixels : float, optional
+        The segments are hidden when ``detail_size`` is smaller than this
+        many pixels. Defaults to ``wm_constants.wm_LOD_DETAIL_PX``.
+    """
+
+    def __init__(
+        self,
+        segments,
+        detail_size,
+        LineColor="Black",
+        LineStyle="Solid",
+        LineWidth=1,
+        min_pixels=wm_const.wm_LOD_DETAIL_PX,
+        InForeground=False,
+    ):
+        FloatCanvas.DrawObject.__init__(self, InForeground)
+
+        self.segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+        self.detail_size = detail_size
+        self.min_pixels = min_pixels
+        self.LineColor = LineColor
+        self.LineStyle = LineStyle
+        self.LineWidth = LineWidth
+        self.SetPen(LineColor, LineStyle, LineWidth)
+
+        self.CalcBoundingBox()
+
+    def CalcBoundingBox(self):
+        """Calculate the bounding box of all segments."""
+        if len(self.segments) == 0:
+            self.BoundingBox = BBox.NullBBox()
+        else:
+            self.BoundingBox = BBox.fromPoints(self.segments.reshape(-1, 2))
+        if self._Canvas:
+            self._Canvas.BoundingBoxDirty = True
+
+    def _visible(self):
+        """Return the segments that are in the viewport."""
+        viewport = _viewport_bb(self)
+        if viewport is None:
+            return self.segments
+
+        (view_x0, view_y0), (view_x1, view_y1) = viewport
+        x = self.segments[:, 0::2]
+        y = self.segments[:, 1::2]
+        in_view = (
+            (x.max(axis=1) >= view_x0)
+            & (x.min(axis=1) <= view_x1)
+            & (y.max(axis=1) >= view_y0)
+            & (y.min(axis=1) <= view_y1)
+        )
+        return self.segments[in_view]
+
+    def _Draw(self, dc, WorldToPixel, ScaleWorldToPixel, HTdc=None):
+        if _pixel_size(ScaleWorldToPixel, self.detail_size) < self.min_pixels:
+            return
+
+        segments = self._visible()
+        if len(segments) == 0:
+            return
+
+        lines = WorldToPixel(segments.reshape(-1, 2)).reshape(-1, 4).astype(int)
+        dc.DrawLineList(lines.tolist(), self.Pen)
+
+
+class DieCenters(FloatCanvas.PointSet):
+    """
+    All of the die center dots as a single PointSet.
+
+    Like :class:`LineSegments`, the dots are not drawn when the die are too
+    small on screen for them to be useful.
+
+    Parameters
+    ----------
+    Points : array-like
+        A ``(N, 2)`` array of die center world coordinates.
+    detail_size : tuple
+        The die ``(width, height)`` in world units.
+    Color : color, optional
+        The dot color. Defaults to ``wm_constants.wm_DIE_CENTER_DOT_COLOR``.
+    Diameter : int, optional
+        The dot diameter in px. Defaults to
+        ``wm_constants.wm_DIE_CENTER_DOT_SIZE``.
+    min_pixels : float, optional
+        The dots are hidden when ``detail_size`` is smaller than this many
+        pixels. Defaults to ``wm_constants.wm_LOD_DETAIL_PX``.
+    """
+
+    def __init__(
+        self,
+        Points,
+        detail_size,
+        Color=wm_const.wm_DIE_CENTER_DOT_COLOR,
+        Diameter=wm_const.wm_DIE_CENTER_DOT_SIZE,
+        min_pixels=wm_const.wm_LOD_DETAIL_PX,
+        InForeground=False,
+    ):
+        FloatCanvas.PointSet.__init__(
+            self,
+            Points,
+            Color=Color,
+            Diameter=Diameter,
+            InForeground=InForeground,
+        )
+        self.detail_size = detail_size
+        self.min_pixels = min_pixels
+
+    def _Draw(self, dc, WorldToPixel, ScaleWorldToPixel, HTdc=None):
+        if _pixel_size(ScaleWorldToPixel, self.detail_size) < self.min_pixels:
+            return
+        FloatCanvas.PointSet._Draw(self, dc, WorldToPixel, ScaleWorldToPixel, HTdc)
+
+
+class DefectMarkers(FloatCanvas.DrawObject):
+    """
+    Many defect markers drawn at once, colored by class.
+
+    Like :class:`DieCollection`, the markers are held as arrays sorted by
+    class and drawn with one ``dc.DrawRectangleList`` per class. Markers
+    stay the same size in pixels as the canvas is zoomed. Only markers
+    inside the viewport are drawn, and markers of one class that land on
+    the same pixel are drawn once.
+
+    Parameters
+    ----------
+    points : array-like
+        A ``(N, 2)`` array of defect world coordinates.
+    class_index : array-like of ints
+        A length ``N`` array giving each defect's index into ``palette``.
+    palette : array-like
+        A ``(M, 3)`` array of RGB colors, one per class.
+    Diameter : int, optional
+        The marker size in px. Defaults to ``wm_constants.wm_DEFECT_SIZE``.
+    InForeground : bool, optional
+        Put the object in the foreground. Defaults to ``False``.
+    """
+
+    def __init__(
+        self,
+        points,
+        class_index,
+        palette,
+        Diameter=wm_const.wm_DEFECT_SIZE,
+        InForeground=False,
+    ):
+        FloatCanvas.DrawObject.__init__(self, InForeground)
+
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.class_index = np.asarray(class_index, dtype=int).ravel()
+        self.palette = np.asarray(palette, dtype=np.uint8).reshape(-1, 3)
+        self.Diameter = Diameter
+        self.brushes = [wx.Brush(wx.Colour(*_c)) for _c in self.palette.tolist()]
+
+        order = np.argsort(self.class_index, kind="stable")
+        self._sorted_points = self.points[order]
+        self._sorted_index = self.class_index[order]
+        self.CalcBoundingBox()
+
+    def CalcBoundingBox(self):
+        """Calculate the bounding box of all defects."""
+        if len(self.points) == 0:
+            self.BoundingBox = BBox.NullBBox()
+        else:
+            self.BoundingBox = BBox.fromPoints(self.points)
+        if self._Canvas:
+            self._Canvas.BoundingBoxDirty = True
+
+    def _visible(self):
+        """Return the class-sorted positions of the defects in the viewport."""
+        viewport = _viewport_bb(self)
+        if viewport is None:
+            return np.arange(len(self._sorted_points))
+
+        (view_x0, view_y0), (view_x1, view_y1) = viewport
+        x = self._sorted_points[:, 0]
+        y = self._sorted_points[:, 1]
+        return np.flatnonzero(
+            (x >= view_x0) & (x <= view_x1) & (y >= view_y0) & (y <= view_y1)
+        )
+
+    def _Draw(self, dc, WorldToPixel, ScaleWorldToPixel, HTdc=None):
+        visible = self._visible()
+        if visible.size == 0:
+            return
+
+        pixels = np.round(WorldToPixel(self._sorted_points[visible])).astype(np.int64)
+        class_index = self._sorted_index[visible]
+
+        # One marker per class per pixel. Sorting by class first keeps the
+        # classes in contiguous blocks.
+        offset = pixels - pixels.min(axis=0)
+        width, height = offset.max(axis=0) + 1
+        packed = (class_index * height + offset[:, 1]) * width + offset[:, 0]
+        _, first = np.unique(packed, return_index=True)
+        class_index = class_index[first]
+
+        corners = pixels[first] - self.Diameter // 2
+        rects = np.column_stack(
+            (corners, np.full((len(corners), 2), self.Diameter, dtype=int))
+        )
+        slices = np.searchsorted(class_index, np.arange(len(self.palette) + 1))
+        for _i, brush in enumerate(self.brushes):
+            start, stop = slices[_i], slices[_i + 1]
+            if start == stop:
+                continue
+            dc.DrawRectangleList(rects[start:stop].tolist(), wx.TRANSPARENT_PEN, brush)
+
+
+def _viewport_bb(draw_object):
+    """
+    Return the world bounding box that the object's canvas is showing.
+
+    Returns ``None`` if the object isn't on a canvas that has been drawn.
+    """
+    if not draw_object._Canvas:
+        return None
+    viewport = getattr(draw_object._Canvas, "ViewPortBB", None)
+    if viewport is None:
+        return None
+    return BBox.asBBox(viewport)
+
+
+def _pixel_size(ScaleWorldToPixel, size):
+    """Return the smallest on-screen dimension, in px, of ``size``."""
+    size = np.asarray(size, dtype=float).reshape(-1, 2)
+    if size.size == 0:
+        return 0
+    return float(np.abs(ScaleWorldToPixel(size.min(axis=0))).min())
+
+
+def _one_per_pixel(rects, color_index):
+    """
+    Keep only the first of any rectangles that start on the same pixel.
+
+    The order of the remaining rectangles is unchanged and each one is at
+    least one pixel in size.
+    """
+    packed = (rects[:, 0].astype(np.int64) << 32) + rects[:, 1]
+    _, first = np.unique(packed, return_index=True)
+    first.sort()
+    rects = rects[first]
+    rects[:, 2:] = np.maximum(rects[:, 2:], 1)
+    return (rects, color_index[first])
+
+
+class DieRaster(FloatCanvas.ScaledBitmap2):
+    """
+    A ScaledBitmap2 whose bitmap can be replaced in place.
+
+    Replacing the bitmap keeps the object's position in the canvas draw
+    order, so the die stay underneath the gridlines and wafer outline.
+
+    Parameters
+    ----------
+    Bitmap : :class:`wx.Bitmap`
+        The die bitmap, one pixel per die.
+    XY : tuple
+        The world coordinate of the bitmap's ``Position`` corner.
+    Height : float
+        The height of the bitmap in world units.
+    Width : float
+        The width of the bitmap in world units.
+    Position : str, optional
+        Which corner of the bitmap ``XY`` refers to. Defaults to ``"tl"``.
+    InForeground : bool, optional
+        Put the object in the foreground. Defaults to ``False``.
+    """
+
+    def __init__(
+        self,
+        Bitmap,
+        XY,
+        Height,
+        Width,
+        Position="tl",
+        InForeground=False,
+    ):
+        self._placement = (XY, Height, Width, Position, InForeground)
+        FloatCanvas.ScaledBitmap2.__init__(
+            self,
+            Bitmap,
+            XY,
+            Height,
+            Width=Width,
+            Position=Position,
+            InForeground=InForeground,
+        )
+
+    def set_bitmap(self, Bitmap, XY=None, Height=None, Width=None):
+        """
+        Replace the bitmap.
+
+        If the new bitmap covers a different area than the old one, pass
+        the new ``XY``, ``Height``, and ``Width`` too.
+        """
+        # Re-running __init__ resets all of ScaledBitmap2's internal caches,
+        # but it also unlinks us from the canvas, so save that first.
+        canvas, visible = self._Canvas, self.Visible
+        old_XY, old_Height, old_Width, Position, InForeground = self._placement
+        XY = old_XY if XY is None else XY
+        Height = old_Height if Height is None else Height
+        Width = old_Width if Width is None else Width
+        DieRaster.__init__(self, Bitmap, XY, Height, Width, Position, InForeground)
+        self._Canvas, self.Visible = canvas, visible
+        if canvas:
+            canvas.BoundingBoxDirty = True
+
+
+class _InstrumentedCanvas(FloatCanvas.FloatCanvas):
+    """
+    A FloatCanvas that passes a span for each redraw to ``instrument``.
+
+    Every redraw goes through :meth:`Draw`, including the ones started by
+    :meth:`MoveImage` when zooming or panning.
+    """
+
+    # Set by WaferMapPanel. FloatCanvas draws while it is being created,
+    # before this can be set.
+    instrument = None
+
+    def Draw(self, Force=False):
+        """Redraw the canvas. See :meth:`FloatCanvas.FloatCanvas.Draw`."""
+        if self.instrument is None:
+            return FloatCanvas.FloatCanvas.Draw(self, Force)
+        objects = len(self._DrawList) + len(self._ForeDrawList)
+        with wm_instrument.span(self.instrument, "draw", objects=objects):
+            return FloatCanvas.FloatCanvas.Draw(self, Force)
+
+    def MoveImage(self, shift, CoordType, ReDraw=True):
+        """Move the view. See :meth:`FloatCanvas.FloatCanvas.MoveImage`."""
+        if self.instrument is None:
+            return FloatCanvas.FloatCanvas.MoveImage(self, shift, CoordType, ReDraw)
+        with wm_instrument.span(self.instrument, "move_image"):
+            return FloatCanvas.FloatCanvas.MoveImage(self, shift, CoordType, ReDraw)
+
+
+def _feed_queue(iterable, out_queue):
+    """Put every item of ``iterable`` on ``out_queue``, then ``None``."""
+    try:
+        for item in iterable:
+            out_queue.put(item)
+    finally:
+        out_queue.put(None)
 
 
 def xyd_to_dict(xyd_list):
@@ -583,9 +2038,7 @@ def draw_wafer_outline(dia=150, excl=5, flat=None):
     :class:`wx.lib.floatcanvas.FloatCanvas.Group`
         A ``Group`` that can be added to any floatcanvas.FloatCanvas instance.
     """
-    rad = float(dia) / 2.0
-    if flat is None:
-        flat = excl
+    outline = wm_utils.wafer_outline(dia, excl, flat, wm_const.wm_FLAT_LENGTHS.get(dia))
 
     # Full wafer outline circle
     circ = FloatCanvas.Circle(
@@ -595,77 +2048,44 @@ def draw_wafer_outline(dia=150, excl=5, flat=None):
         LineWidth=1,
     )
 
-    # Calculate the exclusion Radius
-    exclRad = 0.5 * (dia - 2.0 * excl)
-
-    if dia in wm_const.wm_FLAT_LENGTHS:
-        # A flat is defined, so we draw it.
-        flat_size = wm_const.wm_FLAT_LENGTHS[dia]
-        x = flat_size / 2
-        y = -math.sqrt(rad**2 - x**2)  # Wfr Flat's Y Location
+    arc = FloatCanvas.Arc(
+        outline.edge_arc[0],
+        outline.edge_arc[1],
+        (0, 0),
+        LineColor=wm_const.wm_WAFER_EDGE_COLOR,
+        LineWidth=3,
+    )
+    # Flats are drawn thicker than notches
+    mark_width = 3 if outline.has_flat else 2
+    notch = FloatCanvas.Line(
+        outline.edge_mark,
+        LineColor=wm_const.wm_WAFER_EDGE_COLOR,
+        LineWidth=mark_width,
+    )
 
-        arc = FloatCanvas.Arc(
-            (x, y),
-            (-x, y),
+    if outline.excl_arc is None:
+        # The flat exclusion doesn't reach the edge exclusion, so draw a
+        # circle with no flat.
+        excl_arc = FloatCanvas.Circle(
             (0, 0),
+            outline.excl_rad * 2,
             LineColor=wm_const.wm_WAFER_EDGE_COLOR,
             LineWidth=3,
         )
-
-        # actually a wafer flat, but called notch
-        notch = draw_wafer_flat(rad, wm_const.wm_FLAT_LENGTHS[dia])
-        # Define the arc angle based on the flat exclusion, not the edge
-        # exclusion. Find the flat exclusion X and Y coords.
-        FSSflatY = y + flat
-        if exclRad < abs(FSSflatY):
-            # Then draw a circle with no flat
-            excl_arc = FloatCanvas.Circle(
-                (0, 0),
-                exclRad * 2,
-                LineColor=wm_const.wm_WAFER_EDGE_COLOR,
-                LineWidth=3,
-            )
-            excl_group = FloatCanvas.Group([excl_arc])
-        else:
-            FSSflatX = math.sqrt(exclRad**2 - FSSflatY**2)
-
-            # Define the wafer arc
-            excl_arc = FloatCanvas.Arc(
-                (FSSflatX, FSSflatY),
-                (-FSSflatX, FSSflatY),
-                (0, 0),
-                LineColor=wm_const.wm_WAFER_EDGE_COLOR,
-                LineWidth=3,
-            )
-
-            excl_notch = draw_wafer_flat(exclRad, FSSflatX * 2)
-            excl_group = FloatCanvas.Group([excl_arc, excl_notch])
+        excl_group = FloatCanvas.Group([excl_arc])
     else:
-        # Flat not defined, so use a notch to denote wafer orientation.
-        ang = 2.5
-        start_xy, end_xy = calc_flat_coords(rad, ang)
-
-        arc = FloatCanvas.Arc(
-            start_xy,
-            end_xy,
+        excl_arc = FloatCanvas.Arc(
+            outline.excl_arc[0],
+            outline.excl_arc[1],
             (0, 0),
             LineColor=wm_const.wm_WAFER_EDGE_COLOR,
             LineWidth=3,
         )
-
-        notch = draw_wafer_notch(rad)
-        # Flat not defined, so use a notch to denote wafer orientation.
-        start_xy, end_xy = calc_flat_coords(exclRad, ang)
-
-        excl_arc = FloatCanvas.Arc(
-            start_xy,
-            end_xy,
-            (0, 0),
+        excl_notch = FloatCanvas.Line(
+            outline.excl_mark,
             LineColor=wm_const.wm_WAFER_EDGE_COLOR,
-            LineWidth=3,
+            LineWidth=mark_width,
         )
-
-        excl_notch = draw_wafer_notch(exclRad)
         excl_group = FloatCanvas.Group([excl_arc, excl_notch])
 
     # Group the outline arc and the orientation (flat / notch) together
@@ -673,67 +2093,8 @@ def draw_wafer_outline(dia=150, excl=5, flat=None):
     return group
 
 
-def calc_flat_coords(radius, angle):
-    """
-    Calculate the chord of a circle that spans ``angle``.
-
-    Assumes the chord is centered on the y-axis.
-
-    Calculate the starting and ending XY coordinates for a horizontal line
-    below the y axis that interects a circle of radius ``radius`` and
-    makes an angle ``angle`` at the center of the circle.
-
-    This line is below the y axis.
-
-    Parameters
-    ----------
-    radius : float
-        The radius of the circle that the line intersects.
-    angle : float
-        The angle, in degrees, that the line spans.
-
-    Returns
-    -------
-    (start_xy, end_xy) : tuple of coord pairs
-        The starting and ending XY coordinates of the line.
-        (start_x, start_y), (end_x, end_y))
-
-    Notes
-    -----
-    What follows is a poor-mans schematic. I hope.
-
-    ::
-
-        1-------------------------------------------------------1
-        1                                                       1
-        1                                                       1
-        1                           +                           1
-        1                          . .                          1
-        1                         .   .                         1
-        1                        .     . Radius                 1
-         1                      .       .                      1
-         1                     .         .                     1
-         1                    .           .                    1
-          1                  .             .                  1
-          1                 .  <--angle-->  .                 1
-           1               .                 .               1
-            1             .                   .             1
-            1            .                     .            1
-             1          .                       .          1
-              1        .                         .        1
-                1     .                           .     1
-                 1   .                             .   1
-                  1 .                               . 1
-                    1-------------line--------------1
-                      1                           1
-                        1                       1
-                           1                  1
-                               111111111111
-    """
-    ang_rad = angle * math.pi / 180
-    start_xy = (radius * math.sin(ang_rad), -radius * math.cos(ang_rad))
-    end_xy = (-radius * math.sin(ang_rad), -radius * math.cos(ang_rad))
-    return (start_xy, end_xy)
+# The geometry now lives in wm_utils; kept here for backwards compatibility.
+calc_flat_coords = wm_utils.calc_flat_coords
 
 
 def draw_crosshairs(dia=150, dot=False):
@@ -748,15 +2109,9 @@ def draw_crosshairs(dia=150, dot=False):
         return FloatCanvas.Group([circ])
     else:
         # Default: use crosshairs
-        rad = dia / 2
-        xline = FloatCanvas.Line(
-            [(rad * 1.05, 0), (-rad * 1.05, 0)],
-            LineColor=wx.CYAN,
-        )
-        yline = FloatCanvas.Line(
-            [(0, rad * 1.05), (0, -rad * 1.05)],
-            LineColor=wx.CYAN,
-        )
+        x_coords, y_coords = wm_utils.crosshair_coords(dia)
+        xline = FloatCanvas.Line(x_coords, LineColor=wx.CYAN)
+        yline = FloatCanvas.Line(y_coords, LineColor=wx.CYAN)
 
         return FloatCanvas.Group([xline, yline])
 
@@ -772,42 +2127,59 @@ def draw_die_gridlines(wf):
 
     Returns
     -------
-    group : :class:`wx.lib.floatcanvas.FloatCanvas.Group`
-        The collection of all die gridlines.
+    lines : :class:`LineSegments`
+        All of the die gridlines. Not drawn when the die are too small on
+        screen for the gridlines to be useful.
     """
-    x_size = wf.die_size[0]
-    y_size = wf.die_size[1]
-    grey = wx.Colour(64, 64, 64)
-    edge = (wf.dia / 2) * 1.05
-
-    # calculate the values for the gridlines
-    x_ref = -math.modf(wf.center_xy[0])[0] * x_size + (x_size / 2)
-    pos_vert = np.arange(x_ref, edge, x_size)
-    neg_vert = np.arange(x_ref, -edge, -x_size)
-
-    y_ref = math.modf(wf.center_xy[1])[0] * y_size + (y_size / 2)
-    pos_horiz = np.arange(y_ref, edge, y_size)
-    neg_horiz = np.arange(y_ref, -edge, -y_size)
+    segments = wm_utils.gridline_segments(wf.die_size, wf.center_xy, wf.dia)
+    return LineSegments(
+        segments,
+        wf.die_size,
+        LineColor=wm_const.wm_DIE_GRIDLINE_COLOR,
+    )
 
-    # reverse `[::-1]`, remove duplicate `[1:]`, and join
-    x_values = np.concatenate((neg_vert[::-1], pos_vert[1:]))
-    y_values = np.concatenate((neg_horiz[::-1], pos_horiz[1:]))
 
-    line_coords = list([(x, -edge), (x, edge)] for x in x_values)
-    line_coords.extend([(-edge, y), (edge, y)] for y in y_values)
+def draw_reticle_gridlines(wf):
+    """
+    Draw the reticle gridlines.
 
-    lines = [FloatCanvas.Line(_line, LineColor=grey) for _line in line_coords]
+    Parameters
+    ----------
+    wf : :class:`wm_info.WaferInfo`
+        The wafer info to calculate gridlines for.
 
-    return FloatCanvas.Group(list(lines))
+    Returns
+    -------
+    lines : :class:`LineSegments` or ``None``
+        All of the reticle gridlines, or ``None`` if ``wf`` doesn't define
+        a reticle size.
+    """
+    if wf.reticle_size is None:
+        return None
+
+    segments = wm_utils.gridline_segments(
+        wf.die_size,
+        wf.center_xy,
+        wf.dia,
+        period=wf.reticle_size,
+        offset=wf.reticle_offset,
+    )
+    reticle_size = (
+        wf.die_size[0] * wf.reticle_size[0],
+        wf.die_size[1] * wf.reticle_size[1],
+    )
+    return LineSegments(
+        segments,
+        reticle_size,
+        LineColor=wm_const.wm_RETICLE_GRIDLINE_COLOR,
+        LineWidth=2,
+    )
 
 
 def draw_wafer_flat(rad, flat_length):
     """Draw a wafer flat for a given radius and flat length."""
-    x = flat_length / 2
-    y = -math.sqrt(rad**2 - x**2)
-
     flat = FloatCanvas.Line(
-        [(-x, y), (x, y)],
+        wm_utils.flat_coords(rad, flat_length),
         LineColor=wm_const.wm_WAFER_EDGE_COLOR,
         LineWidth=3,
     )
@@ -828,18 +2200,8 @@ def draw_excl_flat(rad, flat_y, line_width=1, line_color="black"):
 
 def draw_wafer_notch(rad):
     """Draw a wafer notch for a given wafer radius."""
-    ang = 2.5
-    ang_rad = ang * math.pi / 180
-
-    # Define the Notch as a series of 3 (x, y) points
-    xy_points = [
-        (-rad * math.sin(ang_rad), -rad * math.cos(ang_rad)),
-        (0, -rad * 0.95),
-        (rad * math.sin(ang_rad), -rad * math.cos(ang_rad)),
-    ]
-
     notch = FloatCanvas.Line(
-        xy_points,
+        wm_utils.notch_coords(rad),
         LineColor=wm_const.wm_WAFER_EDGE_COLOR,
         LineWidth=2,
     )
@@ -20,8 +20,8 @@ class WaferMapWindow(wx.Frame):
     ----------
     title : str
         The title to display.
-    xyd : list of 3-tuples
-        The data to plot.
+    xyd : list of 3-tuples, or arrays
+        The data to plot. See :class:`wafer_map.wm_core.WaferMapPanel`.
     wafer_info : :class:`wx_info.WaferInfo`
         The wafer information.
     size : tuple, optional
@@ -45,6 +45,17 @@ class WaferMapWindow(wx.Frame):
     show_die_gridlines : bool, optional
         If ``True``, displayes gridlines along the die edges. Defaults to
         ``True``.
+    show_reticle_gridlines : bool, optional
+        If ``True``, displays gridlines along the reticle edges. Requires
+        ``wafer_info.reticle_size``. Defaults to ``False``.
+    render_mode : :class:`wm_constants.RenderMode` or str, optional
+        How to draw the die. Must be one of `rectangle`, `raster`,
+        `batched`, or `auto`. See :class:`wafer_map.wm_core.WaferMapPanel`.
+        Defaults to `auto`.
+    instrument : callable, optional
+        Called with a :class:`wm_instrument.Span` after each phase of
+        building and drawing the map. See
+        :class:`wafer_map.wm_core.WaferMapPanel`. Defaults to ``None``.
     """
 
     def __init__(
@@ -59,6 +70,9 @@ class WaferMapWindow(wx.Frame):
         plot_range=None,
         plot_die_centers=False,
         show_die_gridlines=True,
+        render_mode=wm_const.RenderMode.AUTO,
+        show_reticle_gridlines=False,
+        instrument=None,
     ):
         wx.Frame.__init__(
             self,
@@ -78,6 +92,9 @@ class WaferMapWindow(wx.Frame):
         self.plot_range = plot_range
         self.plot_die_centers = plot_die_centers
         self.show_die_gridlines = show_die_gridlines
+        self.render_mode = render_mode
+        self.show_reticle_gridlines = show_reticle_gridlines
+        self.instrument = instrument
         self._init_ui()
 
     def _init_ui(self):
@@ -95,7 +112,12 @@ class WaferMapWindow(wx.Frame):
         self.mv_outline.Check()
         self.mv_crosshairs.Check()
         self.mv_diecenters.Check(self.plot_die_centers)
+        self.mv_diegridlines.Check(self.show_die_gridlines)
+        self.mv_reticlegridlines.Check(
+            self.show_reticle_gridlines and self.wafer_info.reticle_size is not None
+        )
         self.mv_legend.Check()
+        self.mv_defects.Check()
 
         # Set the MenuBar and create a status bar (easy thanks to wx.Frame)
         self.SetMenuBar(self.menu_bar)
@@ -115,6 +137,9 @@ class WaferMapWindow(wx.Frame):
                 plot_range=self.plot_range,
                 plot_die_centers=self.plot_die_centers,
                 show_die_gridlines=self.show_die_gridlines,
+                render_mode=self.render_mode,
+                show_reticle_gridlines=self.show_reticle_gridlines,
+                instrument=self.instrument,
             )
 
     # TODO: There's gotta be a more scalable way to make menu items
@@ -182,6 +207,20 @@ class WaferMapWindow(wx.Frame):
             "Show or hide the die centers",
             wx.ITEM_CHECK,
         )
+        self.mv_diegridlines = wx.MenuItem(
+            self.mview,
+            wx.ID_ANY,
+            "Die Gridlines\tG",
+            "Show or hide the die gridlines",
+            wx.ITEM_CHECK,
+        )
+        self.mv_reticlegridlines = wx.MenuItem(
+            self.mview,
+            wx.ID_ANY,
+            "Reticle Gridlines\tR",
+            "Show or hide the reticle gridlines",
+            wx.ITEM_CHECK,
+        )
         self.mv_legend = wx.MenuItem(
             self.mview,
             wx.ID_ANY,
@@ -189,6 +228,13 @@ class WaferMapWindow(wx.Frame):
             "Show or hide the legend",
             wx.ITEM_CHECK,
         )
+        self.mv_defects = wx.MenuItem(
+            self.mview,
+            wx.ID_ANY,
+            "Defects\tF",
+            "Show or hide the defects",
+            wx.ITEM_CHECK,
+        )
 
         # Menu: Options (mo_) ###
         self.mo_test = wx.MenuItem(
@@ -225,7 +271,10 @@ class WaferMapWindow(wx.Frame):
         self.mview.Append(self.mv_crosshairs)
         self.mview.Append(self.mv_outline)
         self.mview.Append(self.mv_diecenters)
+        self.mview.Append(self.mv_diegridlines)
+        self.mview.Append(self.mv_reticlegridlines)
         self.mview.Append(self.mv_legend)
+        self.mview.Append(self.mv_defects)
 
         self.mopts.Append(self.mo_test)
         self.mopts.Append(self.mo_high_color)
@@ -244,8 +293,13 @@ class WaferMapWindow(wx.Frame):
         self.Bind(wx.EVT_MENU, self.on_zoom_fit, self.mv_zoomfit)
         self.Bind(wx.EVT_MENU, self.on_toggle_crosshairs, self.mv_crosshairs)
         self.Bind(wx.EVT_MENU, self.on_toggle_diecenters, self.mv_diecenters)
+        self.Bind(wx.EVT_MENU, self.on_toggle_diegridlines, self.mv_diegridlines)
+        self.Bind(
+            wx.EVT_MENU, self.on_toggle_reticlegridlines, self.mv_reticlegridlines
+        )
         self.Bind(wx.EVT_MENU, self.on_toggle_outline, self.mv_outline)
         self.Bind(wx.EVT_MENU, self.on_toggle_legend, self.mv_legend)
+        self.Bind(wx.EVT_MENU, self.on_toggle_defects, self.mv_defects)
         self.Bind(wx.EVT_MENU, self.on_change_high_color, self.mo_high_color)
         self.Bind(wx.EVT_MENU, self.on_change_low_color, self.mo_low_color)
 
@@ -254,6 +308,14 @@ class WaferMapWindow(wx.Frame):
         # self.mo_test = wx.MenuItem(self.mopts, 402, "&Test", "Nothing")
         # self.Bind(wx.EVT_MENU, self.on_zoom_fit, id=402)
 
+    def stream_data(self, source, interval=wm_const.wm_STREAM_INTERVAL_MS):
+        """
+        Append die results from ``source`` as they arrive.
+
+        See :meth:`wafer_map.wm_core.WaferMapPanel.stream_data`.
+        """
+        self.panel.stream_data(source, interval)
+
     def on_quit(self, event):
         """Action for the quit event."""
         self.Close(True)
@@ -274,6 +336,15 @@ class WaferMapWindow(wx.Frame):
         """Call :meth:`wafer_map.wm_core.WaferMapPanel.toggle_crosshairs()`."""
         self.panel.toggle_die_centers()
 
+    def on_toggle_diegridlines(self, event):
+        """Call :meth:`wafer_map.wm_core.WaferMapPanel.toggle_die_gridlines()`."""
+        self.panel.toggle_die_gridlines()
+
+    def on_toggle_reticlegridlines(self, event):
+        """Call the WaferMapPanel.toggle_reticle_gridlines() method."""
+        self.panel.toggle_reticle_gridlines()
+        self.mv_reticlegridlines.Check(self.panel.reticle_gridlines_bool)
+
     # TODO: I don't think I need a separate method for this
     def on_toggle_outline(self, event):
         """Call the WaferMapPanel.toggle_outline() method."""
@@ -287,6 +358,10 @@ class WaferMapWindow(wx.Frame):
         """Call the WaferMapPanel.toggle_legend() method."""
         self.panel.toggle_legend()
 
+    def on_toggle_defects(self, event):
+        """Call the WaferMapPanel.toggle_defects() method."""
+        self.panel.toggle_defects()
+
     # TODO: See the 'and' in the docstring? Means I need a separate method!
     def on_change_high_color(self, event):
         """Change the high color and refresh display."""
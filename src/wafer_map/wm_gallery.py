@@ -0,0 +1,402 @@
+"""
+A gallery of wafer map thumbnails, such as for all of the wafers in a lot.
+
+Thumbnails are drawn by :mod:`wafer_map.wm_raster` on background threads,
+and only for the tiles that are on screen. Clicking a thumbnail opens the
+full :class:`wafer_map.wm_frame.WaferMapWindow` for that wafer.
+"""
+import concurrent.futures
+import math
+import random
+
+import numpy as np
+import wx
+
+from wafer_map import gen_fake_data
+from wafer_map import wm_constants as wm_const
+from wafer_map import wm_frame
+from wafer_map import wm_raster
+from wafer_map import wm_utils
+
+
+class WaferGalleryWindow(wx.Frame):
+    """
+    A window with a :class:`WaferGalleryPanel`.
+
+    Parameters
+    ----------
+    title : str
+        The title to display.
+    wafers : list of 3-tuples
+        The wafers as ``(name, xyd, wafer_info)`` tuples.
+    size : tuple, optional
+        The windows size in ``(width, height)``. Values must be ``int``s.
+        Defaults to ``(1000, 800)``.
+    kwargs :
+        Passed to :class:`WaferGalleryPanel`.
+    """
+
+    def __init__(self, title, wafers, size=(1000, 800), **kwargs):
+        wx.Frame.__init__(
+            self,
+            None,
+            wx.ID_ANY,
+            title=title,
+            size=size,
+        )
+        self.CreateStatusBar()
+        self.panel = WaferGalleryPanel(self, wafers, **kwargs)
+
+
+class WaferGalleryPanel(wx.ScrolledWindow):
+    """
+    A scrolled grid of wafer map thumbnails.
+
+    Parameters
+    ----------
+    parent : wxWindow
+        The parent window.
+    wafers : list of 3-tuples
+        The wafers as ``(name, xyd, wafer_info)`` tuples.
+    thumbnail_size : int, optional
+        The width and height of each thumbnail in px. Defaults to
+        `wm_THUMBNAIL_SIZE`.
+    data_type : wm_constants.DataType or string, optional
+        The type of data to plot. Must be one of `continuous` or `discrete`.
+        Defaults to `continuous`.
+    high_color : :class:`wx.Colour`, optional
+        The color to display if a value is above the plot range. Defaults
+        to `wm_constants.wm_HIGH_COLOR`.
+    low_color : :class:`wx.Colour`, optional
+        The color to display if a value is below the plot range. Defaults
+        to `wm_constants.wm_LOW_COLOR`.
+    plot_range : tuple, optional
+        The plot range to display. If ``None``, then auto-ranges to the
+        2nd and 98th percentiles of the whole lot, so that the colors of
+        different wafers can be compared. Defaults to ``None``.
+    plot_die_centers : bool, optional
+        If ``True``, display small red circles denoting the die centers.
+        Defaults to ``False``.
+    show_die_gridlines : bool, optional
+        If ``True``, displayes gridlines along the die edges. Defaults to
+        ``True``.
+    render_mode : :class:`wm_constants.RenderMode` or str, optional
+        How to draw the die in the full wafer windows. Defaults to
+        `auto`.
+    show_reticle_gridlines : bool, optional
+        If ``True``, displays gridlines along the reticle edges. Defaults
+        to ``False``.
+    workers : int, optional
+        The number of threads that draw thumbnails. If ``None``, uses the
+        :class:`concurrent.futures.ThreadPoolExecutor` default. Defaults to
+        ``None``.
+    """
+
+    def __init__(
+        self,
+        parent,
+        wafers,
+        thumbnail_size=wm_const.wm_THUMBNAIL_SIZE,
+        data_type=wm_const.DataType.CONTINUOUS,
+        high_color=wm_const.wm_HIGH_COLOR,
+        low_color=wm_const.wm_LOW_COLOR,
+        plot_range=None,
+        plot_die_centers=False,
+        show_die_gridlines=True,
+        render_mode=wm_const.RenderMode.AUTO,
+        show_reticle_gridlines=False,
+        workers=None,
+    ):
+        wx.ScrolledWindow.__init__(self, parent, style=wx.VSCROLL)
+
+        ### Inputs ##########################################################
+        self.parent = parent
+        self.wafers = list(wafers)
+        self.thumbnail_size = thumbnail_size
+        # backwards compatability
+        if isinstance(data_type, str):
+            data_type = wm_const.DataType(data_type)
+        self.data_type = data_type
+        self.high_color = high_color
+        self.low_color = low_color
+        if plot_range is None and data_type == wm_const.DataType.CONTINUOUS:
+            plot_range = lot_plot_range([_w[1] for _w in self.wafers])
+        self.plot_range = plot_range
+        self.plot_die_centers = plot_die_centers
+        self.show_die_gridlines = show_die_gridlines
+        self.render_mode = render_mode
+        self.show_reticle_gridlines = show_reticle_gridlines
+
+        ### Other Attributes ################################################
+        # {index: wx.Bitmap} of the thumbnails drawn so far.
+        self.thumbnails = {}
+        self.failed = {}
+        self._pending = set()
+        self._visible = set()
+        self._closed = False
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers)
+
+        self._init_ui()
+
+    def _init_ui(self):
+        """Set up the window and bind events."""
+        self.SetBackgroundColour(wx.BLACK)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.SetScrollRate(0, wm_const.wm_SPACER * 4)
+        self._update_virtual_size()
+
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_SIZE, self.on_size)
+        self.Bind(wx.EVT_LEFT_UP, self.on_left_up)
+        self.Bind(wx.EVT_MOTION, self.on_motion)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
+
+    ### #--------------------------------------------------------------------
+    ### Layout
+    ### #--------------------------------------------------------------------
+
+    @property
+    def tile_size(self):
+        """The ``(width, height)`` of a tile, including its name and gaps."""
+        label_height = self.GetCharHeight() + wm_const.wm_SPACER
+        return (
+            self.thumbnail_size + wm_const.wm_SPACER,
+            self.thumbnail_size + label_height + wm_const.wm_SPACER,
+        )
+
+    @property
+    def columns(self):
+        """The number of tiles in each row."""
+        return max(1, self.GetClientSize()[0] // self.tile_size[0])
+
+    def tile_rect(self, index):
+        """Return the thumbnail's :class:`wx.Rect` in unscrolled coords."""
+        tile_w, tile_h = self.tile_size
+        row, col = divmod(index, self.columns)
+        return wx.Rect(
+            col * tile_w + wm_const.wm_SPACER,
+            row * tile_h + wm_const.wm_SPACER,
+            self.thumbnail_size,
+            self.thumbnail_size,
+        )
+
+    def tile_at(self, x, y):
+        """Return the index of the thumbnail at an unscrolled point, or None."""
+        tile_w, tile_h = self.tile_size
+        col, row = x // tile_w, y // tile_h
+        if col >= self.columns:
+            return None
+        index = row * self.columns + col
+        if index >= len(self.wafers):
+            return None
+        if not self.tile_rect(index).Contains(x, y):
+            return None
+        return index
+
+    def visible_tiles(self):
+        """Return the indices of the tiles that are on screen."""
+        tile_h = self.tile_size[1]
+        top = self.CalcUnscrolledPosition(0, 0)[1]
+        bottom = top + self.GetClientSize()[1]
+        first = (top // tile_h) * self.columns
+        last = (bottom // tile_h + 1) * self.columns
+        return range(first, min(last, len(self.wafers)))
+
+    def _update_virtual_size(self):
+        """Make the scrolled area fit all of the tiles."""
+        tile_w, tile_h = self.tile_size
+        rows = math.ceil(len(self.wafers) / self.columns)
+        self.SetVirtualSize((self.columns * tile_w + wm_const.wm_SPACER, rows * tile_h))
+
+    ### #--------------------------------------------------------------------
+    ### Thumbnails
+    ### #--------------------------------------------------------------------
+
+    def _request(self, index):
+        """Draw a thumbnail on a background thread, unless already queued."""
+        if index in self._pending:
+            return
+        self._pending.add(index)
+        self._executor.submit(self._render, index)
+
+    def _render(self, index):
+        """Draw one thumbnail. Runs on a background thread."""
+        # The user may have scrolled past this tile while it was queued.
+        if self._closed or index not in self._visible:
+            self._pending.discard(index)
+            return
+
+        _, xyd, wafer_info = self.wafers[index]
+        try:
+            image = wm_raster.render(
+                xyd,
+                wafer_info,
+                data_type=self.data_type,
+                high_color=self.high_color,
+                low_color=self.low_color,
+                plot_range=self.plot_range,
+                plot_die_centers=self.plot_die_centers,
+                show_die_gridlines=self.show_die_gridlines,
+                show_reticle_gridlines=self.show_reticle_gridlines,
+                size=self.thumbnail_size,
+            )
+        except Exception as err:
+            wx.CallAfter(self._on_rendered, index, None, str(err))
+        else:
+            wx.CallAfter(self._on_rendered, index, image, None)
+
+    def _on_rendered(self, index, image, error):
+        """Show a finished thumbnail."""
+        if not self:
+            # The window was closed while the thumbnail was being drawn.
+            return
+        self._pending.discard(index)
+        if image is None:
+            self.failed[index] = error
+        else:
+            rows, cols = image.shape[:2]
+            self.thumbnails[index] = wx.Bitmap.FromBufferRGBA(cols, rows, image)
+
+        rect = self.tile_rect(index)
+        rect.SetPosition(self.CalcScrolledPosition(rect.GetPosition()))
+        self.RefreshRect(rect)
+
+    ### #--------------------------------------------------------------------
+    ### Event Handlers
+    ### #--------------------------------------------------------------------
+
+    def on_paint(self, event):
+        """Draw the visible tiles and queue any missing thumbnails."""
+        dc = wx.AutoBufferedPaintDC(self)
+        self.DoPrepareDC(dc)
+        dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
+        dc.Clear()
+        dc.SetTextForeground(wx.WHITE)
+        dc.SetPen(wx.TRANSPARENT_PEN)
+        dc.SetBrush(wx.Brush(wm_const.wm_THUMBNAIL_PLACEHOLDER_COLOR))
+
+        visible = self.visible_tiles()
+        self._visible = set(visible)
+        for index in visible:
+            name = self.wafers[index][0]
+            rect = self.tile_rect(index)
+            bitmap = self.thumbnails.get(index)
+            if bitmap is not None:
+                dc.DrawBitmap(bitmap, rect.x, rect.y)
+            else:
+                dc.DrawRectangle(rect)
+                if index in self.failed:
+                    name += " (failed)"
+                else:
+                    self._request(index)
+            dc.DrawText(
+                str(name), rect.x, rect.y + rect.height + wm_const.wm_SPACER // 2
+            )
+
+    def on_size(self, event):
+        """Reflow the tiles to the new width."""
+        self._update_virtual_size()
+        self.Refresh()
+        event.Skip()
+
+    def on_left_up(self, event):
+        """Open the full wafer map of the clicked thumbnail."""
+        index = self.tile_at(*self.CalcUnscrolledPosition(event.GetPosition()))
+        if index is not None:
+            self.open_wafer(index)
+
+    def on_motion(self, event):
+        """Show the wafer under the mouse in the status bar."""
+        frame = self.GetTopLevelParent()
+        if frame.GetStatusBar() is None:
+            return
+        index = self.tile_at(*self.CalcUnscrolledPosition(event.GetPosition()))
+        if index is None:
+            frame.SetStatusText("")
+        else:
+            text = str(self.wafers[index][0])
+            if index in self.failed:
+                text += ": " + self.failed[index]
+            frame.SetStatusText(text)
+
+    def on_destroy(self, event):
+        """Stop drawing thumbnails when the window closes."""
+        if event.GetEventObject() is self:
+            self._closed = True
+            self._executor.shutdown(wait=False)
+        event.Skip()
+
+    def open_wafer(self, index):
+        """
+        Open a :class:`wafer_map.wm_frame.WaferMapWindow` for one wafer.
+
+        Returns
+        -------
+        :class:`wafer_map.wm_frame.WaferMapWindow`
+        """
+        name, xyd, wafer_info = self.wafers[index]
+        frame = wm_frame.WaferMapWindow(
+            str(name),
+            xyd,
+            wafer_info,
+            data_type=self.data_type,
+            high_color=self.high_color,
+            low_color=self.low_color,
+            plot_range=self.plot_range,
+            plot_die_centers=self.plot_die_centers,
+            show_die_gridlines=self.show_die_gridlines,
+            render_mode=self.render_mode,
+            show_reticle_gridlines=self.show_reticle_gridlines,
+        )
+        frame.Show()
+        return frame
+
+
+def lot_plot_range(xyds):
+    """
+    Return the 2nd and 98th percentiles of the values of many wafers.
+
+    Parameters
+    ----------
+    xyds : list of lists of 3-tuples
+        The ``xyd`` data of each wafer.
+
+    Returns
+    -------
+    plot_range : tuple or None
+        ``(low, high)``, or ``None`` if there are no values.
+    """
+    values = [wm_utils.xyd_to_arrays(_xyd)[2].astype(float) for _xyd in xyds]
+    values = np.concatenate(values) if values else np.empty(0)
+    if not np.isfinite(values).any():
+        return None
+    return wm_utils.summary_stats(
+        values, wm_const.wm_PLOT_RANGE_PERCENTILES
+    ).percentiles
+
+
+def main():
+    """Run when called as a module."""
+    wafer_info, xyd = gen_fake_data.generate_fake_data(
+        die_x=5.43,
+        die_y=6.3,
+        dia=150,
+        edge_excl=4.5,
+        flat_excl=4.5,
+        x_offset=0,
+        y_offset=0.5,
+        grid_center=(29, 21.5),
+    )
+    wafers = []
+    for number in range(1, 26):
+        noisy = [(_x, _y, _d * random.uniform(0.9, 1.1)) for _x, _y, _d in xyd]
+        wafers.append(("Wafer {:02d}".format(number), noisy, wafer_info))
+
+    app = wx.App()
+    frame = WaferGalleryWindow("Lot", wafers)
+    frame.Show()
+    app.MainLoop()
+
+
+if __name__ == "__main__":
+    main()
@@ -21,14 +21,31 @@ class WaferInfo(object):
     flat_excl : float, optional
         The distance in mm from the wafer flat that should be
         considered bad die. Defaults to 5mm.
+    reticle_size : tuple, optional
+        The number of die in a reticle as a ``(columns, rows)`` tuple. If
+        ``None``, reticle gridlines are not available. Defaults to ``None``.
+    reticle_offset : tuple, optional
+        The grid coordinate of the upper-left die of any one reticle as a
+        ``(x_grid, y_grid)`` tuple. Defaults to ``(0, 0)``.
     """
 
-    def __init__(self, die_size, center_xy, dia=150, edge_excl=5, flat_excl=5):
+    def __init__(
+        self,
+        die_size,
+        center_xy,
+        dia=150,
+        edge_excl=5,
+        flat_excl=5,
+        reticle_size=None,
+        reticle_offset=(0, 0),
+    ):
         self.die_size = die_size
         self.center_xy = center_xy
         self.dia = dia
         self.edge_excl = edge_excl
         self.flat_excl = flat_excl
+        self.reticle_size = reticle_size
+        self.reticle_offset = reticle_offset
 
     def __str__(self):
         string = """
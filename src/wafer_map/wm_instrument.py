@@ -0,0 +1,191 @@
+"""
+Timing spans for finding out which part of drawing a wafer map is slow.
+
+Pass an instrument to :class:`wafer_map.wm_core.WaferMapPanel` (or
+:class:`wafer_map.wm_frame.WaferMapWindow`) and it is called with a
+:class:`Span` after each phase of building and drawing the map::
+
+    timings = wm_instrument.Timings()
+    panel = wm_core.WaferMapPanel(parent, xyd, wafer_info, instrument=timings)
+    ...
+    print(timings.report())
+
+Any callable that takes a :class:`Span` works as an instrument, such as one
+that logs them::
+
+    panel = wm_core.WaferMapPanel(..., instrument=lambda span: log.debug(span))
+
+The spans are:
+
+``create_legend``
+    Creating the legend, including the auto plot range.
+``legend_draw_scale``
+    Drawing the continuous legend's color scale.
+``color_die``
+    Coloring every die.
+``draw_die``
+    Creating the die objects. ``objects`` is how many.
+``draw_wafer_objects``
+    Creating the outline, crosshairs, and gridlines.
+``recolor``
+    Recoloring the die after a color change.
+``draw``
+    Each redraw of the canvas, whatever caused it. ``objects`` is how many
+    objects are on the canvas.
+``move_image``
+    Each zoom or pan, which includes a ``draw``.
+``repaint``
+    Each repaint of only the die that changed, while updating or
+    streaming.
+
+Spans can be nested, such as ``color_die`` inside ``recolor``. Each span's
+time includes the spans inside it.
+"""
+import collections
+import time
+
+
+class Span(object):
+    """
+    One timed phase.
+
+    Attributes
+    ----------
+    name : str
+        What was timed.
+    start : float
+        When it started, from :func:`time.perf_counter`.
+    seconds : float
+        How long it took.
+    info : dict
+        Counts and other details, such as ``{"objects": 1024}``.
+    """
+
+    __slots__ = ("name", "start", "seconds", "info")
+
+    def __init__(self, name, start, seconds, info):
+        self.name = name
+        self.start = start
+        self.seconds = seconds
+        self.info = info
+
+    def __repr__(self):
+        return "Span({!r}, {!r}, {!r}, {!r})".format(
+            self.name, self.start, self.seconds, self.info
+        )
+
+    def __str__(self):
+        text = "{} {:.3f} ms".format(self.name, self.seconds * 1000)
+        if self.info:
+            text += " " + " ".join(
+                "{}={}".format(_k, _v) for _k, _v in sorted(self.info.items())
+            )
+        return text
+
+
+class Timings(object):
+    """
+    An instrument that keeps the spans it is given.
+
+    Parameters
+    ----------
+    max_spans : int, optional
+        Only keep the newest ``max_spans`` spans, so that a long-running
+        map doesn't use up memory. If ``None``, keeps all of them. Defaults
+        to `10000`.
+    """
+
+    def __init__(self, max_spans=10000):
+        self.spans = collections.deque(maxlen=max_spans)
+
+    def __call__(self, span):
+        self.spans.append(span)
+
+    def clear(self):
+        """Forget all spans."""
+        self.spans.clear()
+
+    def summary(self):
+        """
+        Summarize the spans by name.
+
+        Returns
+        -------
+        summary : :class:`collections.OrderedDict`
+            ``{name: {"count": int, "total": float, "max": float, "last":
+            float}}``, in the order that each name was first seen. Times
+            are in seconds.
+        """
+        summary = collections.OrderedDict()
+        for span in self.spans:
+            stats = summary.get(span.name)
+            if stats is None:
+                stats = summary[span.name] = {"count": 0, "total": 0.0, "max": 0.0}
+            stats["count"] += 1
+            stats["total"] += span.seconds
+            stats["max"] = max(stats["max"], span.seconds)
+            stats["last"] = span.seconds
+        return summary
+
+    def report(self):
+        """Return the :meth:`summary` as a text table."""
+        row = "{:<20} {:>6} {:>12} {:>12} {:>12}"
+        lines = [row.format("span", "count", "total ms", "mean ms", "max ms")]
+        for name, stats in self.summary().items():
+            lines.append(
+                row.format(
+                    name,
+                    stats["count"],
+                    "{:.3f}".format(stats["total"] * 1000),
+                    "{:.3f}".format(stats["total"] * 1000 / stats["count"]),
+                    "{:.3f}".format(stats["max"] * 1000),
+                )
+            )
+        return "\n".join(lines)
+
+
+def span(instrument, name, **info):
+    """
+    Time a ``with`` block and pass the :class:`Span` to ``instrument``.
+
+    Does nothing but run the block if ``instrument`` is ``None``. The
+    ``with`` statement gives the span's ``info`` dict, so that counts only
+    known at the end can be added::
+
+        with wm_instrument.span(self.instrument, "draw_die") as info:
+            ...
+            info["objects"] = len(rects)
+
+    Parameters
+    ----------
+    instrument : callable
+        Called with the :class:`Span` when the block ends, even if it
+        raised.
+    name : str
+        The span's name.
+    info :
+        The span's starting ``info``.
+    """
+    return _SpanTimer(instrument, name, info)
+
+
+class _SpanTimer(object):
+    """The context manager returned by :func:`span`."""
+
+    __slots__ = ("instrument", "name", "info", "start")
+
+    def __init__(self, instrument, name, info):
+        self.instrument = instrument
+        self.name = name
+        self.info = info
+
+    def __enter__(self):
+        if self.instrument is not None:
+            self.start = time.perf_counter()
+        return self.info
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.instrument is not None:
+            seconds = time.perf_counter() - self.start
+            self.instrument(Span(self.name, self.start, seconds, self.info))
+        return False
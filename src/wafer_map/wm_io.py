@@ -0,0 +1,458 @@
+"""
+Read wafer data files.
+
+Text files hold one row per die. The first two columns are the die's grid x
+and grid y; every other column is a parameter to plot. The first non-comment
+line is the header with the column names. Columns are split on commas if the
+header has any, otherwise on whitespace. Comment lines before the header may
+give the wafer information as ``key: value``::
+
+    # die_size: 5.43, 6.3
+    # center_xy: 29, 21.5
+    # dia: 150
+    x,y,Vth,Idsat,Bin
+    28,3,0.71,1.2e-3,1
+    29,3,0.69,1.1e-3,2
+
+Parameters whose values are all numbers are continuous. Any other parameter,
+such as bin names, is discrete.
+
+Large wafers and lots can be stored as NumPy files instead, which are
+memory-mapped rather than read: opening one only reads its headers, and the
+operating system pages in the die data as it is used. The arrays are given
+to the wafer map and :mod:`wafer_map.wm_raster` as they are, without being
+copied.
+
+``.npy``
+    One structured array with one record per die. The first two fields are
+    the die's grid x and grid y; every other field is a parameter. It has no
+    wafer information, so that must be given to :meth:`WaferData.wafer_info`.
+``.npz``
+    An archive, as written by :func:`write_npz` or :func:`numpy.savez`, with
+    one 1-D array per column: ``x`` and ``y`` for the grid coordinates and
+    one per parameter, in archive order. An optional ``wafer_info`` member
+    holds the wafer information as a JSON object with the same keys as the
+    text header, such as ``{"die_size": [5.43, 6.3], "dia": 150}``.
+
+Only uncompressed members are memory-mapped. Members of archives written by
+:func:`numpy.savez_compressed` are read into memory. Store the grid
+coordinates as the default integer type so that they aren't copied either.
+"""
+import json
+import os
+import struct
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+from wafer_map import wm_constants as wm_const
+from wafer_map import wm_info
+
+# Wafer information keys, and how many numbers each one holds.
+_INFO_KEYS = {
+    "die_size": 2,
+    "center_xy": 2,
+    "dia": 1,
+    "edge_excl": 1,
+    "flat_excl": 1,
+    "reticle_size": 2,
+    "reticle_offset": 2,
+}
+
+# The grid coordinate and wafer information members of an ``.npz`` file.
+_NPZ_KEYS = ("x", "y", "wafer_info")
+
+
+class WaferData(object):
+    """
+    The die and parameters of one wafer.
+
+    Parameters
+    ----------
+    grid_x, grid_y : :class:`numpy.ndarray`
+        The grid coordinates of each die.
+    parameters : :class:`collections.OrderedDict`
+        ``{name: values}`` with one array of values per parameter, in file
+        order.
+    metadata : dict, optional
+        The wafer information given in the file. Defaults to ``{}``.
+    """
+
+    def __init__(self, grid_x, grid_y, parameters, metadata=None):
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.parameters = parameters
+        self.metadata = {} if metadata is None else metadata
+
+    def arrays(self, name):
+        """
+        Return the ``(grid_x, grid_y, values)`` arrays of one parameter.
+
+        The arrays are not copied. They can be plotted like ``xyd``, but
+        without making a tuple per die.
+        """
+        return (self.grid_x, self.grid_y, self.parameters[name])
+
+    def xyd(self, name):
+        """Return the ``(grid_x, grid_y, value)`` tuples of one parameter."""
+        return list(
+            zip(
+                self.grid_x.tolist(),
+                self.grid_y.tolist(),
+                self.parameters[name].tolist(),
+            )
+        )
+
+    def data_type(self, name):
+        """Return the :class:`wm_constants.DataType` of one parameter."""
+        if self.parameters[name].dtype.kind in "fiu":
+            return wm_const.DataType.CONTINUOUS
+        return wm_const.DataType.DISCRETE
+
+    def wafer_info(self, **kwargs):
+        """
+        Return the :class:`wm_info.WaferInfo` given in the file.
+
+        Keyword arguments override the file's values. ``die_size`` and
+        ``center_xy`` must be given by one or the other.
+        """
+        info = dict(self.metadata)
+        info.update({_k: _v for _k, _v in kwargs.items() if _v is not None})
+        for key in ("die_size", "center_xy"):
+            if key not in info:
+                raise ValueError("{} is not given".format(key))
+        return wm_info.WaferInfo(**info)
+
+
+def read(path, parameters=None):
+    """
+    Read a wafer data file of any supported type.
+
+    ``.npy`` and ``.npz`` files are memory-mapped by :func:`read_npy` and
+    :func:`read_npz`. Any other file is read by :func:`read_text`.
+
+    Parameters
+    ----------
+    path : str
+        The file to read.
+    parameters : list of str, optional
+        The parameters to read. If ``None``, reads all of them. Defaults to
+        ``None``.
+
+    Returns
+    -------
+    :class:`WaferData`
+    """
+    return _READERS.get(_extension(path), read_text)(path, parameters)
+
+
+def read_header(path):
+    """
+    Read only the wafer information and column names of a wafer data file.
+
+    Returns
+    -------
+    metadata : dict
+        The wafer information given in the file.
+    columns : list of str
+        The column names, starting with grid x and grid y.
+    """
+    extension = _extension(path)
+    if extension == ".npy":
+        table = np.load(path, mmap_mode="r")
+        return ({}, _npy_columns(path, table))
+    if extension == ".npz":
+        with zipfile.ZipFile(path) as archive:
+            names = _npz_names(archive)
+            metadata = _npz_metadata(archive, names)
+        _check_npz_names(path, names)
+        columns = ["x", "y"]
+        columns.extend(_n for _n in names if _n not in _NPZ_KEYS)
+        return (metadata, columns)
+    metadata, columns, _, _ = _read_header(path)
+    return (metadata, columns)
+
+
+def read_text(path, parameters=None):
+    """
+    Read a wafer data text file.
+
+    Parameters
+    ----------
+    path : str
+        The file to read. See the module docs for the layout.
+    parameters : list of str, optional
+        The parameters to read. If ``None``, reads all of them. Defaults to
+        ``None``.
+
+    Returns
+    -------
+    :class:`WaferData`
+    """
+    metadata, columns, delimiter, header_line = _read_header(path)
+    if len(columns) < 3:
+        raise ValueError("{} needs x, y, and at least one parameter".format(path))
+    if parameters is None:
+        parameters = columns[2:]
+    missing = set(parameters) - set(columns[2:])
+    if missing:
+        raise ValueError("{} has no parameters {}".format(path, sorted(missing)))
+
+    table = np.loadtxt(
+        path,
+        dtype=str,
+        delimiter=delimiter,
+        comments="#",
+        skiprows=header_line + 1,
+        ndmin=2,
+    )
+    if table.shape[1] != len(columns):
+        raise ValueError(
+            "{} has {} columns but {} names".format(path, table.shape[1], len(columns))
+        )
+    table = np.char.strip(table)
+
+    data = OrderedDict()
+    for name in parameters:
+        values = table[:, columns.index(name)]
+        try:
+            data[name] = values.astype(float)
+        except ValueError:
+            data[name] = values
+    return WaferData(
+        table[:, 0].astype(float).astype(int),
+        table[:, 1].astype(float).astype(int),
+        data,
+        metadata,
+    )
+
+
+def read_npy(path, parameters=None):
+    """
+    Memory-map a ``.npy`` wafer data file.
+
+    Parameters
+    ----------
+    path : str
+        The file to read. See the module docs for the layout.
+    parameters : list of str, optional
+        The parameters to read. If ``None``, reads all of them. Defaults to
+        ``None``.
+
+    Returns
+    -------
+    :class:`WaferData`
+        Its arrays are read-only views of the file.
+    """
+    table = np.load(path, mmap_mode="r")
+    columns = _npy_columns(path, table)
+    parameters = _check_parameters(path, columns[2:], parameters)
+    data = OrderedDict((_name, table[_name]) for _name in parameters)
+    return WaferData(table[columns[0]], table[columns[1]], data)
+
+
+def read_npz(path, parameters=None):
+    """
+    Memory-map a ``.npz`` wafer data file.
+
+    Parameters
+    ----------
+    path : str
+        The file to read. See the module docs for the layout.
+    parameters : list of str, optional
+        The parameters to read. If ``None``, reads all of them. Defaults to
+        ``None``.
+
+    Returns
+    -------
+    :class:`WaferData`
+        Its arrays are read-only views of the file, except for compressed
+        members.
+    """
+    with zipfile.ZipFile(path) as archive:
+        names = _npz_names(archive)
+        _check_npz_names(path, names)
+        parameters = _check_parameters(
+            path, [_n for _n in names if _n not in _NPZ_KEYS], parameters
+        )
+        metadata = _npz_metadata(archive, names)
+        arrays = {
+            _name: _npz_array(path, archive, names[_name])
+            for _name in ["x", "y"] + list(parameters)
+        }
+
+    size = len(arrays["x"])
+    for name, array in arrays.items():
+        if array.ndim != 1 or len(array) != size:
+            raise ValueError(
+                "{}: {} must be 1-D with {} values".format(path, name, size)
+            )
+    data = OrderedDict((_name, arrays[_name]) for _name in parameters)
+    return WaferData(arrays["x"], arrays["y"], data, metadata)
+
+
+def write_npz(path, wafer):
+    """
+    Write a :class:`WaferData` to an uncompressed ``.npz`` file.
+
+    The file can be memory-mapped by :func:`read_npz`.
+
+    Parameters
+    ----------
+    path : str
+        The file to write.
+    wafer : :class:`WaferData`
+        The wafer to write. Its parameters may not be named ``x``, ``y``,
+        or ``wafer_info``.
+    """
+    reserved = set(_NPZ_KEYS).intersection(wafer.parameters)
+    if reserved:
+        raise ValueError("parameters may not be named {}".format(sorted(reserved)))
+    arrays = OrderedDict([("x", wafer.grid_x), ("y", wafer.grid_y)])
+    if wafer.metadata:
+        arrays["wafer_info"] = np.array(json.dumps(wafer.metadata))
+    arrays.update(wafer.parameters)
+    np.savez(path, **arrays)
+
+
+def _read_header(path):
+    """
+    Return the metadata, column names, delimiter, and line number of the
+    header of a text file.
+    """
+    metadata = {}
+    with open(path) as openf:
+        for number, line in enumerate(openf):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                _parse_info(line[1:], metadata)
+                continue
+            delimiter = "," if "," in line else None
+            columns = [_c.strip() for _c in line.split(delimiter)]
+            return (metadata, columns, delimiter, number)
+    raise ValueError("{} has no header".format(path))
+
+
+def _parse_info(text, metadata):
+    """Add a ``key: value`` wafer information comment to ``metadata``."""
+    key, _, value = text.partition(":")
+    key = key.strip()
+    if key not in _INFO_KEYS:
+        return
+    _set_info(metadata, key, [float(_v) for _v in value.replace(",", " ").split()])
+
+
+def _set_info(metadata, key, numbers):
+    """Add one wafer information value to ``metadata``."""
+    if len(numbers) != _INFO_KEYS[key]:
+        raise ValueError("{} needs {} values".format(key, _INFO_KEYS[key]))
+    if key in ("reticle_size", "reticle_offset"):
+        numbers = [int(_n) for _n in numbers]
+    metadata[key] = tuple(numbers) if len(numbers) > 1 else numbers[0]
+
+
+def _extension(path):
+    """Return the lower-case extension of ``path``."""
+    return os.path.splitext(path)[1].lower()
+
+
+def _check_parameters(path, available, parameters):
+    """Return the parameters to read, after checking that they exist."""
+    if not available:
+        raise ValueError("{} needs x, y, and at least one parameter".format(path))
+    if parameters is None:
+        return list(available)
+    missing = set(parameters) - set(available)
+    if missing:
+        raise ValueError("{} has no parameters {}".format(path, sorted(missing)))
+    return list(parameters)
+
+
+def _npy_columns(path, table):
+    """Return the field names of a ``.npy`` wafer data file."""
+    if table.dtype.names is None or table.ndim != 1:
+        raise ValueError("{} is not a 1-D structured array".format(path))
+    return list(table.dtype.names)
+
+
+def _npz_names(archive):
+    """Return ``{name: ZipInfo}`` of the arrays in an ``.npz``, in order."""
+    return OrderedDict(
+        (_info.filename[: -len(".npy")], _info)
+        for _info in archive.infolist()
+        if _info.filename.endswith(".npy")
+    )
+
+
+def _check_npz_names(path, names):
+    """Check that an ``.npz`` has the grid coordinates."""
+    for key in ("x", "y"):
+        if key not in names:
+            raise ValueError("{} has no {} array".format(path, key))
+
+
+def _npz_metadata(archive, names):
+    """Return the wafer information of an ``.npz``."""
+    metadata = {}
+    if "wafer_info" not in names:
+        return metadata
+    with archive.open(names["wafer_info"]) as openf:
+        text = np.lib.format.read_array(openf).item()
+    for key, value in json.loads(text).items():
+        if key in _INFO_KEYS:
+            _set_info(metadata, key, [float(_v) for _v in np.ravel(value)])
+    return metadata
+
+
+def _npz_array(path, archive, info):
+    """
+    Memory-map one member of an ``.npz``.
+
+    Falls back to reading it if it is compressed or can't be mapped.
+    """
+    header = None
+    if info.compress_type == zipfile.ZIP_STORED:
+        header = _npz_member_header(path, info)
+    if header is not None:
+        shape, fortran_order, dtype, offset = header
+        if not dtype.hasobject and np.prod(shape) > 0:
+            return np.memmap(
+                path,
+                dtype=dtype,
+                mode="r",
+                offset=offset,
+                shape=shape,
+                order="F" if fortran_order else "C",
+            )
+    with archive.open(info) as openf:
+        return np.lib.format.read_array(openf)
+
+
+def _npz_member_header(path, info):
+    """
+    Return the shape, order, dtype, and file offset of an uncompressed
+    ``.npz`` member's data, or ``None`` if its header can't be read.
+    """
+    with open(path, "rb") as openf:
+        # The member follows its local file header, whose size depends on
+        # the lengths of the name and extra field.
+        openf.seek(info.header_offset)
+        local = openf.read(30)
+        if local[:4] != b"PK\x03\x04":
+            return None
+        name_len, extra_len = struct.unpack("<HH", local[26:30])
+        openf.seek(info.header_offset + 30 + name_len + extra_len)
+        version = np.lib.format.read_magic(openf)
+        if version == (1, 0):
+            header = np.lib.format.read_array_header_1_0(openf)
+        elif version == (2, 0):
+            header = np.lib.format.read_array_header_2_0(openf)
+        else:
+            return None
+        return header + (openf.tell(),)
+
+
+_READERS = {".npy": read_npy, ".npz": read_npz}
@@ -0,0 +1,204 @@
+"""
+Read defect locations from KLARF 1.x inspection files.
+
+Each wafer's defects are returned as a :class:`KlarfWafer`, with their
+positions in the same coordinates as the wafer map: mm from the wafer
+center, +y up, and the flat or notch down. They can be drawn over a wafer
+map with :meth:`wafer_map.wm_core.WaferMapPanel.set_defects`::
+
+    for wafer in wm_klarf.read_klarf("lot_42.klarf"):
+        panel.set_defects(wafer.x, wafer.y, wafer.classes)
+
+A defect's position is found from its die (``XINDEX``, ``YINDEX``), its
+position in the die (``XREL``, ``YREL``), the ``DiePitch``, and the
+``SampleCenterLocation``, then rotated by the ``OrientationMarkLocation``.
+Its class name comes from the ``ClassLookup``.
+
+Each defect's row in the ``DefectList`` must start on a new line. Image
+lists, which may continue onto the following lines, are skipped.
+"""
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+# Defect record fields that are lists rather than one value. They are
+# always the last fields.
+_LIST_FIELDS = ("IMAGELIST",)
+
+# OrientationMarkLocation: how to rotate (x, y) to bring the mark down.
+_ROTATIONS = {
+    "DOWN": lambda x, y: (x, y),
+    "UP": lambda x, y: (-x, -y),
+    "LEFT": lambda x, y: (-y, x),
+    "RIGHT": lambda x, y: (y, -x),
+}
+
+
+class KlarfWafer(object):
+    """
+    The defects of one wafer in a KLARF file.
+
+    Attributes
+    ----------
+    wafer_id : str
+        The ``WaferID``, or ``None`` if it isn't given.
+    x, y : :class:`numpy.ndarray`
+        The position of each defect in mm from the wafer center.
+    classes : :class:`numpy.ndarray`
+        The class name of each defect, or its ``CLASSNUMBER`` as a string
+        if the class isn't in the ``ClassLookup``.
+    columns : :class:`collections.OrderedDict`
+        ``{name: values}`` of each field in the ``DefectRecordSpec``, such
+        as ``DEFECTID`` and ``DEFECTAREA``, except for list fields.
+    die_size : tuple
+        The ``DiePitch`` as a ``(width, height)`` tuple in mm, or ``None``.
+    dia : float
+        The wafer diameter in mm from the ``SampleSize``, or ``None``.
+    """
+
+    def __init__(self, wafer_id, x, y, classes, columns, die_size=None, dia=None):
+        self.wafer_id = wafer_id
+        self.x = x
+        self.y = y
+        self.classes = classes
+        self.columns = columns
+        self.die_size = die_size
+        self.dia = dia
+
+    def __len__(self):
+        return len(self.x)
+
+
+def read_klarf(path):
+    """
+    Read the defects of every wafer in a KLARF file.
+
+    Parameters
+    ----------
+    path : str
+        The file to read.
+
+    Returns
+    -------
+    wafers : list of :class:`KlarfWafer`
+        In file order.
+    """
+    with open(path, encoding="latin-1") as openf:
+        text = openf.read()
+
+    settings = {}
+    wafers = []
+    for record in _records(text):
+        record = record.strip()
+        if not record:
+            continue
+        keyword, body = _split_keyword(record)
+        if keyword == "DefectList":
+            wafers.append(_read_defects(path, body, settings))
+        elif keyword == "WaferID":
+            settings["WaferID"] = _tokens(body)[0] if body else None
+        elif keyword == "ClassLookup":
+            tokens = _tokens(body)
+            settings["ClassLookup"] = {
+                _number: _name for _number, _name in zip(tokens[1::2], tokens[2::2])
+            }
+        else:
+            settings[keyword] = _tokens(body)
+    return wafers
+
+
+def _records(text):
+    """Yield each record: the text up to each ``;`` that isn't in quotes."""
+    pending = []
+    for piece in text.split(";"):
+        pending.append(piece)
+        if sum(_p.count('"') for _p in pending) % 2:
+            # The ";" is inside a quoted string.
+            continue
+        yield ";".join(pending)
+        pending = []
+
+
+def _split_keyword(record):
+    """Return the ``(keyword, body)`` of a record."""
+    parts = record.split(None, 1)
+    return (parts[0], parts[1] if len(parts) > 1 else "")
+
+
+def _tokens(body):
+    """Split a record's body into words, unquoting quoted strings."""
+    return [
+        _quoted if _quoted or _word is None else _word
+        for _quoted, _word in (_m.groups() for _m in _TOKEN.finditer(body))
+    ]
+
+
+def _numbers(settings, keyword, count, default=None):
+    """Return the last ``count`` numbers of a setting, or ``default``."""
+    values = settings.get(keyword)
+    if values is None or len(values) < count:
+        return default
+    return [float(_v) for _v in values[-count:]]
+
+
+def _read_defects(path, body, settings):
+    """Read a ``DefectList`` into a :class:`KlarfWafer`."""
+    spec = settings.get("DefectRecordSpec")
+    if not spec:
+        raise ValueError("{}: DefectList has no DefectRecordSpec".format(path))
+    # The first token is the field count.
+    names = [_n.upper() for _n in spec[1:]]
+    for field in _LIST_FIELDS:
+        if field in names:
+            names = names[: names.index(field)]
+    for field in ("XREL", "YREL"):
+        if field not in names:
+            raise ValueError("{}: DefectRecordSpec has no {}".format(path, field))
+
+    table = _table(body, len(names))
+    columns = OrderedDict((_name, table[:, _i]) for _i, _name in enumerate(names))
+    zeros = np.zeros(len(table))
+
+    pitch_x, pitch_y = _numbers(settings, "DiePitch", 2, (0.0, 0.0))
+    center_x, center_y = _numbers(settings, "SampleCenterLocation", 2, (0.0, 0.0))
+    x = columns.get("XINDEX", zeros) * pitch_x + columns["XREL"] - center_x
+    y = columns.get("YINDEX", zeros) * pitch_y + columns["YREL"] - center_y
+    mark = (settings.get("OrientationMarkLocation") or ["DOWN"])[0].upper()
+    x, y = _ROTATIONS.get(mark, _ROTATIONS["DOWN"])(x / 1000, y / 1000)
+
+    lookup = settings.get("ClassLookup", {})
+    numbers = columns.get("CLASSNUMBER", zeros).astype(int)
+    labels, inverse = np.unique(numbers, return_inverse=True)
+    class_names = np.array([lookup.get(str(_n), str(_n)) for _n in labels.tolist()])
+    classes = class_names[inverse] if len(labels) else np.zeros(0, dtype=str)
+
+    die_size = None
+    if pitch_x > 0 and pitch_y > 0:
+        die_size = (pitch_x / 1000, pitch_y / 1000)
+    dia = _numbers(settings, "SampleSize", 1)
+    return KlarfWafer(
+        settings.get("WaferID"),
+        x,
+        y,
+        classes,
+        columns,
+        die_size,
+        dia[0] if dia else None,
+    )
+
+
+def _table(body, fields):
+    """Return the first ``fields`` numbers of each defect row."""
+    lines = [_l.split() for _l in body.splitlines()]
+    lines = [_l for _l in lines if _l]
+    widths = {len(_l) for _l in lines}
+    if len(widths) == 1 and widths.pop() >= fields:
+        # Every row is the same, so convert them all at once.
+        table = np.array(lines, dtype=float)
+        return table[:, :fields]
+    # Lines that are too short continue the image list of the row before.
+    rows = [_l[:fields] for _l in lines if len(_l) >= fields]
+    return np.array(rows, dtype=float).reshape(-1, fields)
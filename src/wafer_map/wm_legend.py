@@ -1,7 +1,6 @@
 """
 Draws the wafer map legend.
 """
-import colorsys
 from collections import OrderedDict
 
 import wx
@@ -9,6 +8,7 @@ import wx.lib.colourselect as csel
 from wx.lib.floatcanvas import FloatCanvas
 
 from wafer_map import wm_constants as wm_const
+from wafer_map import wm_instrument
 from wafer_map import wm_utils
 
 # TODO: Update to Bezier Curves for colors. See http://bsou.io/p/3
@@ -50,6 +50,9 @@ class ContinuousLegend(wx.Panel):
     oor_low_color : wxColour (wm_OOR_LOW_COLOR)
         This is the color that should be used for any values that are
         lesser than plot_range[0].
+    instrument : callable, optional
+        Called with a :class:`wm_instrument.Span` each time the scale is
+        drawn. Defaults to ``None``.
 
     Bound Events
     ------------
@@ -94,6 +97,7 @@ class ContinuousLegend(wx.Panel):
         num_ticks=wm_const.wm_TICK_COUNT,
         oor_high_color=wm_const.wm_OOR_HIGH_COLOR,
         oor_low_color=wm_const.wm_OOR_LOW_COLOR,
+        instrument=None,
     ):
         wx.Panel.__init__(self, parent)
 
@@ -106,6 +110,7 @@ class ContinuousLegend(wx.Panel):
         self.oor_high_color = oor_high_color
         self.oor_low_color = oor_low_color
         self.invalid_color = wm_const.wm_INVALID_COLOR
+        self.instrument = instrument
 
         ### Initialize Size Attributes ######################################
         # These get set in set_sizes(), but are here to remind me that
@@ -198,6 +203,34 @@ class ContinuousLegend(wx.Panel):
                 color = self.invalid_color
         return color
 
+    def get_colors(self, values):
+        """
+        Get the gradient colors for many values at once.
+
+        This is the vectorized version of :meth:`get_color`: values above
+        or below the plot range get the out-of-range colors and NaN values
+        get the invalid color.
+
+        Parameters
+        ----------
+        values : array-like of floats
+            The values to get colors for.
+
+        Returns
+        -------
+        colors : :class:`numpy.ndarray`
+            A ``(N, 3)`` array of ``uint8`` RGB values, one row per value.
+        """
+        return wm_utils.continuous_colors(
+            values,
+            self.plot_range,
+            self.low_color,
+            self.high_color,
+            self.oor_low_color,
+            self.oor_high_color,
+            self.invalid_color,
+        )
+
     def calc_ticks(self):
         """
         Calculate the tick marks' display string, value, and pixel value.
@@ -303,33 +336,36 @@ class ContinuousLegend(wx.Panel):
         The scale area is: background, gradient, OOR colors, ticks,
         and labels.
         """
-        self.draw_background()
-
-        # Draw the Gradient on a portion of the MemoryDC
-        self.draw_gradient()
-
-        # Draw the out-of-range high and low rectangles
-        c = self.oor_high_color
-        pen = wx.Pen(c)
-        brush = wx.Brush(c)
-        self.mdc.SetPen(pen)
-        self.mdc.SetBrush(brush)
-        self.mdc.DrawRectangle(self.grad_start_x, 2, self.grad_w, self.grad_start_y - 2)
+        with wm_instrument.span(self.instrument, "legend_draw_scale"):
+            self.draw_background()
+
+            # Draw the Gradient on a portion of the MemoryDC
+            self.draw_gradient()
+
+            # Draw the out-of-range high and low rectangles
+            c = self.oor_high_color
+            pen = wx.Pen(c)
+            brush = wx.Brush(c)
+            self.mdc.SetPen(pen)
+            self.mdc.SetBrush(brush)
+            self.mdc.DrawRectangle(
+                self.grad_start_x, 2, self.grad_w, self.grad_start_y - 2
+            )
 
-        c = self.oor_low_color
-        pen = wx.Pen(c)
-        brush = wx.Brush(c)
-        self.mdc.SetPen(pen)
-        self.mdc.SetBrush(brush)
-        self.mdc.DrawRectangle(
-            self.grad_start_x,
-            self.grad_end_y,
-            self.grad_w,
-            self.dc_h - self.grad_end_y - 2,
-        )
+            c = self.oor_low_color
+            pen = wx.Pen(c)
+            brush = wx.Brush(c)
+            self.mdc.SetPen(pen)
+            self.mdc.SetBrush(brush)
+            self.mdc.DrawRectangle(
+                self.grad_start_x,
+                self.grad_end_y,
+                self.grad_w,
+                self.dc_h - self.grad_end_y - 2,
+            )
 
-        # Calculate and draw the tickmarks.
-        self.draw_ticks(self.ticks)
+            # Calculate and draw the tickmarks.
+            self.draw_ticks(self.ticks)
 
     def draw_gradient(self):
         """Draw the Gradient, painted from North (high) to South (low)."""
@@ -542,18 +578,7 @@ class DiscreteLegend(wx.Panel):
             1 2 3 4 5 6 7 8  -->
             1 3 5 7 2 4 6 8
         """
-        spacing = 360 / n
-        colors = []
-        for val in wm_utils.frange(0, 360, spacing):
-            hsl = (val / 360, 1, 0.75)
-            colors.append(colorsys.hsv_to_rgb(*hsl))
-
-        # convert from 0-1 to 0-255 and return
-        colors = [tuple(int(i * 255) for i in color) for color in colors]
-
-        # Alternate colors across the circle
-        colors = colors[::2] + colors[1::2]
-        return colors
+        return wm_utils.create_discrete_colors(n)
 
     def create_color_dict(self):
         """
@@ -566,6 +591,22 @@ class DiscreteLegend(wx.Panel):
         self.color_dict = OrderedDict(zip(self.labels, self.colors))
         return self.color_dict
 
+    def get_colors(self, values):
+        """
+        Get the legend colors for many values at once.
+
+        Parameters
+        ----------
+        values : array-like
+            The values to get colors for. Every value must be a legend label.
+
+        Returns
+        -------
+        colors : :class:`numpy.ndarray`
+            A ``(N, 3)`` array of ``uint8`` RGB values, one row per value.
+        """
+        return wm_utils.discrete_colors(values, self.color_dict)
+
     def on_color_pick(self, event):
         """Recreate the {label: color} dict and send to the parent."""
         #  print(event.GetId())
@@ -0,0 +1,521 @@
+"""
+Render wafer maps to images without wxPython.
+
+Everything here is plain NumPy, so wafer maps can be rendered on servers and
+in batch jobs that have no display. The images match what
+:class:`wafer_map.wm_core.WaferMapPanel` draws when zoomed to fit: the die,
+die borders, gridlines, wafer outline, and crosshairs. The optional legend
+strip has the legend colors only; there are no text labels.
+"""
+import functools
+import struct
+import zlib
+
+import numpy as np
+
+from wafer_map import wm_cache
+from wafer_map import wm_constants as wm_const
+from wafer_map import wm_utils
+
+
+def render(
+    xyd,
+    wafer_info,
+    data_type=wm_const.DataType.CONTINUOUS,
+    high_color=wm_const.wm_HIGH_COLOR,
+    low_color=wm_const.wm_LOW_COLOR,
+    plot_range=None,
+    plot_die_centers=False,
+    discrete_legend_values=None,
+    show_die_gridlines=True,
+    discrete_legend_colors=None,
+    show_reticle_gridlines=False,
+    size=wm_const.wm_RASTER_SIZE,
+    show_outline=True,
+    show_crosshairs=True,
+    show_legend=False,
+):
+    """
+    Render a wafer map to an RGBA image.
+
+    Parameters
+    ----------
+    xyd : list of 3-tuples, or arrays
+        The data to plot, as ``(grid_x, grid_y, value)`` tuples or any of
+        the columnar forms of :func:`wafer_map.wm_utils.xyd_to_arrays`.
+    wafer_info : :class:`wafer_map.wm_info.WaferInfo`
+        The wafer information such as die size, diameter, etc.
+    data_type : :class:`wafer_map.wm_constants.DataType` or str, optional
+        The type of data to plot. Must be one of `continuous` or `discrete`.
+        Defaults to `continuous`.
+    high_color : tuple or :class:`wx.Colour`, optional
+        The color to display if a value is above the plot range. Defaults
+        to `wm_HIGH_COLOR`.
+    low_color : tuple or :class:`wx.Colour`, optional
+        The color to display if a value is below the plot range. Defaults
+        to `wm_LOW_COLOR`.
+    plot_range : tuple, optional
+        The plot range to display. If ``None``, then auto-ranges to the
+        2nd and 98th percentiles. Defaults to ``None``.
+    plot_die_centers : bool, optional
+        If ``True``, display small red circles denoting the die centers.
+        Defaults to ``False``.
+    discrete_legend_values : list, optional
+        A list of strings for die bins. If ``None``, the sorted unique
+        values of the data are used. Defaults to ``None``.
+    show_die_gridlines : bool, optional
+        If ``True``, displayes gridlines along the die edges. Defaults to
+        ``True``.
+    discrete_legend_colors : list, optional
+        A list of colors to use for the discrete legend. Defaults to
+        ``None``.
+    show_reticle_gridlines : bool, optional
+        If ``True``, displays gridlines along the reticle edges. Requires
+        ``wafer_info.reticle_size``. Defaults to ``False``.
+    size : int, optional
+        The width and height of the wafer area of the image in px. Defaults
+        to `wm_RASTER_SIZE`.
+    show_outline : bool, optional
+        If ``True``, draws the wafer outline. Defaults to ``True``.
+    show_crosshairs : bool, optional
+        If ``True``, draws the crosshairs. Defaults to ``True``.
+    show_legend : bool, optional
+        If ``True``, adds a strip with the legend colors to the right of
+        the wafer. Defaults to ``False``.
+
+    Returns
+    -------
+    image : :class:`numpy.ndarray`
+        A ``(size, width, 4)`` array of ``uint8`` RGBA values.
+
+    Notes
+    -----
+    Images are kept in the :func:`wafer_map.wm_cache.get_cache` cache, so
+    rendering the same map again is nearly free.
+    """
+    # backwards compatability
+    if isinstance(data_type, str):
+        data_type = wm_const.DataType(data_type)
+
+    grid_x, grid_y, values = wm_utils.xyd_to_arrays(xyd)
+
+    # Skip all of the work below if this exact map was rendered before.
+    cache = wm_cache.get_cache()
+    if cache is not None:
+        key = wm_cache.content_key(
+            "wm_raster.render",
+            grid_x,
+            grid_y,
+            values,
+            wafer_info,
+            data_type,
+            high_color,
+            low_color,
+            plot_range,
+            plot_die_centers,
+            discrete_legend_values,
+            show_die_gridlines,
+            discrete_legend_colors,
+            show_reticle_gridlines,
+            size,
+            show_outline,
+            show_crosshairs,
+            show_legend,
+        )
+        image = cache.get(key)
+        if image is not None:
+            return image.copy()
+
+    colors, legend = _die_colors(
+        values,
+        data_type,
+        high_color,
+        low_color,
+        plot_range,
+        discrete_legend_values,
+        discrete_legend_colors,
+    )
+
+    width = size
+    if show_legend:
+        width += wm_const.wm_GRAD_W + 2 * wm_const.wm_SPACER
+    image = np.zeros((size, width, 4), dtype=np.uint8)
+    image[..., 3] = 255
+
+    # Same area that the panel zooms to fit: the gridlines' extent.
+    raster = _Raster(image[:, :size], (wafer_info.dia / 2) * 1.05)
+
+    die_px = min(wafer_info.die_size) * raster.scale
+    detail = die_px >= wm_const.wm_LOD_DETAIL_PX
+
+    # Draw in the same order as the panel. Everything after the die is the
+    # same for every wafer of a lot, so it's drawn once and cached.
+    raster.fill_die(grid_x, grid_y, colors, wafer_info, borders=detail)
+    if plot_die_centers and detail:
+        raster.dots(
+            wafer_info.die_size[0] * (grid_x - wafer_info.center_xy[0]),
+            wafer_info.die_size[1] * (wafer_info.center_xy[1] - grid_y),
+            wm_const.wm_DIE_CENTER_DOT_COLOR,
+            wm_const.wm_DIE_CENTER_DOT_SIZE,
+        )
+    reticle_size = wafer_info.reticle_size
+    if not show_reticle_gridlines or reticle_size is None:
+        reticle_size = None
+    else:
+        reticle_size = tuple(reticle_size)
+    rows, cols, pixels = _overlay(
+        wafer_info.dia,
+        wafer_info.edge_excl,
+        wafer_info.flat_excl,
+        tuple(wafer_info.die_size),
+        tuple(wafer_info.center_xy),
+        size,
+        show_outline,
+        show_crosshairs,
+        show_die_gridlines and detail,
+        reticle_size,
+        tuple(wafer_info.reticle_offset),
+    )
+    image[rows, cols] = pixels
+
+    if show_legend:
+        _draw_legend(image[:, size:], data_type, legend, high_color, low_color)
+
+    if cache is not None:
+        cache.put(key, image)
+    return image
+
+
+def render_png(*args, **kwargs):
+    """
+    Render a wafer map to PNG.
+
+    Takes the same arguments as :func:`render`.
+
+    Returns
+    -------
+    bytes
+        The PNG file contents.
+    """
+    return encode_png(render(*args, **kwargs))
+
+
+def encode_png(image, level=6):
+    """
+    Encode an image as PNG.
+
+    Parameters
+    ----------
+    image : array-like
+        A ``(rows, cols)`` grayscale, ``(rows, cols, 3)`` RGB, or
+        ``(rows, cols, 4)`` RGBA array of ``uint8`` values.
+    level : int, optional
+        The zlib compression level, 0 to 9. Defaults to `6`.
+
+    Returns
+    -------
+    bytes
+        The PNG file contents.
+    """
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    rows, cols = image.shape[:2]
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    color_type = {1: 0, 3: 2, 4: 6}[channels]
+
+    # Each row starts with a filter type byte; 0 means unfiltered.
+    scanlines = np.zeros((rows, cols * channels + 1), dtype=np.uint8)
+    scanlines[:, 1:] = image.reshape(rows, -1)
+
+    header = struct.pack(">IIBBBBB", cols, rows, 8, color_type, 0, 0, 0)
+    return b"".join(
+        [
+            b"\x89PNG\r\n\x1a\n",
+            _png_chunk(b"IHDR", header),
+            _png_chunk(b"IDAT", zlib.compress(scanlines.tobytes(), level)),
+            _png_chunk(b"IEND", b""),
+        ]
+    )
+
+
+def _png_chunk(tag, data):
+    """Return a PNG chunk: length, tag, data, and CRC."""
+    crc = zlib.crc32(tag + data) & 0xFFFFFFFF
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", crc)
+
+
+def _die_colors(
+    values,
+    data_type,
+    high_color,
+    low_color,
+    plot_range,
+    discrete_legend_values,
+    discrete_legend_colors,
+):
+    """
+    Color the die the same way that the panel's legend does.
+
+    Returns
+    -------
+    colors : :class:`numpy.ndarray`
+        A ``(N, 3)`` array of ``uint8`` RGB values.
+    legend : tuple or dict
+        The plot range for continuous data, or the ``{label: color}`` dict
+        for discrete data.
+    """
+    if data_type == wm_const.DataType.DISCRETE:
+        if discrete_legend_values is None:
+            labels = np.unique(values).tolist()
+        else:
+            labels = list(discrete_legend_values)
+        if discrete_legend_colors is None:
+            discrete_legend_colors = wm_utils.create_discrete_colors(len(labels))
+        color_dict = dict(zip(labels, discrete_legend_colors))
+        return (wm_utils.discrete_colors(values, color_dict), color_dict)
+
+    if plot_range is None:
+        if len(values) == 0:
+            raise ValueError("plot_range must be given when xyd is empty")
+        values = np.asarray(values, dtype=float)
+        plot_range = wm_utils.summary_stats(
+            values, wm_const.wm_PLOT_RANGE_PERCENTILES
+        ).percentiles
+    colors = wm_utils.continuous_colors(
+        values,
+        plot_range,
+        low_color,
+        high_color,
+        wm_const.wm_OOR_LOW_COLOR,
+        wm_const.wm_OOR_HIGH_COLOR,
+        wm_const.wm_INVALID_COLOR,
+    )
+    return (colors, plot_range)
+
+
+@functools.lru_cache(maxsize=16)
+def _overlay(
+    dia,
+    edge_excl,
+    flat_excl,
+    die_size,
+    center_xy,
+    size,
+    show_outline,
+    show_crosshairs,
+    show_die_gridlines,
+    reticle_size,
+    reticle_offset,
+):
+    """
+    Draw the wafer outline, crosshairs, and gridlines.
+
+    Returns
+    -------
+    rows, cols : :class:`numpy.ndarray`
+        The pixels that were drawn on.
+    pixels : :class:`numpy.ndarray`
+        A ``(N, 4)`` array of the ``uint8`` RGBA values of those pixels.
+    """
+    image = np.zeros((size, size, 4), dtype=np.uint8)
+    raster = _Raster(image, (dia / 2) * 1.05)
+
+    if show_outline:
+        _draw_outline(raster, dia, edge_excl, flat_excl)
+    if show_crosshairs:
+        x_line, y_line = wm_utils.crosshair_coords(dia)
+        raster.lines([x_line[0] + x_line[1]], wm_const.wm_CROSSHAIR_COLOR, 1)
+        raster.lines([y_line[0] + y_line[1]], wm_const.wm_CROSSHAIR_COLOR, 1)
+    if show_die_gridlines:
+        segments = wm_utils.gridline_segments(die_size, center_xy, dia)
+        raster.lines(segments, wm_const.wm_DIE_GRIDLINE_COLOR, 1)
+    if reticle_size is not None:
+        segments = wm_utils.gridline_segments(
+            die_size, center_xy, dia, reticle_size, reticle_offset
+        )
+        raster.lines(segments, wm_const.wm_RETICLE_GRIDLINE_COLOR, 2)
+
+    rows, cols = np.nonzero(image[..., 3])
+    pixels = image[rows, cols]
+    for array in (rows, cols, pixels):
+        array.setflags(write=False)
+    return (rows, cols, pixels)
+
+
+def _draw_outline(raster, dia, edge_excl, flat_excl):
+    """Draw the wafer outline like :func:`wm_core.draw_wafer_outline`."""
+    outline = wm_utils.wafer_outline(
+        dia, edge_excl, flat_excl, wm_const.wm_FLAT_LENGTHS.get(dia)
+    )
+    # Flats are drawn thicker than notches
+    mark_width = 3 if outline.has_flat else 2
+
+    raster.arc(outline.rad, None, wm_const.wm_OUTLINE_COLOR, 1)
+    raster.arc(outline.rad, outline.edge_arc, wm_const.wm_WAFER_EDGE_COLOR, 3)
+    raster.polyline(outline.edge_mark, wm_const.wm_WAFER_EDGE_COLOR, mark_width)
+    raster.arc(outline.excl_rad, outline.excl_arc, wm_const.wm_WAFER_EDGE_COLOR, 3)
+    if outline.excl_mark is not None:
+        raster.polyline(outline.excl_mark, wm_const.wm_WAFER_EDGE_COLOR, mark_width)
+
+
+def _draw_legend(image, data_type, legend, high_color, low_color):
+    """Draw the legend colors, without labels, into ``image``."""
+    spacer = wm_const.wm_SPACER
+    cols = slice(spacer, spacer + wm_const.wm_GRAD_W)
+    height = image.shape[0] - 2 * spacer
+    if height <= 0:
+        return
+
+    if data_type == wm_const.DataType.DISCRETE:
+        # One swatch per item, top to bottom, shrunk to fit if needed.
+        n_items = len(legend)
+        if n_items == 0:
+            return
+        swatch = min(wm_const.wm_GRAD_W, (height + spacer) // n_items - spacer)
+        swatch = max(swatch, 1)
+        for _i, color in enumerate(legend.values()):
+            top = spacer + _i * (swatch + spacer)
+            image[top : top + swatch, cols] = _rgba(color)
+    else:
+        # High values at the top, just like the panel's legend.
+        colors = wm_utils.linear_gradient_array(
+            low_color, high_color, np.linspace(1, 0, height)
+        )
+        image[spacer : spacer + height, cols, :3] = colors[:, None, :]
+
+
+def _rgba(color):
+    """Return an opaque RGBA tuple for a color tuple or :class:`wx.Colour`."""
+    return tuple(color)[:3] + (255,)
+
+
+class _Raster(object):
+    """
+    Draws shapes given in world coordinates into an image.
+
+    The image covers ``-edge`` to ``edge`` in both x and y, with world +y up.
+    """
+
+    def __init__(self, image, edge):
+        self.image = image
+        self.edge = edge
+        rows, cols = image.shape[:2]
+        self.scale = min(rows, cols) / (2.0 * edge)
+        # World coordinates of the pixel centers.
+        self.x = (np.arange(cols) + 0.5) / self.scale - edge
+        self.y = edge - (np.arange(rows) + 0.5) / self.scale
+
+    def to_px(self, x, y):
+        """Return the ``(col, row)`` pixel holding a world coordinate."""
+        col = np.floor((np.asarray(x, dtype=float) + self.edge) * self.scale)
+        row = np.floor((self.edge - np.asarray(y, dtype=float)) * self.scale)
+        return (col.astype(int), row.astype(int))
+
+    def fill_die(self, grid_x, grid_y, colors, wafer_info, borders=True):
+        """Fill each die's area with its color, with black borders."""
+        if len(grid_x) == 0:
+            return
+        die_w, die_h = wafer_info.die_size
+        center_x, center_y = wafer_info.center_xy
+
+        # Pixels are axis-aligned with the die, so each pixel column maps
+        # to one grid column and each row to one grid row.
+        # The inverse of wm_utils.grid_to_rect_coord.
+        col_grid = np.floor(center_x + self.x / die_w + 0.5).astype(int)
+        row_grid = np.floor(center_y - self.y / die_h + 0.5).astype(int)
+
+        index = wm_utils.GridIndex(grid_x, grid_y)
+        positions = index.lookup_mesh(col_grid, row_grid)
+        has_die = positions >= 0
+
+        # Position -1, no die, picks the last row: the black background.
+        lut = np.zeros((len(colors) + 1, 4), dtype=np.uint8)
+        lut[:-1, :3] = colors[:, :3]
+        lut[:, 3] = 255
+        self.image[:] = lut[positions]
+
+        if not borders:
+            return
+        # The first pixel of each die, plus the pixel after the last die in
+        # a row or column, is a border.
+        col_edge = np.zeros(col_grid.shape, dtype=bool)
+        col_edge[1:] = col_grid[1:] != col_grid[:-1]
+        row_edge = np.zeros(row_grid.shape, dtype=bool)
+        row_edge[1:] = row_grid[1:] != row_grid[:-1]
+
+        left = np.zeros_like(has_die)
+        left[:, 1:] = has_die[:, :-1]
+        above = np.zeros_like(has_die)
+        above[1:] = has_die[:-1]
+        border = (col_edge[None, :] & (has_die | left)) | (
+            row_edge[:, None] & (has_die | above)
+        )
+        self.image[border, :3] = 0
+
+    def lines(self, segments, color, width):
+        """Draw horizontal and vertical ``(x0, y0, x1, y1)`` segments."""
+        color = _rgba(color)
+        lo = -(width // 2)
+        for x0, y0, x1, y1 in segments:
+            (col0, col1), (row0, row1) = self.to_px((x0, x1), (y0, y1))
+            col0, col1 = sorted((col0, col1))
+            row0, row1 = sorted((row0, row1))
+            if col0 == col1:
+                col0, col1 = col0 + lo, col0 + lo + width - 1
+            else:
+                row0, row1 = row0 + lo, row0 + lo + width - 1
+            col0, row0 = max(col0, 0), max(row0, 0)
+            self.image[row0 : row1 + 1, col0 : col1 + 1] = color
+
+    def arc(self, radius, chord, color, width):
+        """
+        Draw a circle around ``(0, 0)``.
+
+        If ``chord`` is given, only draw the part of the circle above the
+        horizontal ``(start_xy, end_xy)`` chord.
+        """
+        dist = np.hypot(self.x[None, :], self.y[:, None])
+        mask = np.abs(dist - radius) * self.scale <= width / 2.0
+        if chord is not None:
+            mask &= self.y[:, None] >= chord[0][1]
+        self.image[mask] = _rgba(color)
+
+    def polyline(self, points, color, width):
+        """Draw straight lines connecting ``points``."""
+        half = width / (2.0 * self.scale)
+        rows, cols = self.image.shape[:2]
+        for start, end in zip(points[:-1], points[1:]):
+            start = np.asarray(start, dtype=float)
+            end = np.asarray(end, dtype=float)
+
+            # Only look at the pixels near this segment.
+            (col0, col1), (row1, row0) = self.to_px(
+                (min(start[0], end[0]) - half, max(start[0], end[0]) + half),
+                (min(start[1], end[1]) - half, max(start[1], end[1]) + half),
+            )
+            col0, row0 = max(col0, 0), max(row0, 0)
+            col1, row1 = min(col1 + 1, cols), min(row1 + 1, rows)
+            if col0 >= col1 or row0 >= row1:
+                continue
+            x = self.x[None, col0:col1] - start[0]
+            y = self.y[row0:row1, None] - start[1]
+
+            # Distance from each pixel center to the segment.
+            seg = end - start
+            length_sqrd = max(float(seg @ seg), 1e-12)
+            t = np.clip((x * seg[0] + y * seg[1]) / length_sqrd, 0, 1)
+            dist = np.hypot(x - t * seg[0], y - t * seg[1])
+            mask = dist <= half
+            self.image[row0:row1, col0:col1][mask] = _rgba(color)
+
+    def dots(self, x, y, color, diameter):
+        """Draw a square dot ``diameter`` px wide at each ``(x, y)``."""
+        rows, cols = self.image.shape[:2]
+        col, row = self.to_px(x, y)
+        offsets = np.arange(diameter) - diameter // 2
+        col, row = np.broadcast_arrays(
+            col[:, None, None] + offsets[None, None, :],
+            row[:, None, None] + offsets[None, :, None],
+        )
+        col, row = col.ravel(), row.ravel()
+        inside = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)
+        self.image[row[inside], col[inside]] = _rgba(color)
@@ -0,0 +1,336 @@
+"""
+Stack many wafers that share one grid, and reduce them to a composite map.
+
+:func:`stack` aligns the ``xyd`` data of many wafers into one
+``(wafer, row, col)`` array. :func:`reduce_stack` computes a per-die
+statistic, such as the mean or the bin yield, streaming through the wafers
+a chunk at a time so that memory use doesn't grow with the number of
+wafers. Its result is an ``xyd`` list that can be passed straight to
+:class:`wafer_map.wm_core.WaferMapPanel`::
+
+    xyd = wm_stack.reduce_stack(xyds, "yield", good_bins=["Pass"])
+    wm_app.WaferMapApp(xyd, ...)
+
+Statistics of many wafers usually look best with
+``data_type=wm_stack.data_type(statistic)``.
+"""
+import itertools
+import math
+
+import numpy as np
+
+from wafer_map import wm_constants as wm_const
+from wafer_map import wm_utils
+
+
+def wafer_extent(wafer_info):
+    """
+    Return the grid extent of all die that touch a wafer.
+
+    Returns
+    -------
+    extent : tuple
+        The ``(x_min, y_min, x_max, y_max)`` grid coordinates, inclusive.
+    """
+    rad = wafer_info.dia / 2
+    die_w, die_h = wafer_info.die_size
+    center_x, center_y = wafer_info.center_xy
+    # Die g spans die_size * (g - center - 0.5) to die_size * (g - center
+    # + 0.5), in x, and mirrored in y.
+    x_min = math.floor(center_x - 0.5 - rad / die_w) + 1
+    x_max = math.ceil(center_x + 0.5 + rad / die_w) - 1
+    y_min = math.floor(center_y - 0.5 - rad / die_h) + 1
+    y_max = math.ceil(center_y + 0.5 + rad / die_h) - 1
+    return (x_min, y_min, x_max, y_max)
+
+
+def grid_extent(xyds):
+    """
+    Return the grid extent of the die of many wafers.
+
+    Returns
+    -------
+    extent : tuple
+        The ``(x_min, y_min, x_max, y_max)`` grid coordinates, inclusive.
+    """
+    x_min = y_min = math.inf
+    x_max = y_max = -math.inf
+    for xyd in xyds:
+        grid_x, grid_y, _ = wm_utils.xyd_to_arrays(xyd)
+        if grid_x.size == 0:
+            continue
+        x_min, x_max = min(x_min, grid_x.min()), max(x_max, grid_x.max())
+        y_min, y_max = min(y_min, grid_y.min()), max(y_max, grid_y.max())
+    if x_min == math.inf:
+        raise ValueError("there are no die")
+    return (int(x_min), int(y_min), int(x_max), int(y_max))
+
+
+def stack(xyds, extent=None):
+    """
+    Align the die of many wafers into one array.
+
+    Parameters
+    ----------
+    xyds : list of lists of 3-tuples
+        The ``xyd`` data of each wafer. Values must be numbers.
+    extent : tuple, optional
+        The ``(x_min, y_min, x_max, y_max)`` grid coordinates, inclusive,
+        to cover. If ``None``, covers all of the die. Defaults to ``None``.
+
+    Returns
+    -------
+    data : :class:`numpy.ndarray`
+        A ``(wafer, row, col)`` float array, indexed by
+        ``[wafer, grid_y - y_min, grid_x - x_min]``. ``NaN`` where a wafer
+        has no die.
+    extent : tuple
+        The ``(x_min, y_min, x_max, y_max)`` covered.
+    """
+    xyds = list(xyds)
+    if extent is None:
+        extent = grid_extent(xyds)
+    data = np.full((len(xyds),) + _shape(extent), np.nan)
+    for layer, xyd in zip(data, xyds):
+        rows, cols, values = _align(xyd, extent)
+        layer[rows, cols] = values.astype(float)
+    return (data, extent)
+
+
+def reduce_stack(
+    xyds,
+    statistic=wm_const.Statistic.MEAN,
+    wafer_info=None,
+    extent=None,
+    good_bins=None,
+    chunk_size=wm_const.wm_STACK_CHUNK_SIZE,
+):
+    """
+    Compute a per-die statistic across many wafers.
+
+    Parameters
+    ----------
+    xyds : iterable of lists of 3-tuples
+        The ``xyd`` data of each wafer. May be a generator, such as one
+        that reads each wafer from disk, so that only ``chunk_size`` wafers
+        are in memory at once.
+    statistic : :class:`wm_constants.Statistic` or str, optional
+        One of:
+
+        + ``mean``, ``median``, ``std``, ``min``, ``max``: of the values
+          of each die, ignoring NaN.
+        + ``count``: the number of wafers with a value for each die.
+        + ``yield``: the percent of wafers whose value for each die is in
+          ``good_bins``.
+        + ``mode``: the most common value of each die, such as the most
+          common bin.
+
+        Defaults to ``mean``.
+    wafer_info : :class:`wafer_map.wm_info.WaferInfo`, optional
+        The wafers' grid. Used to size the stack when ``extent`` is not
+        given.
+    extent : tuple, optional
+        The ``(x_min, y_min, x_max, y_max)`` grid coordinates, inclusive,
+        to cover. If neither this nor ``wafer_info`` is given, ``xyds`` is
+        read into memory to find it.
+    good_bins : list, optional
+        The values that count as good for ``yield``.
+    chunk_size : int, optional
+        How many wafers to stack and reduce at a time. Defaults to
+        `wm_STACK_CHUNK_SIZE`.
+
+    Returns
+    -------
+    xyd : list of 3-tuples
+        The statistic of each die that is on at least one wafer.
+
+    Notes
+    -----
+    Every statistic except ``median`` needs memory for a few maps no matter
+    how many wafers there are. ``median`` needs every value of every
+    wafer, since it can't be computed a chunk at a time.
+    """
+    # backwards compatability
+    if isinstance(statistic, str):
+        statistic = wm_const.Statistic(statistic)
+    if statistic == wm_const.Statistic.YIELD and good_bins is None:
+        raise ValueError("good_bins must be given for yield")
+
+    if extent is None:
+        if wafer_info is not None:
+            extent = wafer_extent(wafer_info)
+        else:
+            xyds = list(xyds)
+            extent = grid_extent(xyds)
+
+    if statistic in (wm_const.Statistic.YIELD, wm_const.Statistic.MODE):
+        reducer = _LabelReducer(extent, statistic, good_bins)
+    else:
+        reducer = _ValueReducer(extent, statistic)
+
+    xyds = iter(xyds)
+    while True:
+        chunk = list(itertools.islice(xyds, chunk_size))
+        if not chunk:
+            break
+        reducer.add(chunk)
+    return reducer.result()
+
+
+def data_type(statistic):
+    """Return the :class:`wm_constants.DataType` to plot a statistic with."""
+    if isinstance(statistic, str):
+        statistic = wm_const.Statistic(statistic)
+    if statistic == wm_const.Statistic.MODE:
+        return wm_const.DataType.DISCRETE
+    return wm_const.DataType.CONTINUOUS
+
+
+def map_to_xyd(values, extent, mask):
+    """
+    Convert a ``(row, col)`` map to an ``xyd`` list.
+
+    Parameters
+    ----------
+    values : :class:`numpy.ndarray`
+        A ``(row, col)`` array, indexed by ``[grid_y - y_min, grid_x -
+        x_min]``.
+    extent : tuple
+        The ``(x_min, y_min, x_max, y_max)`` that ``values`` covers.
+    mask : :class:`numpy.ndarray`
+        A ``(row, col)`` boolean array that is ``True`` where there is a
+        die.
+
+    Returns
+    -------
+    xyd : list of 3-tuples
+    """
+    rows, cols = np.nonzero(mask)
+    return list(
+        zip(
+            (cols + extent[0]).tolist(),
+            (rows + extent[1]).tolist(),
+            values[rows, cols].tolist(),
+        )
+    )
+
+
+def _shape(extent):
+    """Return the ``(rows, cols)`` of an extent."""
+    return (extent[3] - extent[1] + 1, extent[2] - extent[0] + 1)
+
+
+def _align(xyd, extent):
+    """Return the row and col of each die within ``extent``, and the values."""
+    grid_x, grid_y, values = wm_utils.xyd_to_arrays(xyd)
+    rows = grid_y - extent[1]
+    cols = grid_x - extent[0]
+    n_rows, n_cols = _shape(extent)
+    if ((rows < 0) | (rows >= n_rows) | (cols < 0) | (cols >= n_cols)).any():
+        raise ValueError("a die is outside of extent {}".format(extent))
+    return (rows, cols, values)
+
+
+class _ValueReducer(object):
+    """Accumulates numeric statistics a chunk of wafers at a time."""
+
+    def __init__(self, extent, statistic):
+        self.extent = extent
+        self.statistic = statistic
+        shape = _shape(extent)
+        self.count = np.zeros(shape, dtype=int)
+        # Running mean and sum of squared differences (Chan et al.) so that
+        # std is stable for large values.
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.low = np.full(shape, np.nan)
+        self.high = np.full(shape, np.nan)
+        self.chunks = []
+
+    def add(self, xyds):
+        data, _ = stack(xyds, self.extent)
+        present = ~np.isnan(data)
+        count = present.sum(axis=0)
+
+        if self.statistic == wm_const.Statistic.MEDIAN:
+            self.chunks.append(data)
+        elif self.statistic == wm_const.Statistic.MIN:
+            self.low = np.fmin(self.low, np.fmin.reduce(data, axis=0))
+        elif self.statistic == wm_const.Statistic.MAX:
+            self.high = np.fmax(self.high, np.fmax.reduce(data, axis=0))
+        elif self.statistic in (wm_const.Statistic.MEAN, wm_const.Statistic.STD):
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.where(count > 0, np.nansum(data, axis=0) / count, 0)
+                m2 = np.nansum((data - mean) ** 2, axis=0)
+                total = self.count + count
+                delta = mean - self.mean
+                weight = np.where(total > 0, count / total, 0)
+                self.mean += delta * weight
+                self.m2 += m2 + delta**2 * self.count * weight
+        self.count += count
+
+    def result(self):
+        mask = self.count > 0
+        if self.statistic == wm_const.Statistic.COUNT:
+            values = self.count
+        elif self.statistic == wm_const.Statistic.MEAN:
+            values = self.mean
+        elif self.statistic == wm_const.Statistic.STD:
+            values = np.sqrt(self.m2 / np.maximum(self.count, 1))
+        elif self.statistic == wm_const.Statistic.MIN:
+            values = self.low
+        elif self.statistic == wm_const.Statistic.MAX:
+            values = self.high
+        else:
+            if not self.chunks:
+                return []
+            data = np.concatenate(self.chunks)
+            values = np.full(data.shape[1:], np.nan)
+            values[mask] = np.nanmedian(data[:, mask], axis=0)
+        return map_to_xyd(values, self.extent, mask)
+
+
+class _LabelReducer(object):
+    """Accumulates per-die counts of each value, such as bins."""
+
+    def __init__(self, extent, statistic, good_bins):
+        self.extent = extent
+        self.statistic = statistic
+        self.good_bins = set() if good_bins is None else set(good_bins)
+        shape = _shape(extent)
+        self.count = np.zeros(shape, dtype=int)
+        self.good = np.zeros(shape, dtype=int)
+        # {label: (row, col) count of wafers with that label}
+        self.label_counts = {}
+
+    def add(self, xyds):
+        shape = _shape(self.extent)
+        for xyd in xyds:
+            rows, cols, values = _align(xyd, self.extent)
+            self.count[rows, cols] += 1
+            if self.statistic == wm_const.Statistic.YIELD:
+                good = np.isin(values, list(self.good_bins))
+                self.good[rows[good], cols[good]] += 1
+                continue
+
+            labels, inverse = np.unique(values, return_inverse=True)
+            inverse = inverse.ravel()
+            for code, label in enumerate(labels.tolist()):
+                if label not in self.label_counts:
+                    self.label_counts[label] = np.zeros(shape, dtype=int)
+                which = inverse == code
+                self.label_counts[label][rows[which], cols[which]] += 1
+
+    def result(self):
+        mask = self.count > 0
+        if self.statistic == wm_const.Statistic.YIELD:
+            values = 100.0 * self.good / np.maximum(self.count, 1)
+            return map_to_xyd(values, self.extent, mask)
+
+        if not self.label_counts:
+            return []
+        labels = list(self.label_counts)
+        counts = np.stack([self.label_counts[_l] for _l in labels])
+        # Ties go to the label seen first.
+        values = np.array(labels, dtype=object)[counts.argmax(axis=0)]
+        return map_to_xyd(values, self.extent, mask)
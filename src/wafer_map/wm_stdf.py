@@ -0,0 +1,374 @@
+"""
+Read wafer maps from STDF V4 test data files.
+
+The file is read in one pass, a block at a time, and each wafer is yielded as
+soon as its last record is read. Only one wafer per test head is held in
+memory, so a file of any size can be read::
+
+    for wafer in wm_stdf.read_stdf("lot_42.stdf.gz"):
+        wm_app.WaferMapApp(
+            wafer.arrays("Vth"), wafer.wafer_info(), data_type=wafer.data_type("Vth")
+        )
+
+Each wafer is a :class:`StdfWafer` with one row per die. The die come from
+the part results (PRR); the grid coordinates are ``X_COORD`` and ``Y_COORD``.
+The parameters are:
+
+``hard_bin``, ``soft_bin``
+    The die's bins, which are discrete.
+One per parametric test (PTR)
+    Named by the test text, or by ``"<test number>: <test text>"`` if two
+    tests have the same text. A die that doesn't have a valid result for a
+    test is NaN.
+
+The wafer information comes from the wafer configuration record (WCR): the
+die size, the grid center, and the wafer diameter, converted to mm. Wafer
+maps are always drawn with the flat down and grid +x right and +y down, so
+the grid is mirrored and rotated to match ``POS_X``, ``POS_Y``, and
+``WF_FLAT``.
+
+A die that is tested again replaces its earlier result. Parts without grid
+coordinates, such as from a package test, are skipped. A file that ends
+part way through a record, such as one still being written, is read up to
+that record.
+"""
+import array
+import gzip
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+from wafer_map import wm_constants as wm_const
+from wafer_map import wm_io
+
+# (REC_TYP, REC_SUB) of the records that are read.
+_FAR = (0, 10)
+_WIR = (2, 10)
+_WRR = (2, 20)
+_WCR = (2, 30)
+_PIR = (5, 10)
+_PRR = (5, 20)
+_PTR = (15, 10)
+
+# Missing value of I2 fields such as X_COORD.
+_MISSING_I2 = -32768
+
+# WF_UNITS: mm per unit. Unknown units are taken to be mm.
+_UNITS_MM = {0: 1.0, 1: 25.4, 2: 10.0, 3: 1.0, 4: 0.0254}
+
+# TEST_FLG bits that mean RESULT is not valid: "result is not valid" and
+# "test not executed".
+_INVALID_RESULT = 0x02 | 0x10
+
+# The names of the bin parameters.
+_BINS = ("hard_bin", "soft_bin")
+
+
+class StdfWafer(wm_io.WaferData):
+    """
+    The die and parameters of one wafer in an STDF file.
+
+    Attributes
+    ----------
+    wafer_id : str
+        The ``WAFER_ID`` of the wafer, or ``None`` if the file has no wafer
+        records.
+    head_num : int
+        The test head that tested the wafer.
+    test_numbers : :class:`collections.OrderedDict`
+        ``{name: test number}`` of the parametric test parameters.
+    """
+
+    def __init__(self, grid_x, grid_y, parameters, metadata, wafer_id, head_num):
+        super().__init__(grid_x, grid_y, parameters, metadata)
+        self.wafer_id = wafer_id
+        self.head_num = head_num
+        self.test_numbers = OrderedDict()
+
+    def data_type(self, name):
+        """Return the :class:`wm_constants.DataType` of one parameter."""
+        if name in _BINS:
+            return wm_const.DataType.DISCRETE
+        return super().data_type(name)
+
+
+def read_stdf(path, tests=None, block_size=wm_const.wm_STDF_BLOCK_SIZE):
+    """
+    Read the wafers of an STDF V4 file.
+
+    Parameters
+    ----------
+    path : str or file
+        The file to read, or a binary file object. Files ending in ``.gz``
+        are decompressed while they are read.
+    tests : list of int or str, optional
+        Only keep these parametric tests, by test number or test text. Other
+        tests take no memory. If ``None``, keeps all of them. Defaults to
+        ``None``.
+    block_size : int, optional
+        How many bytes to read from the file at a time.
+
+    Yields
+    ------
+    :class:`StdfWafer`
+        Each wafer, in the order that they finish.
+    """
+    if isinstance(path, str):
+        opener = gzip.open if path.lower().endswith(".gz") else open
+        with opener(path, "rb") as openf:
+            yield from _read_wafers(openf, tests, block_size)
+    else:
+        yield from _read_wafers(path, tests, block_size)
+
+
+class _WaferBuilder(object):
+    """The columns of one wafer, as its records are read."""
+
+    def __init__(self, wafer_id, head_num):
+        self.wafer_id = wafer_id
+        self.head_num = head_num
+        self.grid_x = array.array("l")
+        self.grid_y = array.array("l")
+        self.bins = (array.array("l"), array.array("l"))
+        # {test number: results}
+        self.tests = OrderedDict()
+
+    def add_die(self, x, y, hard_bin, soft_bin, results):
+        """Add a die and its ``{test number: result}``."""
+        for number in results:
+            if number not in self.tests:
+                # A test that wasn't run on the earlier die.
+                self.tests[number] = array.array("d", [np.nan]) * len(self.grid_x)
+        for number, column in self.tests.items():
+            column.append(results.get(number, np.nan))
+        self.grid_x.append(x)
+        self.grid_y.append(y)
+        self.bins[0].append(hard_bin)
+        self.bins[1].append(soft_bin)
+
+    def finish(self, config, texts):
+        """
+        Return the :class:`StdfWafer`, laid out by the WCR ``config`` and
+        with the tests named by ``{test number: test text}``.
+        """
+        grid_x = np.frombuffer(self.grid_x, dtype=self.grid_x.typecode)
+        grid_y = np.frombuffer(self.grid_y, dtype=self.grid_y.typecode)
+        keep = _last_test(grid_x, grid_y)
+        grid_x, grid_y, metadata = _orient(grid_x[keep], grid_y[keep], config)
+
+        parameters = OrderedDict()
+        for name, column in zip(_BINS, self.bins):
+            parameters[name] = np.frombuffer(column, dtype=column.typecode)[keep]
+        names = _test_names([(_n, texts.get(_n)) for _n in self.tests])
+        for (name, _), column in zip(names, self.tests.values()):
+            parameters[name] = np.frombuffer(column, dtype=float)[keep]
+
+        wafer = StdfWafer(
+            grid_x, grid_y, parameters, metadata, self.wafer_id, self.head_num
+        )
+        wafer.test_numbers.update(names)
+        return wafer
+
+
+def _read_wafers(openf, tests, block_size):
+    """Yield the :class:`StdfWafer` of an open STDF file."""
+    wafers = {}  # {HEAD_NUM: _WaferBuilder}
+    parts = {}  # {(HEAD_NUM, SITE_NUM): {test number: result}}
+    # {test number: test text}. Only the first PTR of a test needs to have
+    # its text, so it is kept for the whole file.
+    texts = {}
+    skipped = set()
+    config = None
+
+    nan = float("nan")
+    for key, fields, body in _RecordReader(openf, block_size):
+        if key == _PTR:
+            number, head, site, flags, _, result = fields
+            results = parts.get((head, site))
+            if results is None or number in skipped:
+                continue
+            if number not in texts:
+                texts[number] = _read_cn(body, 12)
+                if tests is not None and not (
+                    number in tests or texts[number] in tests
+                ):
+                    skipped.add(number)
+                    continue
+            results[number] = nan if flags & _INVALID_RESULT else result
+        elif key == _PIR:
+            parts[fields] = {}
+        elif key == _PRR:
+            head, site, _, _, hard_bin, soft_bin, x, y = fields
+            results = parts.pop((head, site), {})
+            if x == _MISSING_I2 or y == _MISSING_I2:
+                continue
+            if head not in wafers:
+                wafers[head] = _WaferBuilder(None, head)
+            wafers[head].add_die(x, y, hard_bin, soft_bin, results)
+        elif key == _WIR:
+            head = fields[0]
+            if head in wafers:
+                # The wafer before it never finished.
+                yield wafers.pop(head).finish(config, texts)
+            wafers[head] = _WaferBuilder(_read_cn(body, 6) or None, head)
+        elif key == _WRR:
+            head = fields[0]
+            if head in wafers:
+                wafer = wafers.pop(head)
+                if wafer.wafer_id is None:
+                    wafer.wafer_id = _read_cn(body, 26) or None
+                yield wafer.finish(config, texts)
+        elif key == _WCR:
+            config = fields
+
+    for head in sorted(wafers):
+        yield wafers[head].finish(config, texts)
+
+
+class _RecordReader(object):
+    """
+    Iterate over the ``((REC_TYP, REC_SUB), fields, body)`` of the records
+    that are read, skipping the others without copying them.
+
+    ``fields`` are the record's leading fixed-size fields, with defaults for
+    any that are missing from the end of the record. The byte order is set
+    by the FAR, which must be the first record.
+    """
+
+    # The leading fields that are unpacked, and their defaults.
+    _FORMATS = {
+        _PTR: ("IBBBBf", (0, 0, 0, _INVALID_RESULT, 0, 0.0)),
+        _PIR: ("BB", (0, 0)),
+        _PRR: ("BBBHHHhh", (0, 0, 0, 0, 0, 65535, _MISSING_I2, _MISSING_I2)),
+        _WIR: ("B", (0,)),
+        _WRR: ("B", (0,)),
+        _WCR: ("fffBchhcc", (0, 0, 0, 0, b" ", _MISSING_I2, _MISSING_I2, b" ", b" ")),
+    }
+
+    def __init__(self, openf, block_size):
+        self.openf = openf
+        self.block_size = block_size
+
+    def __iter__(self):
+        buffer = self.openf.read(self.block_size)
+        if len(buffer) < 6 or buffer[2:4] != bytes(_FAR) or buffer[5] != 4:
+            raise ValueError("not an STDF V4 file")
+        order = ">" if buffer[4] == 1 else "<"
+        header = struct.Struct(order + "HBB")
+        formats = {}
+        for key, (fields, default) in self._FORMATS.items():
+            fields = struct.Struct(order + fields)
+            formats[key] = (fields.unpack_from, fields.size, fields.pack(*default))
+
+        view = memoryview(buffer)
+        pos = 0
+        while True:
+            if len(view) - pos < 4:
+                view, pos = self._refill(view, pos, 4)
+                if view is None:
+                    return
+            length, typ, sub = header.unpack_from(view, pos)
+            end = pos + 4 + length
+            if end > len(view):
+                view, pos = self._refill(view, pos, 4 + length)
+                if view is None:
+                    return
+                end = pos + 4 + length
+            key = (typ, sub)
+            if key in formats:
+                unpack, size, default = formats[key]
+                body = view[pos + 4 : end]
+                if length < size:
+                    yield (key, unpack(body.tobytes() + default[length:]), body)
+                else:
+                    yield (key, unpack(body), body)
+            pos = end
+
+    def _refill(self, view, pos, needed):
+        """
+        Read more of the file so that ``needed`` bytes follow ``pos``.
+
+        Returns the new ``(view, pos)``, or ``(None, None)`` at the end of
+        the file.
+        """
+        rest = view[pos:].tobytes()
+        more = self.openf.read(max(self.block_size, needed - len(rest)))
+        buffer = rest + more
+        while more and len(buffer) < needed:
+            more = self.openf.read(needed - len(buffer))
+            buffer += more
+        if len(buffer) < needed:
+            return (None, None)
+        return (memoryview(buffer), 0)
+
+
+def _read_cn(body, offset):
+    """Return the Cn string at ``offset`` of a record, or ``""``."""
+    if offset >= len(body):
+        return ""
+    length = body[offset]
+    return bytes(body[offset + 1 : offset + 1 + length]).decode("latin-1").strip()
+
+
+def _last_test(grid_x, grid_y):
+    """Return the index of the last test of each die, in test order."""
+    keys = (grid_x.astype(np.int64) << 32) | (grid_y.astype(np.int64) & 0xFFFFFFFF)
+    _, last = np.unique(keys[::-1], return_index=True)
+    if len(last) == len(keys):
+        return slice(None)
+    return np.sort(len(keys) - 1 - last)
+
+
+def _test_names(tests):
+    """
+    Return ``[(name, test number)]`` of ``[(test number, test text)]``.
+    """
+    texts = [_text or str(_number) for _number, _text in tests]
+    counts = {}
+    for text in list(_BINS) + texts:
+        counts[text] = counts.get(text, 0) + 1
+    return [
+        (_text if counts[_text] == 1 else "{}: {}".format(_number, _text), _number)
+        for _text, (_number, _) in zip(texts, tests)
+    ]
+
+
+def _orient(grid_x, grid_y, config):
+    """
+    Mirror and rotate the grid so that it is +x right, +y down, and flat
+    down, and return it with the :class:`wm_info.WaferInfo` metadata.
+    """
+    metadata = {}
+    if config is None:
+        return (grid_x, grid_y, metadata)
+    size, height, width, units, flat, center_x, center_y, pos_x, pos_y = config
+    scale = _UNITS_MM.get(units, 1.0)
+    if size > 0:
+        metadata["dia"] = size * scale
+    if width > 0 and height > 0:
+        metadata["die_size"] = (width * scale, height * scale)
+    center = None
+    if center_x != _MISSING_I2 and center_y != _MISSING_I2:
+        center = (center_x, center_y)
+
+    def transform(x, y):
+        if pos_x == b"L":
+            x = -x
+        if pos_y == b"U":
+            y = -y
+        # Rotate the flat to the bottom.
+        if flat == b"U":
+            x, y = -x, -y
+        elif flat == b"L":
+            x, y = y, -x
+        elif flat == b"R":
+            x, y = -y, x
+        return (x, y)
+
+    grid_x, grid_y = transform(grid_x, grid_y)
+    if center is not None:
+        metadata["center_xy"] = transform(*center)
+    if flat in (b"L", b"R") and "die_size" in metadata:
+        metadata["die_size"] = metadata["die_size"][::-1]
+    return (grid_x, grid_y, metadata)
@@ -1,6 +1,10 @@
 """
 Holds various utilities used by ``wafer_map``.
 """
+import colorsys
+import functools
+import math
+
 import numpy as np
 from colour import Color
 
@@ -91,6 +95,446 @@ class PolylinearGradient(Gradient):
         return polylinear_gradient(self.colors, value)
 
 
+class GridIndex(object):
+    """
+    A compact 2D index over the die grid.
+
+    Maps each ``(grid_x, grid_y)`` to that die's position in the input
+    arrays using a dense array offset by the grid minimum. Lookups are pure
+    integer arithmetic, so no strings or dict keys are created.
+
+    Parameters
+    ----------
+    grid_x : array-like of ints
+        The grid x coordinate of each die.
+    grid_y : array-like of ints
+        The grid y coordinate of each die.
+
+    Attributes
+    ----------
+    x_min, y_min : int
+        The grid coordinate of ``positions[0, 0]``.
+    positions : :class:`numpy.ndarray`
+        A ``(rows, cols)`` array holding each die's position in the input
+        arrays, or ``-1`` where there is no die. Indexed by
+        ``[grid_y - y_min, grid_x - x_min]``.
+    """
+
+    def __init__(self, grid_x, grid_y):
+        grid_x = np.asarray(grid_x, dtype=int).ravel()
+        grid_y = np.asarray(grid_y, dtype=int).ravel()
+
+        if grid_x.size == 0:
+            self.x_min, self.y_min = 0, 0
+            self.positions = np.full((0, 0), -1, dtype=np.int32)
+            return
+
+        self.x_min, self.y_min = int(grid_x.min()), int(grid_y.min())
+        cols = int(grid_x.max()) - self.x_min + 1
+        rows = int(grid_y.max()) - self.y_min + 1
+
+        self.positions = np.full((rows, cols), -1, dtype=np.int32)
+        self.positions[grid_y - self.y_min, grid_x - self.x_min] = np.arange(
+            grid_x.size
+        )
+
+    @property
+    def extent(self):
+        """The ``(x_min, y_min, x_max, y_max)`` grid coordinates covered."""
+        rows, cols = self.positions.shape
+        return (self.x_min, self.y_min, self.x_min + cols - 1, self.y_min + rows - 1)
+
+    @property
+    def mask(self):
+        """A ``(rows, cols)`` boolean array that is ``True`` where a die is."""
+        return self.positions >= 0
+
+    def lookup(self, grid_x, grid_y):
+        """
+        Find the position of a single die.
+
+        Parameters
+        ----------
+        grid_x, grid_y : int
+            The grid coordinate to look up.
+
+        Returns
+        -------
+        position : int
+            The die's position in the input arrays, or ``-1`` if there is
+            no die at that grid coordinate.
+        """
+        row = grid_y - self.y_min
+        col = grid_x - self.x_min
+        rows, cols = self.positions.shape
+        if 0 <= row < rows and 0 <= col < cols:
+            return int(self.positions[row, col])
+        return -1
+
+    def lookup_array(self, grid_x, grid_y):
+        """
+        Vectorized version of :meth:`lookup`.
+
+        Returns
+        -------
+        positions : :class:`numpy.ndarray`
+            The position of each die, or ``-1`` where there is no die.
+        """
+        rows = np.asarray(grid_y, dtype=int) - self.y_min
+        cols = np.asarray(grid_x, dtype=int) - self.x_min
+        n_rows, n_cols = self.positions.shape
+        inside = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+
+        result = np.full(rows.shape, -1, dtype=int)
+        result[inside] = self.positions[rows[inside], cols[inside]]
+        return result
+
+    def lookup_mesh(self, grid_x, grid_y):
+        """
+        Find the position of every die in a mesh of grid coordinates.
+
+        Parameters
+        ----------
+        grid_x, grid_y : array-like of ints
+            The grid columns and grid rows to look up.
+
+        Returns
+        -------
+        positions : :class:`numpy.ndarray`
+            A ``(len(grid_y), len(grid_x))`` array with the position of the
+            die at each ``(grid_x[col], grid_y[row])``, or ``-1`` where
+            there is no die.
+        """
+        rows = np.asarray(grid_y, dtype=int).ravel() - self.y_min
+        cols = np.asarray(grid_x, dtype=int).ravel() - self.x_min
+        n_rows, n_cols = self.positions.shape
+        row_ok = (rows >= 0) & (rows < n_rows)
+        col_ok = (cols >= 0) & (cols < n_cols)
+
+        result = np.full((rows.size, cols.size), -1, dtype=int)
+        result[np.ix_(row_ok, col_ok)] = self.positions[
+            np.ix_(rows[row_ok], cols[col_ok])
+        ]
+        return result
+
+    def query_box(self, x0, y0, x1, y1):
+        """
+        Find the position of every die in a box of grid coordinates.
+
+        Only the part of the index inside the box is read, so the time
+        taken depends on the size of the box rather than the number of die.
+
+        Parameters
+        ----------
+        x0, y0, x1, y1 : int
+            Opposite corners of the box, inclusive. May be in either order.
+
+        Returns
+        -------
+        positions : :class:`numpy.ndarray`
+            The position of each die in the box, by grid row and then
+            grid column.
+        """
+        x0, x1 = sorted((int(x0), int(x1)))
+        y0, y1 = sorted((int(y0), int(y1)))
+        rows, cols = self.positions.shape
+        row0, row1 = max(y0 - self.y_min, 0), min(y1 - self.y_min + 1, rows)
+        col0, col1 = max(x0 - self.x_min, 0), min(x1 - self.x_min + 1, cols)
+        if row0 >= row1 or col0 >= col1:
+            return np.zeros(0, dtype=int)
+        block = self.positions[row0:row1, col0:col1]
+        return block[block >= 0].astype(int)
+
+    def add(self, grid_x, grid_y, positions):
+        """
+        Add die to the index, growing it if needed.
+
+        Parameters
+        ----------
+        grid_x, grid_y : array-like of ints
+            The grid coordinates of the new die.
+        positions : array-like of ints
+            The position of each new die in the input arrays.
+        """
+        grid_x = np.asarray(grid_x, dtype=int).ravel()
+        grid_y = np.asarray(grid_y, dtype=int).ravel()
+        if grid_x.size == 0:
+            return
+        self.reserve(grid_x.min(), grid_y.min(), grid_x.max(), grid_y.max())
+        self.positions[grid_y - self.y_min, grid_x - self.x_min] = positions
+
+    def reserve(self, x_min, y_min, x_max, y_max):
+        """
+        Grow the index to cover the given grid coordinates, inclusive.
+
+        The index grows by at least half of its size on each side that
+        needs to grow, so adding die one at a time is amortized O(1).
+        """
+        x_min, y_min, x_max, y_max = int(x_min), int(y_min), int(x_max), int(y_max)
+        rows, cols = self.positions.shape
+        if rows == 0 or cols == 0:
+            new_x_min, new_y_min, new_x_max, new_y_max = x_min, y_min, x_max, y_max
+        else:
+            old_x_max = self.x_min + cols - 1
+            old_y_max = self.y_min + rows - 1
+            if (
+                x_min >= self.x_min
+                and y_min >= self.y_min
+                and x_max <= old_x_max
+                and y_max <= old_y_max
+            ):
+                return
+
+            new_x_min = self.x_min
+            if x_min < self.x_min:
+                new_x_min = min(x_min, self.x_min - cols // 2)
+            new_x_max = old_x_max
+            if x_max > old_x_max:
+                new_x_max = max(x_max, old_x_max + cols // 2)
+            new_y_min = self.y_min
+            if y_min < self.y_min:
+                new_y_min = min(y_min, self.y_min - rows // 2)
+            new_y_max = old_y_max
+            if y_max > old_y_max:
+                new_y_max = max(y_max, old_y_max + rows // 2)
+
+        positions = np.full(
+            (new_y_max - new_y_min + 1, new_x_max - new_x_min + 1),
+            -1,
+            dtype=np.int32,
+        )
+        row0 = self.y_min - new_y_min
+        col0 = self.x_min - new_x_min
+        positions[row0 : row0 + rows, col0 : col0 + cols] = self.positions
+        self.positions = positions
+        self.x_min, self.y_min = new_x_min, new_y_min
+
+
+class PointIndex(object):
+    """
+    A 2D index for finding the points near a location.
+
+    The points are bucketed into a uniform grid of square cells, a few points
+    per cell, and sorted by cell so that each row of cells is one contiguous
+    run. Finding the nearest point only looks at the cells around the
+    location, so it takes about the same time for any number of points.
+
+    Parameters
+    ----------
+    x, y : array-like
+        The coordinates of each point.
+
+    Attributes
+    ----------
+    x, y : :class:`numpy.ndarray`
+        The coordinates of each point, as floats.
+    cell_size : float
+        The width and height of each cell.
+    """
+
+    # About how many points are in each cell.
+    points_per_cell = 4
+
+    def __init__(self, x, y):
+        self.x = np.asarray(x, dtype=float).ravel()
+        self.y = np.asarray(y, dtype=float).ravel()
+        if self.x.size == 0:
+            self.x_min, self.y_min, self.cell_size = 0.0, 0.0, 1.0
+            self.cols, self.rows = 0, 0
+            self._order = np.zeros(0, dtype=int)
+            self._starts = np.zeros(1, dtype=int)
+            return
+
+        self.x_min, self.y_min = float(self.x.min()), float(self.y.min())
+        width = float(self.x.max()) - self.x_min
+        height = float(self.y.max()) - self.y_min
+        per_cell = self.points_per_cell / self.x.size
+        # Points along a line have no area, so also limit the cells along
+        # the longest side.
+        cell_size = max(
+            math.sqrt(width * height * per_cell), max(width, height) * per_cell
+        )
+        self.cell_size = cell_size if cell_size > 0 else 1.0
+        self.cols = int(width // self.cell_size) + 1
+        self.rows = int(height // self.cell_size) + 1
+
+        cells = self._rows_of(self.y) * self.cols + self._cols_of(self.x)
+        self._order = np.argsort(cells, kind="stable")
+        self._starts = np.searchsorted(
+            cells[self._order], np.arange(self.rows * self.cols + 1)
+        )
+        self._sorted_x = self.x[self._order]
+        self._sorted_y = self.y[self._order]
+
+    def __len__(self):
+        return self.x.size
+
+    def nearest(self, x, y, max_distance=None):
+        """
+        Find the point nearest to a location.
+
+        Parameters
+        ----------
+        x, y : float
+            The location.
+        max_distance : float, optional
+            Only find points this close. If ``None``, finds the nearest
+            point however far away it is. Defaults to ``None``.
+
+        Returns
+        -------
+        position : int
+            The point's position in the input arrays, or ``-1`` if there
+            are no points within ``max_distance``.
+        """
+        if self.x.size == 0:
+            return -1
+        col = int((x - self.x_min) // self.cell_size)
+        row = int((y - self.y_min) // self.cell_size)
+        best = -1
+        best_dist = math.inf if max_distance is None else max_distance**2
+
+        radius = 1
+        while True:
+            for start, stop in self._runs(
+                col - radius, row - radius, col + radius, row + radius
+            ):
+                dist = (self._sorted_x[start:stop] - x) ** 2 + (
+                    self._sorted_y[start:stop] - y
+                ) ** 2
+                closest = int(dist.argmin())
+                if dist[closest] <= best_dist:
+                    best, best_dist = start + closest, float(dist[closest])
+
+            # Every point within radius cells of the location has been
+            # checked, so anything farther away can't be closer.
+            reach = radius * self.cell_size
+            if best >= 0 and best_dist <= reach**2:
+                break
+            if max_distance is not None and reach >= max_distance:
+                break
+            if (
+                col - radius <= 0
+                and row - radius <= 0
+                and col + radius >= self.cols - 1
+                and row + radius >= self.rows - 1
+            ):
+                break
+            radius *= 2
+
+        if best < 0:
+            return -1
+        return int(self._order[best])
+
+    def query_box(self, x0, y0, x1, y1):
+        """
+        Find every point in a box.
+
+        Only the cells that overlap the box are checked.
+
+        Parameters
+        ----------
+        x0, y0, x1, y1 : float
+            Opposite corners of the box, inclusive. May be in either order.
+
+        Returns
+        -------
+        positions : :class:`numpy.ndarray`
+            The sorted positions of the points in the input arrays.
+        """
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        if self.x.size == 0 or x1 < self.x_min or y1 < self.y_min:
+            return np.zeros(0, dtype=int)
+        found = []
+        for start, stop in self._runs(
+            int(self._cols_of(x0)),
+            int(self._rows_of(y0)),
+            int(self._cols_of(x1)),
+            int(self._rows_of(y1)),
+        ):
+            x = self._sorted_x[start:stop]
+            y = self._sorted_y[start:stop]
+            inside = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+            found.append(self._order[start:stop][inside])
+        if not found:
+            return np.zeros(0, dtype=int)
+        return np.sort(np.concatenate(found))
+
+    def _cols_of(self, x):
+        """Return the cell column of each x, clipped to the grid."""
+        cols = (np.asarray(x, dtype=float) - self.x_min) // self.cell_size
+        return np.clip(cols, 0, self.cols - 1).astype(np.int64)
+
+    def _rows_of(self, y):
+        """Return the cell row of each y, clipped to the grid."""
+        rows = (np.asarray(y, dtype=float) - self.y_min) // self.cell_size
+        return np.clip(rows, 0, self.rows - 1).astype(np.int64)
+
+    def _runs(self, col0, row0, col1, row1):
+        """
+        Yield the ``(start, stop)`` of the sorted points in each row of a
+        block of cells, skipping empty rows.
+        """
+        col0, col1 = max(col0, 0), min(col1, self.cols - 1)
+        row0, row1 = max(row0, 0), min(row1, self.rows - 1)
+        if col0 > col1:
+            return
+        for row in range(row0, row1 + 1):
+            start = self._starts[row * self.cols + col0]
+            stop = self._starts[row * self.cols + col1 + 1]
+            if start < stop:
+                yield (int(start), int(stop))
+
+
+class GrowableArray(object):
+    """
+    A numpy array that supports amortized O(1) appends along axis 0.
+
+    The array is kept in a larger buffer that doubles in size when full,
+    so appending one item at a time doesn't copy the whole array each time.
+
+    Parameters
+    ----------
+    data : array-like
+        The initial data. Not copied until the first append that needs
+        more room.
+    """
+
+    def __init__(self, data):
+        self._buffer = np.asarray(data)
+        self._size = len(self._buffer)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def data(self):
+        """The filled part of the buffer, as a view."""
+        return self._buffer[: self._size]
+
+    def extend(self, values):
+        """
+        Append ``values`` and return the new :attr:`data`.
+
+        The dtype is promoted if needed, such as when appending floats to
+        an int array or longer strings to a string array.
+        """
+        values = np.asarray(values)
+        needed = self._size + len(values)
+        dtype = np.result_type(self._buffer, values)
+
+        if needed > len(self._buffer) or dtype != self._buffer.dtype:
+            capacity = max(needed, 2 * len(self._buffer), 16)
+            buffer = np.empty((capacity,) + self._buffer.shape[1:], dtype=dtype)
+            buffer[: self._size] = self._buffer[: self._size]
+            self._buffer = buffer
+
+        self._buffer[self._size : needed] = values
+        self._size = needed
+        return self.data
+
+
 class BeizerGradient(Gradient):
     """
     Beizer curve gradient between 3 colors.
@@ -199,6 +643,114 @@ def linear_gradient(initial_color, dest_color, value):
     return (r, g, b)
 
 
+def linear_gradient_array(initial_color, dest_color, values):
+    """
+    Vectorized version of :func:`linear_gradient`.
+
+    Calculates the gradient color for every item in ``values`` at once.
+    The results are identical to calling :func:`linear_gradient` on each
+    value, but the HSL conversion is done with array math rather than
+    with one ``colour.Color`` instance per value.
+
+    Parameters
+    ----------
+    initial_color : tuple
+        A 3- or 4-tuple of RGB or RGBa values representing the starting
+        color for the gradient. Each color channel should be
+        in the range 0-255 inclusive.
+
+    dest_color : tuple
+        A 3- or 4-tuple of RGB or RGBa values representing the ending
+        color for the gradient. Each color channel should be
+        in the range 0-255.
+
+    values : array-like of floats
+        How far along the gradient each returned color should be. Values
+        less than or equal to ``0`` return ``initial_color`` while values
+        greater than or equal to ``1`` return ``dest_color``. The color of
+        a NaN value is undefined; callers should mask those themselves.
+
+    Returns
+    -------
+    colors : :class:`numpy.ndarray`
+        A ``(N, 3)`` array of ``uint8`` RGB values.
+
+    Examples
+    --------
+    >>> linear_gradient_array((255, 0, 0), (0, 0, 255), [0, 0.5, 1]).tolist()
+    [[255, 0, 0], [0, 255, 0], [0, 0, 255]]
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    initial_rgb = tuple(initial_color)[:3]
+    dest_rgb = tuple(dest_color)[:3]
+
+    # The end points are only two colors, so let ``colour`` convert them.
+    # That way the array math below starts from the exact same HSL values
+    # that linear_gradient uses.
+    h1, s1, l1 = Color(rgb=tuple(_c / 255 for _c in initial_rgb)).hsl
+    h2, s2, l2 = Color(rgb=tuple(_c / 255 for _c in dest_rgb)).hsl
+
+    with np.errstate(invalid="ignore"):
+        hue = rescale_array(values, (0, 1), (h1, h2))
+        saturation = rescale_array(values, (0, 1), (s1, s2))
+        lightness = rescale_array(values, (0, 1), (l1, l2))
+
+        rgb = _hsl_to_rgb_array(hue, saturation, lightness)
+
+        # Convert back to 0-255 for wxPython. ``int()`` truncates, so we do
+        # the same here.
+        colors = np.zeros((values.size, 3), dtype=np.uint8)
+        valid = np.isfinite(rgb).all(axis=1)
+        colors[valid] = np.trunc(rgb[valid] * 255)
+
+        colors[values <= 0] = initial_rgb
+        colors[values >= 1] = dest_rgb
+    return colors
+
+
+def _hsl_to_rgb_array(hue, saturation, lightness):
+    """
+    Vectorized ``colour.hsl2rgb``.
+
+    Returns a ``(N, 3)`` array of floats in the range 0-1.
+    """
+
+    def _hue_to_rgb(v1, v2, v_h):
+        # Same as ``colour._hue2rgb``. Inputs never leave (-1, 2) so a
+        # single wrap is all that's needed.
+        v_h = np.where(v_h < 0, v_h + 1, v_h)
+        v_h = np.where(v_h > 1, v_h - 1, v_h)
+        return np.select(
+            [6 * v_h < 1, 2 * v_h < 1, 3 * v_h < 2],
+            [
+                v1 + (v2 - v1) * 6 * v_h,
+                v2,
+                v1 + (v2 - v1) * ((2.0 / 3) - v_h) * 6,
+            ],
+            default=v1,
+        )
+
+    v2 = np.where(
+        lightness < 0.5,
+        lightness * (1.0 + saturation),
+        (lightness + saturation) - (saturation * lightness),
+    )
+    v1 = 2.0 * lightness - v2
+
+    rgb = np.column_stack(
+        [
+            _hue_to_rgb(v1, v2, hue + (1.0 / 3)),
+            _hue_to_rgb(v1, v2, hue),
+            _hue_to_rgb(v1, v2, hue - (1.0 / 3)),
+        ]
+    )
+
+    # No saturation means grey.
+    grey = saturation == 0
+    rgb[grey] = lightness[grey, np.newaxis]
+    return rgb
+
+
 def polylinear_gradient(colors, value):
     """
     Create a gradient.
@@ -425,6 +977,577 @@ def grid_to_rect_coord(grid, die_size, grid_center):
     return (_x, _y)
 
 
+def xyd_to_arrays(xyd):
+    """
+    Convert die data to arrays.
+
+    Columnar data is not copied: the values that are returned are views
+    of it, as are the grid coordinates if they are already integers.
+
+    Parameters
+    ----------
+    xyd : list of 3-tuples, tuple of arrays, array, or DataFrame
+        The die data, as one of:
+
+        + A list of ``(grid_x, grid_y, value)`` tuples.
+        + A ``(grid_x, grid_y, values)`` tuple of 1D arrays or sequences.
+          A 3-tuple is always read as columns, never as three die.
+        + A :class:`numpy.ndarray` with fields, such as one from
+          :func:`numpy.genfromtxt`, whose first three fields are the grid
+          x, grid y, and value.
+        + A ``(N, 3)`` :class:`numpy.ndarray`.
+        + A :class:`pandas.DataFrame` whose first three columns are the grid
+          x, grid y, and value.
+
+    Returns
+    -------
+    (grid_x, grid_y, values) : tuple of :class:`numpy.ndarray`
+        The integer grid coordinates and the values of each die.
+    """
+    columns = _xyd_columns(xyd)
+    if columns is None:
+        if len(xyd) == 0:
+            return (np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0))
+        columns = zip(*xyd)
+    grid_x, grid_y, values = columns
+    return (
+        np.asarray(grid_x, dtype=int),
+        np.asarray(grid_y, dtype=int),
+        np.asarray(values),
+    )
+
+
+def _xyd_columns(xyd):
+    """
+    Return the grid x, grid y, and value columns of columnar die data.
+
+    Returns ``None`` if ``xyd`` is a list of tuples.
+    """
+    if isinstance(xyd, tuple) and len(xyd) == 3:
+        # Arrays are returned as-is, so they aren't copied.
+        columns = tuple(np.asarray(_c) for _c in xyd)
+        if any(_c.ndim != 1 for _c in columns):
+            raise ValueError("A tuple xyd must be (grid_x, grid_y, values) columns")
+        if not len(columns[0]) == len(columns[1]) == len(columns[2]):
+            raise ValueError("grid_x, grid_y, and values must be the same length")
+        return columns
+
+    if isinstance(xyd, np.ndarray):
+        if xyd.dtype.names is not None:
+            if len(xyd.dtype.names) < 3:
+                raise ValueError("xyd needs grid x, grid y, and value fields")
+            return tuple(xyd[_name] for _name in xyd.dtype.names[:3])
+        if xyd.ndim == 2 and xyd.shape[1] == 3:
+            return (xyd[:, 0], xyd[:, 1], xyd[:, 2])
+        raise ValueError("xyd must have 3 columns, not shape {}".format(xyd.shape))
+
+    # pandas isn't a dependency, so DataFrames are duck-typed.
+    if hasattr(xyd, "iloc") and hasattr(xyd, "columns"):
+        if len(xyd.columns) < 3:
+            raise ValueError("xyd needs grid x, grid y, and value columns")
+        return tuple(xyd.iloc[:, _i].to_numpy() for _i in range(3))
+
+    return None
+
+
+def continuous_colors(
+    values,
+    plot_range,
+    low_color,
+    high_color,
+    oor_low_color,
+    oor_high_color,
+    invalid_color,
+):
+    """
+    Map continuous values to gradient colors.
+
+    Values above or below ``plot_range`` get the out-of-range colors and
+    NaN values get the invalid color. Colors may be RGB(A) tuples or
+    ``wx.Colour`` objects.
+
+    Returns
+    -------
+    colors : :class:`numpy.ndarray`
+        A ``(N, 3)`` array of ``uint8`` RGB values, one row per value.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    scaled = rescale_array(values, plot_range, (0, 1))
+    colors = linear_gradient_array(low_color, high_color, scaled)
+
+    with np.errstate(invalid="ignore"):
+        colors[values < plot_range[0]] = tuple(oor_low_color)[:3]
+        colors[values > plot_range[1]] = tuple(oor_high_color)[:3]
+    colors[np.isnan(values)] = tuple(invalid_color)[:3]
+    return colors
+
+
+def discrete_colors(values, color_dict):
+    """
+    Map discrete values to their ``{label: color}`` colors.
+
+    Every value must be a key of ``color_dict``.
+
+    Returns
+    -------
+    colors : :class:`numpy.ndarray`
+        A ``(N, 3)`` array of ``uint8`` RGB values, one row per value.
+    """
+    # Look up each distinct label once rather than once per value.
+    uniques, inverse = np.unique(np.asarray(values), return_inverse=True)
+    palette = np.array(
+        [tuple(color_dict[_label])[:3] for _label in uniques.tolist()],
+        dtype=np.uint8,
+    ).reshape(-1, 3)
+    return palette[inverse.ravel()]
+
+
+def create_discrete_colors(n):
+    """
+    Create ``n`` distinct colors for discrete legend items.
+
+    Colors are spaced evenly around the color wheel and then alternated
+    so that neighboring legend items are far apart in hue.
+
+    Returns
+    -------
+    colors : list of tuples
+        ``n`` RGB tuples.
+    """
+    spacing = 360 / n
+    colors = []
+    for val in frange(0, 360, spacing):
+        hsl = (val / 360, 1, 0.75)
+        colors.append(colorsys.hsv_to_rgb(*hsl))
+
+    # convert from 0-1 to 0-255 and return
+    colors = [tuple(int(i * 255) for i in color) for color in colors]
+
+    # Alternate colors across the circle
+    colors = colors[::2] + colors[1::2]
+    return colors
+
+
+def rasterize_die(grid_x, grid_y, colors, extent=None):
+    """
+    Rasterize die colors into an RGBA image with one pixel per die.
+
+    The image covers the bounding box of the die grid. Grid +y is down,
+    just like image rows, so row 0 holds the die with the smallest
+    ``grid_y``. Pixels without a die are fully transparent.
+
+    Parameters
+    ----------
+    grid_x, grid_y : array-like of ints
+        The grid coordinates of each die.
+    colors : array-like
+        A ``(N, 3)`` or ``(N, 4)`` array of ``uint8`` colors, one per die.
+    extent : tuple, optional
+        The ``(x_min, y_min, x_max, y_max)`` grid coordinates, inclusive,
+        for the image to cover instead of the bounding box of the die. Must
+        contain every die.
+
+    Returns
+    -------
+    image : :class:`numpy.ndarray`
+        A ``(rows, cols, 4)`` array of ``uint8`` RGBA values.
+    origin : tuple
+        The ``(grid_x, grid_y)`` of the top-left pixel.
+    """
+    grid_x = np.asarray(grid_x, dtype=int)
+    grid_y = np.asarray(grid_y, dtype=int)
+    colors = np.asarray(colors, dtype=np.uint8)
+    if extent is None:
+        if grid_x.size == 0:
+            return (np.zeros((0, 0, 4), dtype=np.uint8), (0, 0))
+        extent = (grid_x.min(), grid_y.min(), grid_x.max(), grid_y.max())
+
+    x_min, y_min = int(extent[0]), int(extent[1])
+    cols = int(extent[2]) - x_min + 1
+    rows = int(extent[3]) - y_min + 1
+
+    image = np.zeros((rows, cols, 4), dtype=np.uint8)
+    paint_die(image, (x_min, y_min), grid_x, grid_y, colors)
+    return (image, (x_min, y_min))
+
+
+def paint_die(image, origin, grid_x, grid_y, colors):
+    """
+    Paint die into an image made by :func:`rasterize_die`, in place.
+
+    The die are made opaque, so die that fill a hole in the image, where
+    there was no die before, are shown.
+
+    Parameters
+    ----------
+    image : :class:`numpy.ndarray`
+        A ``(rows, cols, 4)`` array of ``uint8`` RGBA values.
+    origin : tuple
+        The ``(grid_x, grid_y)`` of the top-left pixel.
+    grid_x, grid_y : array-like of ints
+        The grid coordinates of each die. Must be inside the image.
+    colors : array-like
+        A ``(N, 3)`` or ``(N, 4)`` array of RGB(A) colors, one per die.
+    """
+    colors = np.asarray(colors, dtype=np.uint8)
+    rows_idx = np.asarray(grid_y, dtype=int) - origin[1]
+    cols_idx = np.asarray(grid_x, dtype=int) - origin[0]
+    image[rows_idx, cols_idx, :3] = colors[:, :3]
+    image[rows_idx, cols_idx, 3] = colors[:, 3] if colors.shape[-1] == 4 else 255
+
+
+def palettize(colors):
+    """
+    Split an array of colors into a palette and an index into that palette.
+
+    Parameters
+    ----------
+    colors : array-like
+        A ``(N, 3)`` array of ``uint8`` RGB values.
+
+    Returns
+    -------
+    palette : :class:`numpy.ndarray`
+        A ``(M, 3)`` array of the unique colors, sorted.
+    index : :class:`numpy.ndarray`
+        A length ``N`` array such that ``palette[index]`` gives ``colors``.
+
+    Examples
+    --------
+    >>> palette, index = palettize([(9, 9, 9), (1, 2, 3), (9, 9, 9)])
+    >>> palette.tolist(), index.tolist()
+    ([[1, 2, 3], [9, 9, 9]], [1, 0, 1])
+    """
+    colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+
+    # Pack each color into a single int so that np.unique works on rows.
+    packed = (
+        (colors[:, 0].astype(np.uint32) << 16)
+        | (colors[:, 1].astype(np.uint32) << 8)
+        | colors[:, 2]
+    )
+    unique, index = np.unique(packed, return_inverse=True)
+    palette = np.column_stack(
+        [(unique >> 16) & 0xFF, (unique >> 8) & 0xFF, unique & 0xFF]
+    ).astype(np.uint8)
+    return (palette, index.ravel())
+
+
+def gridline_segments(die_size, center_xy, dia, period=(1, 1), offset=(0, 0)):
+    """
+    Calculate gridline segments along die edges.
+
+    Results are cached on the wafer geometry, so calling this repeatedly
+    for the same wafer is free.
+
+    Parameters
+    ----------
+    die_size : tuple
+        The die ``(width, height)`` in mm.
+    center_xy : tuple
+        The center grid coordinate as a ``(x_grid, y_grid)`` tuple.
+    dia : float
+        The wafer diameter in mm. Gridlines extend 5% past the wafer edge.
+    period : tuple, optional
+        Only draw a gridline every ``(columns, rows)`` die, such as for
+        reticle boundaries. Defaults to ``(1, 1)``: every die edge.
+    offset : tuple, optional
+        The ``(x_grid, y_grid)`` of a die whose left and top edges have a
+        gridline. Only matters when ``period`` is not ``(1, 1)``. Defaults
+        to ``(0, 0)``.
+
+    Returns
+    -------
+    segments : :class:`numpy.ndarray`
+        A read-only ``(N, 4)`` array of ``(x0, y0, x1, y1)`` world
+        coordinates, vertical lines first.
+    """
+    return _gridline_segments(
+        tuple(float(_s) for _s in die_size),
+        tuple(float(_c) for _c in center_xy),
+        float(dia),
+        tuple(int(_p) for _p in period),
+        tuple(int(_o) for _o in offset),
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _gridline_segments(die_size, center_xy, dia, period, offset):
+    """Cached implementation of :func:`gridline_segments`."""
+    edge = (dia / 2) * 1.05
+
+    x_values = _grid_edges(die_size[0], center_xy[0], edge, period[0], offset[0])
+    # Grid +y is down while world +y is up, so the top edge of a die is at
+    # the negative of where the left edge would be.
+    y_values = -_grid_edges(die_size[1], center_xy[1], edge, period[1], offset[1])
+
+    vert = np.column_stack(
+        (
+            x_values,
+            np.full_like(x_values, -edge),
+            x_values,
+            np.full_like(x_values, edge),
+        )
+    )
+    horiz = np.column_stack(
+        (
+            np.full_like(y_values, -edge),
+            y_values,
+            np.full_like(y_values, edge),
+            y_values,
+        )
+    )
+    segments = np.vstack((vert, horiz))
+    segments.setflags(write=False)
+    return segments
+
+
+def _grid_edges(size, center, edge, period, offset):
+    """
+    Return the world coordinates of die edges within ``edge`` of 0.
+
+    Only the leading edge of every ``period``-th die, starting at grid
+    coordinate ``offset``, is returned.
+    """
+    # The leading edge of grid die g is at size * (g - center - 0.5). Edges
+    # that land exactly on +/- edge are excluded.
+    lo = (center + 0.5 - edge / size - offset) / period
+    hi = (center + 0.5 + edge / size - offset) / period
+    grid = offset + period * np.arange(math.floor(lo) + 1, math.ceil(hi))
+    return size * (grid - center - 0.5)
+
+
+class WaferOutline(object):
+    """
+    The geometry of a wafer outline and its edge exclusion.
+
+    This is pure data: nothing here depends on a GUI toolkit. Use
+    :func:`wafer_outline` rather than instancing this directly so that the
+    geometry is shared between all wafers of the same size.
+
+    Parameters
+    ----------
+    dia : float
+        The wafer diameter in mm.
+    excl : float
+        The exclusion distance from the edge of the wafer in mm.
+    flat_excl : float
+        The exclusion distance from the wafer flat in mm.
+    flat_length : float or None
+        The length of the wafer flat in mm. If ``None``, the wafer has a
+        notch instead of a flat.
+
+    Attributes
+    ----------
+    rad, excl_rad : float
+        The radius of the wafer and of the edge exclusion.
+    has_flat : bool
+        ``True`` if the wafer has a flat, ``False`` if it has a notch.
+    edge_arc : tuple
+        The ``(start_xy, end_xy)`` of the wafer edge arc, centered on
+        ``(0, 0)``. The gap is filled by ``edge_mark``.
+    edge_mark : tuple
+        The points of the wafer flat or notch.
+    excl_arc : tuple or None
+        The ``(start_xy, end_xy)`` of the exclusion arc, or ``None`` if the
+        exclusion is a full circle of radius ``excl_rad``.
+    excl_mark : tuple or None
+        The points of the exclusion flat or notch, or ``None`` if the
+        exclusion is a full circle.
+    """
+
+    notch_angle = 2.5
+
+    def __init__(self, dia, excl, flat_excl, flat_length):
+        self.dia = dia
+        self.rad = dia / 2.0
+        self.excl_rad = 0.5 * (dia - 2.0 * excl)
+        self.has_flat = flat_length is not None
+
+        if self.has_flat:
+            self.edge_mark = flat_coords(self.rad, flat_length)
+            self.edge_arc = (self.edge_mark[1], self.edge_mark[0])
+
+            # The exclusion flat is defined by the flat exclusion, not the
+            # edge exclusion.
+            flat_y = self.edge_mark[0][1] + flat_excl
+            if self.excl_rad < abs(flat_y):
+                self.excl_arc = None
+                self.excl_mark = None
+            else:
+                flat_x = math.sqrt(self.excl_rad**2 - flat_y**2)
+                self.excl_mark = flat_coords(self.excl_rad, flat_x * 2)
+                self.excl_arc = ((flat_x, flat_y), (-flat_x, flat_y))
+        else:
+            self.edge_arc = calc_flat_coords(self.rad, self.notch_angle)
+            self.edge_mark = notch_coords(self.rad, self.notch_angle)
+            self.excl_arc = calc_flat_coords(self.excl_rad, self.notch_angle)
+            self.excl_mark = notch_coords(self.excl_rad, self.notch_angle)
+
+
+@functools.lru_cache(maxsize=32)
+def _wafer_outline(dia, excl, flat_excl, flat_length):
+    """Cached implementation of :func:`wafer_outline`."""
+    return WaferOutline(dia, excl, flat_excl, flat_length)
+
+
+def wafer_outline(dia=150, excl=5, flat_excl=None, flat_length=None):
+    """
+    Return the cached :class:`WaferOutline` for a wafer.
+
+    Parameters
+    ----------
+    dia : float, optional
+        The wafer diameter in mm. Defaults to `150`.
+    excl : float, optional
+        The exclusion distance from the edge of the wafer in mm. Defaults
+        to `5`.
+    flat_excl : float, optional
+        The exclusion distance from the wafer flat in mm. If ``None``, uses
+        the same value as ``excl``. Defaults to ``None``.
+    flat_length : float, optional
+        The length of the wafer flat in mm. If ``None``, the wafer has a
+        notch. Defaults to ``None``.
+
+    Returns
+    -------
+    :class:`WaferOutline`
+        The outline geometry. The same object is returned for the same
+        arguments, so it must not be modified.
+    """
+    if flat_excl is None:
+        flat_excl = excl
+    if flat_length is not None:
+        flat_length = float(flat_length)
+    return _wafer_outline(float(dia), float(excl), float(flat_excl), flat_length)
+
+
+@functools.lru_cache(maxsize=32)
+def crosshair_coords(dia):
+    """
+    Return the ``(x_line, y_line)`` points of the wafer crosshairs.
+
+    The crosshairs extend 5% past the wafer edge.
+    """
+    rad = dia / 2
+    x_line = ((rad * 1.05, 0), (-rad * 1.05, 0))
+    y_line = ((0, rad * 1.05), (0, -rad * 1.05))
+    return (x_line, y_line)
+
+
+def flat_coords(radius, flat_length):
+    """
+    Return the ``(start_xy, end_xy)`` of a wafer flat.
+
+    The flat is a horizontal chord of length ``flat_length`` below the
+    center of a circle of radius ``radius``.
+    """
+    x = flat_length / 2
+    y = -math.sqrt(radius**2 - x**2)
+    return ((-x, y), (x, y))
+
+
+def notch_coords(radius, angle=2.5):
+    """
+    Return the three points of a wafer notch.
+
+    The notch spans ``angle`` degrees at the bottom of a circle of radius
+    ``radius`` and dips to 95% of the radius.
+    """
+    start_xy, end_xy = calc_flat_coords(radius, angle)
+    return (end_xy, (0, -radius * 0.95), start_xy)
+
+
+def calc_flat_coords(radius, angle):
+    """
+    Calculate the chord of a circle that spans ``angle``.
+
+    Assumes the chord is centered on the y-axis.
+
+    Calculate the starting and ending XY coordinates for a horizontal line
+    below the y axis that interects a circle of radius ``radius`` and
+    makes an angle ``angle`` at the center of the circle.
+
+    This line is below the y axis.
+
+    Parameters
+    ----------
+    radius : float
+        The radius of the circle that the line intersects.
+    angle : float
+        The angle, in degrees, that the line spans.
+
+    Returns
+    -------
+    (start_xy, end_xy) : tuple of coord pairs
+        The starting and ending XY coordinates of the line.
+        (start_x, start_y), (end_x, end_y))
+
+    Notes
+    -----
+    What follows is a poor-mans schematic. I hope.
+
+    ::
+
+        1-------------------------------------------------------1
+        1                                                       1
+        1                                                       1
+        1                           +                           1
+        1                          . .                          1
+        1                         .   .                         1
+        1                        .     . Radius                 1
+         1                      .       .                      1
+         1                     .         .                     1
+         1                    .           .                    1
+          1                  .             .                  1
+          1                 .  <--angle-->  .                 1
+           1               .                 .               1
+            1             .                   .             1
+            1            .                     .            1
+             1          .                       .          1
+              1        .                         .        1
+                1     .                           .     1
+                 1   .                             .   1
+                  1 .                               . 1
+                    1-------------line--------------1
+                      1                           1
+                        1                       1
+                           1                  1
+                               111111111111
+    """
+    ang_rad = angle * math.pi / 180
+    start_xy = (radius * math.sin(ang_rad), -radius * math.cos(ang_rad))
+    end_xy = (-radius * math.sin(ang_rad), -radius * math.cos(ang_rad))
+    return (start_xy, end_xy)
+
+
+def values_changed(old, new):
+    """
+    Return a boolean mask of where ``new`` differs from ``old``.
+
+    Unlike ``old != new``, NaN is considered equal to NaN.
+
+    Examples
+    --------
+    >>> values_changed([1, float("nan"), 3], [1, float("nan"), 4]).tolist()
+    [False, False, True]
+    """
+    old = np.asarray(old)
+    new = np.asarray(new)
+    changed = np.asarray(old != new)
+    if old.dtype.kind == "f" or new.dtype.kind == "f":
+        both_nan = _isnan(old) & _isnan(new)
+        changed &= ~both_nan
+    return changed
+
+
+def _isnan(a):
+    """``np.isnan`` that returns ``False`` for non-numeric values."""
+    if a.dtype.kind in "fc":
+        return np.isnan(a)
+    return np.zeros(a.shape, dtype=bool)
+
+
 def nanpercentile(a, percentile):
     """
     Perform ``numpy.percentile(a, percentile)`` while ignoring NaN values.
@@ -436,6 +1559,87 @@ def nanpercentile(a, percentile):
     return np.percentile(a[np.logical_not(np.isnan(a))], percentile)
 
 
+class SummaryStats(object):
+    """
+    Statistics of an array of values, ignoring NaN. See :func:`summary_stats`.
+
+    Attributes
+    ----------
+    percentiles : tuple of floats
+        The requested percentiles, in the order they were requested.
+    min, max : float
+        The smallest and largest values.
+    count : int
+        The number of values that aren't NaN.
+    nan_count : int
+        The number of NaN values.
+
+    All of the floats are NaN if every value is NaN.
+    """
+
+    def __init__(self, percentiles, min, max, count, nan_count):
+        self.percentiles = percentiles
+        self.min = min
+        self.max = max
+        self.count = count
+        self.nan_count = nan_count
+
+
+def summary_stats(values, percentiles=(2, 98)):
+    """
+    Find percentiles, the min and max, and the NaN count of some values.
+
+    NaN values are dropped once and a single partial sort finds every
+    statistic, rather than filtering and sorting once for each one. The
+    percentiles match ``numpy.percentile``'s default linear interpolation.
+
+    Parameters
+    ----------
+    values : array-like of numbers
+        The values. Not changed.
+    percentiles : sequence of floats, optional
+        The percentiles to find, from 0 to 100. Defaults to ``(2, 98)``.
+
+    Returns
+    -------
+    stats : :class:`SummaryStats`
+
+    Examples
+    --------
+    >>> stats = summary_stats([4, float("nan"), 1, 3, 2], (0, 50))
+    >>> stats.percentiles, stats.min, stats.max, stats.nan_count
+    ((1.0, 2.5), 1.0, 4.0, 1)
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    nan = np.isnan(values)
+    nan_count = int(np.count_nonzero(nan))
+    if nan_count:
+        values = values[~nan]
+    count = values.size
+    if count == 0:
+        return SummaryStats(
+            tuple(math.nan for _ in percentiles), math.nan, math.nan, 0, nan_count
+        )
+
+    # The fractional rank of each percentile, and the ranks on either side.
+    ranks = np.asarray(percentiles, dtype=float) / 100 * (count - 1)
+    below = np.floor(ranks).astype(int)
+    above = np.minimum(below + 1, count - 1)
+    kth = np.unique(np.concatenate(([0, count - 1], below, above)))
+    # np.partition copies, so the caller's array isn't reordered.
+    ordered = np.partition(values, kth)
+
+    low = ordered[below]
+    result = low + (ordered[above] - low) * (ranks - below)
+    return SummaryStats(
+        tuple(float(_v) for _v in result),
+        float(ordered[0]),
+        float(ordered[-1]),
+        count,
+        nan_count,
+    )
+
+
 def max_dist_sqrd(center, size):
     """
     Calculate the squared distnace to the furthest corner of a rectangle.
@@ -532,6 +1736,47 @@ def rescale(x, orig_scale, new_scale=(0, 1)):
     return float(result)
 
 
+def rescale_array(x, orig_scale, new_scale=(0, 1)):
+    """
+    Vectorized version of :func:`rescale`.
+
+    Rescales every item of ``x`` using the exact same arithmetic as
+    :func:`rescale`, so results match element-for-element. A zero-width
+    ``orig_scale`` results in all zeros, just like :func:`rescale`.
+
+    Parameters
+    ----------
+    x : array-like of numerics
+        The values to rescale.
+
+    orig_scale : sequence of numerics, length 2
+        The (min, max) value that ``x`` typically ranges over.
+
+    new_scale : sequence of numerics, length 2, optional
+        The new (min, max) value that the rescaled ``x`` should reference
+
+    Returns
+    -------
+    result : :class:`numpy.ndarray`
+        The rescaled values, as floats.
+
+    Examples
+    --------
+    >>> rescale_array([5, 15], (10, 20), (0, 1)).tolist()
+    [-0.5, 0.5]
+    """
+    x = np.asarray(x, dtype=float)
+    original_min, original_max = orig_scale
+    new_min, new_max = new_scale
+
+    part_a = x * (new_max - new_min)
+    part_b = original_min * new_max - original_max * new_min
+    denominator = original_max - original_min
+    if denominator == 0:
+        return np.zeros_like(x)
+    return (part_a - part_b) / denominator
+
+
 def rescale_clip(x, orig_scale, new_scale=(0, 1)):
     """
     Rescale and clip ``x`` to run over a new range.
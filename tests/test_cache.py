@@ -0,0 +1,149 @@
+"""
+Unittests for the :module:`wafer_map.wm_cache` module.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from wafer_map import wm_cache
+from wafer_map import wm_constants as wm_const
+from wafer_map import wm_info
+from wafer_map import wm_raster
+from wafer_map import wm_utils
+
+
+class Legend(object):
+    """The parts of a ``ContinuousLegend`` that color die."""
+
+    plot_range = (0, 1)
+    low_color = (0, 0, 0)
+    high_color = (255, 255, 255)
+    oor_low_color = (255, 128, 0)
+    oor_high_color = (255, 0, 128)
+    invalid_color = (9, 9, 9)
+
+    def get_colors(self, values):
+        return wm_utils.continuous_colors(
+            values,
+            self.plot_range,
+            self.low_color,
+            self.high_color,
+            self.oor_low_color,
+            self.oor_high_color,
+            self.invalid_color,
+        )
+
+
+class ContentKey(unittest.TestCase):
+    def test_key(self):
+        info = wm_info.WaferInfo((5, 5), (0, 0))
+        values = np.array([1.0, 2.0])
+        key = wm_cache.content_key(values, info, (0, 1))
+        self.assertEqual(key, wm_cache.content_key(values.copy(), info, (0, 1)))
+        self.assertNotEqual(key, wm_cache.content_key(values, info, (0, 2)))
+        self.assertNotEqual(key, wm_cache.content_key(values[::-1], info, (0, 1)))
+        info.edge_excl = 4
+        self.assertNotEqual(key, wm_cache.content_key(values, info, (0, 1)))
+
+    def test_types_dont_collide(self):
+        self.assertNotEqual(
+            wm_cache.content_key(np.array([1], dtype=np.int64)),
+            wm_cache.content_key(np.array([1], dtype=np.float64).view(np.int64)),
+        )
+        self.assertNotEqual(wm_cache.content_key("1"), wm_cache.content_key(1))
+        self.assertNotEqual(
+            wm_cache.content_key([1, 2], 3), wm_cache.content_key([1], 2, 3)
+        )
+
+
+class RenderCache(unittest.TestCase):
+    def test_lru(self):
+        cache = wm_cache.RenderCache(max_bytes=250)
+        for key in "abc":
+            cache.put(key, np.zeros(100, dtype=np.uint8))
+        cache.get("b")
+        cache.put("d", np.zeros(100, dtype=np.uint8))
+        self.assertEqual(sorted(cache._items), ["b", "d"])
+        self.assertEqual(cache.nbytes, 200)
+        self.assertIsNone(cache.get("a"))
+
+    def test_read_only_copy(self):
+        cache = wm_cache.RenderCache()
+        value = np.arange(3)
+        cache.put("a", value)
+        value[0] = 10
+        self.assertEqual(cache.get("a").tolist(), [0, 1, 2])
+        with self.assertRaises(ValueError):
+            cache.get("a")[0] = 5
+
+    def test_disk(self):
+        directory = tempfile.mkdtemp()
+        try:
+            wm_cache.RenderCache(directory=directory).put("a", np.arange(3))
+            cache = wm_cache.RenderCache(directory=directory)
+            self.assertEqual(cache.get("a").tolist(), [0, 1, 2])
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+            self.assertIsNone(cache.get("b"))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_prune_disk(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache = wm_cache.RenderCache(directory=directory)
+            cache.put("a", np.zeros(400, dtype=np.uint8))
+            size = os.path.getsize(cache._path("a"))
+            # Room for four entries but not five.
+            cache.max_disk_bytes = 4 * size + size // 2
+            for number, key in enumerate("abcd"):
+                cache.put(key, np.zeros(400, dtype=np.uint8))
+                os.utime(cache._path(key), (number, number))
+            # Reading "a" makes it the most recently used.
+            cache.clear()
+            cache.get("a")
+            cache.put("e", np.zeros(400, dtype=np.uint8))
+            names = sorted(os.listdir(directory))
+            self.assertEqual(names, ["a.npy", "d.npy", "e.npy"])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_die_colors(self):
+        old_cache = wm_cache.get_cache()
+        wm_cache.set_cache(wm_cache.RenderCache())
+        try:
+            values = np.array([-1.0, 0.5, 2.0, np.nan])
+            data_type = wm_const.DataType.CONTINUOUS
+            first = wm_cache.die_colors(values, data_type, Legend())
+            self.assertEqual(first[0].tolist(), [255, 128, 0])
+            names = (
+                "low_color",
+                "high_color",
+                "oor_low_color",
+                "oor_high_color",
+                "invalid_color",
+            )
+            for name in names:
+                legend = Legend()
+                setattr(legend, name, (1, 2, 3))
+                colors = wm_cache.die_colors(values, data_type, legend)
+                self.assertNotEqual(colors.tolist(), first.tolist(), name)
+        finally:
+            wm_cache.set_cache(old_cache)
+
+    def test_render(self):
+        old_cache = wm_cache.get_cache()
+        cache = wm_cache.RenderCache()
+        wm_cache.set_cache(cache)
+        try:
+            info = wm_info.WaferInfo((10, 10), (0, 0), dia=100)
+            image = wm_raster.render([(0, 0, 1.0)], info, plot_range=(0, 2))
+            again = wm_raster.render([(0, 0, 1.0)], info, plot_range=(0, 2))
+            np.testing.assert_array_equal(image, again)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            wm_raster.render([(0, 0, 1.0)], info, plot_range=(0, 3))
+            self.assertEqual(cache.misses, 2)
+        finally:
+            wm_cache.set_cache(old_cache)
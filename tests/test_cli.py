@@ -0,0 +1,83 @@
+"""
+Unittests for the :module:`wafer_map.wm_cli` module.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from wafer_map import wm_cli
+
+TEXT = """\
+# die_size: 5, 5
+# center_xy: 0, 0
+x,y,Vth,Bin
+0,0,0.5,pass
+1,0,0.75,fail
+"""
+
+
+class RenderFiles(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.out_dir = os.path.join(self.tempdir, "maps")
+        for name in ("w01.csv", "w02.csv"):
+            with open(os.path.join(self.tempdir, name), "w") as openf:
+                openf.write(TEXT)
+        with open(os.path.join(self.tempdir, "bad.csv"), "w") as openf:
+            openf.write("x,y,Vth\n0,0\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_render_files(self):
+        paths = wm_cli.find_files([self.tempdir])
+        self.assertEqual(len(paths), 3)
+        progress = []
+        results = wm_cli.render_files(
+            paths,
+            self.out_dir,
+            jobs=1,
+            progress=lambda *args: progress.append(args),
+        )
+        self.assertEqual(len(results), 5)
+        self.assertEqual([_p[:2] for _p in progress], [(_i, 5) for _i in range(1, 6)])
+
+        # The bad file fails alone.
+        failed = [_r for _r in results if _r.error is not None]
+        self.assertEqual([os.path.basename(_r.path) for _r in failed], ["bad.csv"])
+        self.assertEqual(
+            sorted(os.listdir(self.out_dir)),
+            ["w01_Bin.png", "w01_Vth.png", "w02_Bin.png", "w02_Vth.png"],
+        )
+
+    def test_same_names(self):
+        paths = []
+        for lot in ("lotA", "lotB"):
+            os.mkdir(os.path.join(self.tempdir, lot))
+            paths.append(os.path.join(self.tempdir, lot, "w01.csv"))
+            with open(paths[-1], "w") as openf:
+                openf.write(TEXT)
+        results = wm_cli.render_files(paths, self.out_dir, ["Vth"], jobs=1)
+        self.assertEqual([_r.error for _r in results], [None, None])
+        self.assertEqual(
+            sorted(os.listdir(self.out_dir)), ["lotA_w01_Vth.png", "lotB_w01_Vth.png"]
+        )
+
+        # Parameters whose names only differ in unsafe characters clash.
+        with open(paths[0], "w") as openf:
+            openf.write(TEXT.replace("Vth,Bin", "V/th,V:th"))
+        results = wm_cli.render_files(paths[:1], self.out_dir, jobs=1)
+        errors = [_r.error for _r in results if _r.error is not None]
+        self.assertEqual(len(results), 2)
+        self.assertEqual(len(errors), 1)
+        self.assertIn("V_th.png is also the image of", errors[0])
+
+    def test_main(self):
+        pattern = os.path.join(self.tempdir, "w*.csv")
+        argv = ["render", pattern, "-o", self.out_dir, "-j", "2", "-q"]
+        self.assertEqual(wm_cli.main(argv + ["--params", "Vth"]), 0)
+        self.assertEqual(
+            sorted(os.listdir(self.out_dir)), ["w01_Vth.png", "w02_Vth.png"]
+        )
+        self.assertEqual(wm_cli.main(argv + ["--params", "nope"]), 1)
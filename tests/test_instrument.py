@@ -0,0 +1,38 @@
+"""
+Unittests for the :module:`wafer_map.wm_instrument` module.
+"""
+import unittest
+
+from wafer_map import wm_instrument
+
+
+class Span(unittest.TestCase):
+    def test_timings(self):
+        timings = wm_instrument.Timings()
+        with wm_instrument.span(timings, "outer", die=3) as info:
+            with wm_instrument.span(timings, "inner"):
+                pass
+            info["objects"] = 2
+        with self.assertRaises(KeyError):
+            with wm_instrument.span(timings, "inner"):
+                raise KeyError
+
+        self.assertEqual([_s.name for _s in timings.spans], ["inner", "outer", "inner"])
+        self.assertEqual(timings.spans[1].info, {"die": 3, "objects": 2})
+        self.assertGreaterEqual(timings.spans[1].seconds, timings.spans[0].seconds)
+        summary = timings.summary()
+        self.assertEqual(list(summary), ["inner", "outer"])
+        self.assertEqual(summary["inner"]["count"], 2)
+        self.assertIn("outer", timings.report())
+
+    def test_no_instrument(self):
+        with wm_instrument.span(None, "draw", objects=1) as info:
+            info["more"] = 2
+        self.assertEqual(info, {"objects": 1, "more": 2})
+
+    def test_max_spans(self):
+        timings = wm_instrument.Timings(max_spans=2)
+        for name in "abc":
+            with wm_instrument.span(timings, name):
+                pass
+        self.assertEqual([_s.name for _s in timings.spans], ["b", "c"])
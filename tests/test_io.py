@@ -0,0 +1,109 @@
+"""
+Unittests for the :module:`wafer_map.wm_io` module.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from wafer_map import wm_constants as wm_const
+from wafer_map import wm_io
+
+TEXT = """\
+# die_size: 5, 6.5
+# center_xy: 10, 12
+# dia: 100
+x,y,Vth,Bin
+10,12,0.5,pass
+11,12,0.75,fail
+"""
+
+
+class ReadText(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, "wafer.csv")
+        with open(self.path, "w") as openf:
+            openf.write(TEXT)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_read(self):
+        wafer = wm_io.read_text(self.path)
+        self.assertEqual(list(wafer.parameters), ["Vth", "Bin"])
+        self.assertEqual(wafer.xyd("Vth"), [(10, 12, 0.5), (11, 12, 0.75)])
+        self.assertEqual(wafer.xyd("Bin"), [(10, 12, "pass"), (11, 12, "fail")])
+        self.assertEqual(wafer.data_type("Vth"), wm_const.DataType.CONTINUOUS)
+        self.assertEqual(wafer.data_type("Bin"), wm_const.DataType.DISCRETE)
+
+    def test_wafer_info(self):
+        wafer = wm_io.read_text(self.path, ["Bin"])
+        self.assertEqual(list(wafer.parameters), ["Bin"])
+        info = wafer.wafer_info(dia=150)
+        self.assertEqual(info.die_size, (5, 6.5))
+        self.assertEqual(info.center_xy, (10, 12))
+        self.assertEqual(info.dia, 150)
+
+    def test_whitespace(self):
+        with open(self.path, "w") as openf:
+            openf.write("x y Vth\n1 2 3.5\n")
+        wafer = wm_io.read_text(self.path)
+        self.assertEqual(wafer.xyd("Vth"), [(1, 2, 3.5)])
+        with self.assertRaises(ValueError):
+            wafer.wafer_info()
+
+
+class ReadNumpy(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.text_path = os.path.join(self.tempdir, "wafer.csv")
+        with open(self.text_path, "w") as openf:
+            openf.write(TEXT)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_npz_round_trip(self):
+        path = os.path.join(self.tempdir, "wafer.npz")
+        wm_io.write_npz(path, wm_io.read_text(self.text_path))
+        self.assertEqual(wm_io.read_header(path)[1], ["x", "y", "Vth", "Bin"])
+
+        wafer = wm_io.read(path)
+        self.assertEqual(list(wafer.parameters), ["Vth", "Bin"])
+        self.assertEqual(wafer.xyd("Vth"), [(10, 12, 0.5), (11, 12, 0.75)])
+        self.assertEqual(wafer.xyd("Bin"), [(10, 12, "pass"), (11, 12, "fail")])
+        self.assertIsInstance(wafer.parameters["Vth"], np.memmap)
+        self.assertEqual(wafer.wafer_info().die_size, (5, 6.5))
+
+    def test_npz_compressed(self):
+        path = os.path.join(self.tempdir, "wafer.npz")
+        np.savez_compressed(path, x=[1, 2], y=[3, 4], Vth=[0.5, 1.5])
+        wafer = wm_io.read_npz(path)
+        self.assertEqual(wafer.xyd("Vth"), [(1, 3, 0.5), (2, 4, 1.5)])
+        self.assertEqual(wafer.metadata, {})
+
+    def test_npy(self):
+        path = os.path.join(self.tempdir, "wafer.npy")
+        table = np.array(
+            [(1, 3, 0.5), (2, 4, 1.5)],
+            dtype=[("col", int), ("row", int), ("Vth", float)],
+        )
+        np.save(path, table)
+        self.assertEqual(wm_io.read_header(path), ({}, ["col", "row", "Vth"]))
+        wafer = wm_io.read(path, ["Vth"])
+        self.assertEqual(wafer.xyd("Vth"), [(1, 3, 0.5), (2, 4, 1.5)])
+        self.assertIsInstance(wafer.parameters["Vth"], np.memmap)
+
+    def test_bad_layout(self):
+        path = os.path.join(self.tempdir, "wafer.npz")
+        np.savez(path, x=[1, 2], Vth=[0.5, 1.5])
+        with self.assertRaises(ValueError):
+            wm_io.read(path)
+        np.savez(path, x=[1, 2], y=[3, 4], Vth=[0.5])
+        with self.assertRaises(ValueError):
+            wm_io.read(path)
+        with self.assertRaises(ValueError):
+            wm_io.write_npz(path, wm_io.WaferData([], [], {"x": []}))
@@ -0,0 +1,69 @@
+"""
+Unittests for the :module:`wafer_map.wm_klarf` module.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from wafer_map import wm_klarf
+
+KLARF = """\
+FileVersion 1 2;
+SampleSize 1 150;
+DiePitch 5000.0 4000.0;
+SampleCenterLocation 10000.0 8000.0;
+OrientationMarkLocation DOWN;
+ClassLookup 2
+ 1 "Particle"
+ 2 "Scratch; long";
+WaferID "W01";
+DefectRecordSpec 7 DEFECTID XREL YREL XINDEX YINDEX CLASSNUMBER IMAGELIST;
+DefectList
+ 1 1000.0 500.0 2 2 1 0
+ 2 2500.0 2000.0 0 0 2 1
+ 1 0
+ 3 0.0 0.0 1 3 7 0;
+SummarySpec 2 TESTNO NDEFECT;
+SummaryList
+ 1 3;
+WaferID "W02";
+OrientationMarkLocation UP;
+DefectList
+ 1 0.0 0.0 3 2 1 0;
+EndOfFile;
+"""
+
+
+class ReadKlarf(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, "lot.klarf")
+        with open(self.path, "w") as openf:
+            openf.write(KLARF)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_read(self):
+        first, second = wm_klarf.read_klarf(self.path)
+        self.assertEqual(first.wafer_id, "W01")
+        self.assertEqual(len(first), 3)
+        self.assertEqual(first.x.tolist(), [1.0, -7.5, -5.0])
+        self.assertEqual(first.y.tolist(), [0.5, -6.0, 4.0])
+        self.assertEqual(first.classes.tolist(), ["Particle", "Scratch; long", "7"])
+        self.assertEqual(first.columns["DEFECTID"].tolist(), [1, 2, 3])
+        self.assertNotIn("IMAGELIST", first.columns)
+        self.assertEqual(first.die_size, (5, 4))
+        self.assertEqual(first.dia, 150)
+
+        # The notch is up, so the wafer is turned around.
+        self.assertEqual(second.wafer_id, "W02")
+        self.assertEqual(second.x.tolist(), [-5.0])
+        self.assertEqual(second.y.tolist(), [0.0])
+
+    def test_no_spec(self):
+        with open(self.path, "w") as openf:
+            openf.write("DefectList\n 1 0 0;\n")
+        with self.assertRaises(ValueError):
+            wm_klarf.read_klarf(self.path)
@@ -0,0 +1,79 @@
+"""
+Unittests for the :module:`wafer_map.wm_raster` module.
+"""
+import struct
+import unittest
+import zlib
+
+import numpy as np
+
+from wafer_map import wm_info
+from wafer_map import wm_raster as raster
+
+
+class Render(unittest.TestCase):
+    def setUp(self):
+        self.wafer_info = wm_info.WaferInfo((10, 10), (0, 0), dia=100)
+        self.xyd = [(0, 0, 1.0), (1, 0, 2.0), (0, 1, float("nan"))]
+
+    def pixel(self, image, x, y):
+        # The image covers 1.05 * radius on each side of the center.
+        edge = 52.5
+        scale = image.shape[0] / (2 * edge)
+        col = int((x + edge) * scale)
+        row = int((edge - y) * scale)
+        return tuple(image[row, col, :3])
+
+    def test_die_colors(self):
+        image = raster.render(
+            self.xyd,
+            self.wafer_info,
+            plot_range=(1, 2),
+            low_color=(0, 0, 255),
+            high_color=(255, 0, 0),
+        )
+        self.assertEqual(image.shape, (500, 500, 4))
+        self.assertEqual(self.pixel(image, 3, 3), (0, 0, 255))
+        self.assertEqual(self.pixel(image, 13, 3), (255, 0, 0))
+        # Grid +y is down.
+        self.assertEqual(self.pixel(image, 3, -7), (255, 255, 255))
+        self.assertEqual(self.pixel(image, -27, -27), (0, 0, 0))
+
+    def test_discrete(self):
+        xyd = [(0, 0, "a"), (1, 0, "b")]
+        image = raster.render(
+            xyd,
+            self.wafer_info,
+            data_type="discrete",
+            discrete_legend_colors=[(1, 2, 3), (4, 5, 6)],
+            show_legend=True,
+        )
+        self.assertEqual(image.shape, (500, 540, 4))
+        self.assertEqual(self.pixel(image, 3, 3), (1, 2, 3))
+        self.assertEqual(self.pixel(image, 13, 3), (4, 5, 6))
+
+    def test_empty_needs_plot_range(self):
+        with self.assertRaises(ValueError):
+            raster.render([], self.wafer_info)
+        image = raster.render([], self.wafer_info, plot_range=(0, 1))
+        self.assertEqual(image.shape, (500, 500, 4))
+
+
+class EncodePng(unittest.TestCase):
+    def test_round_trip(self):
+        image = np.arange(2 * 3 * 4, dtype=np.uint8).reshape(2, 3, 4)
+        png = raster.encode_png(image)
+
+        self.assertEqual(png[:8], b"\x89PNG\r\n\x1a\n")
+        length, tag = struct.unpack(">I4s", png[8:16])
+        self.assertEqual(tag, b"IHDR")
+        cols, rows, depth, color_type = struct.unpack(">IIBB", png[16:26])
+        self.assertEqual((cols, rows, depth, color_type), (3, 2, 8, 6))
+
+        idat = png.index(b"IDAT")
+        (length,) = struct.unpack(">I", png[idat - 4 : idat])
+        data = zlib.decompress(png[idat + 4 : idat + 4 + length])
+        scanlines = np.frombuffer(data, dtype=np.uint8).reshape(2, -1)
+        self.assertEqual(scanlines[:, 0].tolist(), [0, 0])
+        np.testing.assert_array_equal(scanlines[:, 1:].reshape(2, 3, 4), image)
+        self.assertTrue(png.endswith(b"IEND\xaeB`\x82"))
@@ -0,0 +1,67 @@
+"""
+Unittests for the :module:`wafer_map.wm_stack` module.
+"""
+import unittest
+
+import numpy as np
+
+from wafer_map import wm_constants as wm_const
+from wafer_map import wm_info
+from wafer_map import wm_stack
+
+
+class Stack(unittest.TestCase):
+    def setUp(self):
+        self.xyds = [
+            [(0, 0, 1.0), (1, 0, 2.0)],
+            [(0, 0, 3.0), (1, 1, 5.0)],
+            [(0, 0, 8.0), (1, 0, 4.0), (1, 1, float("nan"))],
+        ]
+
+    def test_stack(self):
+        data, extent = wm_stack.stack(self.xyds)
+        self.assertEqual(extent, (0, 0, 1, 1))
+        self.assertEqual(data.shape, (3, 2, 2))
+        np.testing.assert_array_equal(data[:, 0, 0], [1, 3, 8])
+        np.testing.assert_array_equal(data[:, 0, 1], [2, np.nan, 4])
+
+    def test_reduce(self):
+        expected = {
+            "mean": {(0, 0): 4.0, (1, 0): 3.0, (1, 1): 5.0},
+            "median": {(0, 0): 3.0, (1, 0): 3.0, (1, 1): 5.0},
+            "std": {(0, 0): np.std([1, 3, 8]), (1, 0): 1.0, (1, 1): 0.0},
+            "min": {(0, 0): 1.0, (1, 0): 2.0, (1, 1): 5.0},
+            "max": {(0, 0): 8.0, (1, 0): 4.0, (1, 1): 5.0},
+            "count": {(0, 0): 3, (1, 0): 2, (1, 1): 1},
+        }
+        for statistic, values in expected.items():
+            # A chunk size of 2 exercises combining chunks.
+            xyd = wm_stack.reduce_stack(iter(self.xyds), statistic, chunk_size=2)
+            result = {(_x, _y): _v for _x, _y, _v in xyd}
+            self.assertEqual(result.keys(), values.keys(), statistic)
+            for key, value in values.items():
+                self.assertAlmostEqual(result[key], value, msg=statistic)
+
+    def test_labels(self):
+        xyds = [
+            [(0, 0, "Pass"), (1, 0, "Fail")],
+            [(0, 0, "Pass"), (1, 0, "Short")],
+            [(0, 0, "Open"), (1, 0, "Short")],
+        ]
+        xyd = wm_stack.reduce_stack(
+            xyds, wm_const.Statistic.YIELD, extent=(0, 0, 1, 0), good_bins=["Pass"]
+        )
+        self.assertEqual(xyd, [(0, 0, 200 / 3), (1, 0, 0.0)])
+        xyd = wm_stack.reduce_stack(xyds, "mode", chunk_size=1)
+        self.assertEqual(xyd, [(0, 0, "Pass"), (1, 0, "Short")])
+
+    def test_yield_empty_wafer(self):
+        xyds = [[(0, 0, 1), (1, 0, 2), (0, 1, 1)], []]
+        xyd = wm_stack.reduce_stack(xyds, wm_const.Statistic.YIELD, good_bins=[1])
+        self.assertEqual(xyd, [(0, 0, 100.0), (1, 0, 0.0), (0, 1, 100.0)])
+
+    def test_wafer_extent(self):
+        info = wm_info.WaferInfo((10, 10), (5, 5), dia=100)
+        self.assertEqual(wm_stack.wafer_extent(info), (0, 0, 10, 10))
+        with self.assertRaises(ValueError):
+            wm_stack.reduce_stack([[(11, 0, 1.0)]], wafer_info=info)
@@ -0,0 +1,129 @@
+"""
+Unittests for the :module:`wafer_map.wm_stdf` module.
+"""
+import io
+import math
+import struct
+import unittest
+
+from wafer_map import wm_constants as wm_const
+from wafer_map import wm_stdf
+
+
+def record(typ, sub, fmt="", *fields, order="<"):
+    """Pack one STDF record. ``s`` fields are Cn strings."""
+    body = b""
+    for code, field in zip(fmt, fields):
+        if code == "s":
+            body += bytes([len(field)]) + field.encode()
+        else:
+            body += struct.pack(order + code, field)
+    return struct.pack(order + "HBB", len(body), typ, sub) + body
+
+
+def die(x, y, hard_bin, results, site=1, order="<"):
+    """Pack the PIR, PTRs, and PRR of one die."""
+    data = record(5, 10, "BB", 1, site, order=order)
+    for number, text, flags, result in results:
+        data += record(
+            15, 10, "IBBBBfs", number, 1, site, flags, 0, result, text, order=order
+        )
+    data += record(
+        5, 20, "BBBHHHhh", 1, site, 0, len(results), hard_bin, 1, x, y, order=order
+    )
+    return data
+
+
+def stdf(wafers, flat="D", pos_x="R", pos_y="D", order="<"):
+    """Pack a file with a WCR and ``{wafer id: [die]}``."""
+    data = record(0, 10, "BB", 2 if order == "<" else 1, 4, order=order)
+    data += record(
+        2,
+        30,
+        "fffBchhcc",
+        150.0,
+        0.5,
+        0.25,
+        2,
+        flat.encode(),
+        10,
+        20,
+        pos_x.encode(),
+        pos_y.encode(),
+        order=order,
+    )
+    # Records that aren't read, such as an MIR, are skipped.
+    data += record(1, 10, "IIs", 0, 0, "lot", order=order)
+    for wafer_id, dies in wafers.items():
+        data += record(2, 10, "BBIs", 1, 255, 0, wafer_id, order=order)
+        for item in dies:
+            data += die(*item, order=order)
+        data += record(
+            2, 20, "BBIIIIIIs", 1, 255, 0, 0, 0, 0, 0, 0, wafer_id, order=order
+        )
+    return data
+
+
+WAFERS = {
+    "W01": [
+        (10, 20, 1, [(100, "Vth", 0, 0.5), (200, "Idsat", 0, 2.0)]),
+        (11, 20, 2, [(100, "", 0, 0.75)]),
+        (12, 21, 1, [(100, "", 0x02, 9.0), (300, "", 0, 1.0)]),
+        # A retest of the first die.
+        (10, 20, 3, [(100, "", 0, 0.25)]),
+    ],
+    "W02": [(5, 6, 1, [(100, "", 0, 1.5)])],
+}
+
+
+class ReadStdf(unittest.TestCase):
+    def test_read(self):
+        wafers = list(wm_stdf.read_stdf(io.BytesIO(stdf(WAFERS)), block_size=16))
+        self.assertEqual([_w.wafer_id for _w in wafers], ["W01", "W02"])
+
+        wafer = wafers[0]
+        self.assertEqual(
+            list(wafer.parameters), ["hard_bin", "soft_bin", "Vth", "Idsat", "300"]
+        )
+        self.assertEqual(wafer.grid_x.tolist(), [11, 12, 10])
+        self.assertEqual(wafer.grid_y.tolist(), [20, 21, 20])
+        self.assertEqual(wafer.parameters["hard_bin"].tolist(), [2, 1, 3])
+        vth = wafer.parameters["Vth"]
+        self.assertEqual(vth[0], 0.75)
+        self.assertTrue(math.isnan(vth[1]))
+        self.assertEqual(vth[2], 0.25)
+        self.assertTrue(math.isnan(wafer.parameters["Idsat"][2]))
+        self.assertEqual(wafer.test_numbers["Idsat"], 200)
+        self.assertEqual(wafer.data_type("hard_bin"), wm_const.DataType.DISCRETE)
+        self.assertEqual(wafer.data_type("Vth"), wm_const.DataType.CONTINUOUS)
+
+        info = wafer.wafer_info()
+        self.assertEqual(info.dia, 1500)
+        self.assertEqual(info.die_size, (2.5, 5))
+        self.assertEqual(info.center_xy, (10, 20))
+        self.assertEqual(wafers[1].xyd("Vth"), [(5, 6, 1.5)])
+
+    def test_tests(self):
+        data = io.BytesIO(stdf(WAFERS))
+        wafer = next(wm_stdf.read_stdf(data, tests=["Idsat", 300]))
+        self.assertEqual(
+            list(wafer.parameters), ["hard_bin", "soft_bin", "Idsat", "300"]
+        )
+
+    def test_orientation(self):
+        wafers = {"W01": [(11, 20, 1, [])]}
+        data = io.BytesIO(stdf(wafers, flat="L", pos_y="U", order=">"))
+        wafer = next(wm_stdf.read_stdf(data))
+        # Mirrored to (11, -20), then rotated to bring the flat down.
+        self.assertEqual(wafer.xyd("hard_bin"), [(-20, -11, 1)])
+        self.assertEqual(wafer.metadata["center_xy"], (-20, -10))
+        self.assertEqual(wafer.metadata["die_size"], (5, 2.5))
+
+    def test_truncated(self):
+        data = stdf(WAFERS)
+        wafers = list(wm_stdf.read_stdf(io.BytesIO(data[:-40])))
+        self.assertEqual(len(wafers), 2)
+        self.assertEqual(wafers[1].wafer_id, "W02")
+        self.assertEqual(len(wafers[1].grid_x), 0)
+        with self.assertRaises(ValueError):
+            next(wm_stdf.read_stdf(io.BytesIO(b"not stdf")))
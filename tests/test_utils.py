@@ -3,6 +3,8 @@ Unittests for the :module:`wafer_map.utils` module.
 """
 import unittest
 
+import numpy as np
+
 from wafer_map import wm_utils as utils
 
 
@@ -19,3 +21,313 @@ class LinearGradient(unittest.TestCase):
         for _start, _end, _value, _expected in self.known_values:
             result = utils.linear_gradient(_start, _end, _value)
             self.assertEqual(result, _expected)
+
+
+class LinearGradientArray(unittest.TestCase):
+
+    colors = (
+        ((0, 0, 0), (255, 255, 255)),
+        ((255, 0, 0), (0, 255, 0)),
+        ((128, 0, 255, 255), (0, 255, 128, 255)),
+        ((10, 20, 30), (10, 20, 30)),
+    )
+
+    def test_matches_linear_gradient(self):
+        values = [-0.5, 0, 0.1, 0.25, 0.5, 0.75, 0.99, 1, 1.5]
+        for _start, _end in self.colors:
+            result = utils.linear_gradient_array(_start, _end, values)
+            expected = [
+                list(utils.linear_gradient(_start, _end, _v))[:3] for _v in values
+            ]
+            self.assertEqual(result.tolist(), expected)
+
+    def test_shape(self):
+        result = utils.linear_gradient_array((0, 0, 0), (255, 255, 255), [])
+        self.assertEqual(result.shape, (0, 3))
+
+
+class RescaleArray(unittest.TestCase):
+    def test_matches_rescale(self):
+        values = [-3, 0, 5, 27, 1.5]
+        for _orig, _new in (((10, 20), (0, 1)), ((0, 200), (0, 5)), ((3, 3), (0, 1))):
+            result = utils.rescale_array(values, _orig, _new)
+            expected = [utils.rescale(_v, _orig, _new) for _v in values]
+            self.assertEqual(result.tolist(), expected)
+
+
+class XydToArrays(unittest.TestCase):
+    def test_columns(self):
+        grid_x, grid_y, values = utils.xyd_to_arrays([(1, 2, 0.5), (3, 4, 1.5)])
+        self.assertEqual(grid_x.tolist(), [1, 3])
+        self.assertEqual(grid_y.tolist(), [2, 4])
+        self.assertEqual(values.tolist(), [0.5, 1.5])
+
+    def test_empty(self):
+        for item in utils.xyd_to_arrays([]):
+            self.assertEqual(item.size, 0)
+
+    def test_columnar_not_copied(self):
+        grid_x = np.array([1, 3])
+        grid_y = np.array([2, 4])
+        values = np.array([0.5, 1.5])
+        table = np.array(
+            [(1, 2, 0.5), (3, 4, 1.5)],
+            dtype=[("x", int), ("y", int), ("Vth", float)],
+        )
+        for xyd in [(grid_x, grid_y, values), table, np.array(table.tolist())]:
+            result = utils.xyd_to_arrays(xyd)
+            self.assertEqual(
+                [_a.tolist() for _a in result], [[1, 3], [2, 4], [0.5, 1.5]]
+            )
+        self.assertIs(utils.xyd_to_arrays((grid_x, grid_y, values))[2], values)
+        self.assertTrue(np.shares_memory(utils.xyd_to_arrays(table)[2], table))
+
+    def test_tuple_of_lists(self):
+        result = utils.xyd_to_arrays(([1, 2, 3], [4, 5, 6], [7, 8, 9]))
+        self.assertEqual(
+            [_a.tolist() for _a in result], [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+        )
+
+    def test_bad_columns(self):
+        with self.assertRaises(ValueError):
+            utils.xyd_to_arrays(np.zeros((2, 4)))
+        with self.assertRaises(ValueError):
+            utils.xyd_to_arrays((np.arange(2), np.arange(2), np.arange(3)))
+        with self.assertRaises(ValueError):
+            utils.xyd_to_arrays(([1, 2], [3, 4], 5))
+
+
+class RasterizeDie(unittest.TestCase):
+    def test_known_values(self):
+        colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+        image, origin = utils.rasterize_die([2, 3, 2], [5, 5, 6], colors)
+        self.assertEqual(origin, (2, 5))
+        self.assertEqual(image.shape, (2, 2, 4))
+        self.assertEqual(image[0, 0].tolist(), [255, 0, 0, 255])
+        self.assertEqual(image[0, 1].tolist(), [0, 255, 0, 255])
+        self.assertEqual(image[1, 0].tolist(), [0, 0, 255, 255])
+        # No die at grid (3, 6), so it's transparent.
+        self.assertEqual(image[1, 1].tolist(), [0, 0, 0, 0])
+
+    def test_paint_hole(self):
+        colors = [(255, 0, 0), (0, 0, 255)]
+        image, origin = utils.rasterize_die([0, 2], [0, 0], colors, (0, 0, 3, 0))
+        self.assertEqual(image[0, :, 3].tolist(), [255, 0, 255, 0])
+        utils.paint_die(image, origin, [1, 3], [0, 0], [(0, 255, 0), (9, 9, 9)])
+        self.assertEqual(image[0, :, 3].tolist(), [255, 255, 255, 255])
+        self.assertEqual(image[0, 1].tolist(), [0, 255, 0, 255])
+
+
+class Palettize(unittest.TestCase):
+    def test_round_trip(self):
+        colors = [(9, 9, 9), (1, 2, 3), (9, 9, 9), (255, 0, 128)]
+        palette, index = utils.palettize(colors)
+        self.assertEqual(len(palette), 3)
+        self.assertEqual(palette[index].tolist(), [list(_c) for _c in colors])
+
+
+class GridIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = utils.GridIndex([2, 3, 2, -1], [5, 5, 6, 7])
+
+    def test_lookup(self):
+        self.assertEqual(self.index.lookup(2, 5), 0)
+        self.assertEqual(self.index.lookup(3, 5), 1)
+        self.assertEqual(self.index.lookup(2, 6), 2)
+        self.assertEqual(self.index.lookup(-1, 7), 3)
+
+    def test_lookup_missing(self):
+        self.assertEqual(self.index.lookup(3, 6), -1)
+        self.assertEqual(self.index.lookup(100, 5), -1)
+        self.assertEqual(self.index.lookup(2, -100), -1)
+
+    def test_lookup_array(self):
+        result = self.index.lookup_array([2, 3, 3, 50], [6, 5, 6, 5])
+        self.assertEqual(result.tolist(), [2, 1, -1, -1])
+
+    def test_lookup_mesh(self):
+        result = self.index.lookup_mesh([2, 3, 50], [5, 6])
+        self.assertEqual(result.tolist(), [[0, 1, -1], [2, -1, -1]])
+
+    def test_mask(self):
+        self.assertEqual(self.index.mask.sum(), 4)
+
+    def test_query_box(self):
+        self.assertEqual(sorted(self.index.query_box(3, 6, 2, 5).tolist()), [0, 1, 2])
+        self.assertEqual(self.index.query_box(-5, 7, 0, 100).tolist(), [3])
+        self.assertEqual(self.index.query_box(10, 10, 20, 20).tolist(), [])
+
+    def test_empty(self):
+        self.assertEqual(utils.GridIndex([], []).lookup(0, 0), -1)
+
+
+class PointIndex(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        x = rng.uniform(-75, 75, 2000)
+        y = rng.normal(scale=20, size=2000)
+        index = utils.PointIndex(x, y)
+        for qx, qy in rng.uniform(-100, 100, (50, 2)):
+            dist = (x - qx) ** 2 + (y - qy) ** 2
+            self.assertEqual(index.nearest(qx, qy), dist.argmin())
+            expected = dist.argmin() if dist.min() <= 4 else -1
+            self.assertEqual(index.nearest(qx, qy, max_distance=2), expected)
+
+    def test_line(self):
+        index = utils.PointIndex(np.linspace(0, 100, 1001), np.zeros(1001))
+        self.assertEqual(index.nearest(50.04, 3), 500)
+
+    def test_query_box(self):
+        rng = np.random.default_rng(1)
+        x, y = rng.uniform(-75, 75, (2, 2000))
+        index = utils.PointIndex(x, y)
+        for x0, y0, x1, y1 in rng.uniform(-100, 100, (20, 4)):
+            inside = (
+                (x >= min(x0, x1))
+                & (x <= max(x0, x1))
+                & (y >= min(y0, y1))
+                & (y <= max(y0, y1))
+            )
+            result = index.query_box(x0, y0, x1, y1)
+            self.assertEqual(result.tolist(), np.flatnonzero(inside).tolist())
+
+    def test_empty(self):
+        self.assertEqual(utils.PointIndex([], []).nearest(0, 0), -1)
+        self.assertEqual(utils.PointIndex([], []).query_box(0, 0, 1, 1).size, 0)
+
+
+class SummaryStats(unittest.TestCase):
+    def test_matches_numpy(self):
+        rng = np.random.default_rng(2)
+        for size in (2, 7, 1000):
+            values = rng.normal(size=size)
+            values[::5] = np.nan
+            valid = values[~np.isnan(values)]
+            stats = utils.summary_stats(values, (0, 2, 50, 98, 100))
+            expected = np.percentile(valid, (0, 2, 50, 98, 100))
+            np.testing.assert_allclose(stats.percentiles, expected)
+            self.assertEqual((stats.min, stats.max), (valid.min(), valid.max()))
+            self.assertEqual(stats.count, valid.size)
+            self.assertEqual(stats.nan_count, size - valid.size)
+
+    def test_input_unchanged(self):
+        values = np.array([3.0, 1.0, 2.0])
+        utils.summary_stats(values)
+        self.assertEqual(values.tolist(), [3.0, 1.0, 2.0])
+
+    def test_all_nan(self):
+        stats = utils.summary_stats([np.nan, np.nan])
+        self.assertTrue(np.isnan(stats.percentiles).all())
+        self.assertEqual((stats.count, stats.nan_count), (0, 2))
+
+
+class GridlineSegments(unittest.TestCase):
+    def test_die_edges(self):
+        segments = utils.gridline_segments((5, 4), (10.5, 20.25), 50)
+        vert = segments[segments[:, 0] == segments[:, 2]]
+        horiz = segments[segments[:, 1] == segments[:, 3]]
+        self.assertEqual(len(vert) + len(horiz), len(segments))
+
+        # Every vertical line is on the left edge of some die.
+        left_edges = [
+            utils.grid_to_rect_coord((x, 0), (5, 4), (10.5, 20.25))[0]
+            for x in range(-20, 40)
+        ]
+        for x in vert[:, 0]:
+            self.assertTrue(any(abs(x - _e) < 1e-9 for _e in left_edges))
+        self.assertTrue((abs(vert[:, 0]) < 50 / 2 * 1.05).all())
+        self.assertTrue((abs(horiz[:, 1]) < 50 / 2 * 1.05).all())
+
+    def test_period(self):
+        die = utils.gridline_segments((5, 5), (0, 0), 100)
+        reticle = utils.gridline_segments((5, 5), (0, 0), 100, (3, 2), (1, 1))
+        self.assertTrue(set(map(tuple, reticle)) <= set(map(tuple, die)))
+        # Left edge of grid column 1 is at x=2.5, top edge of row 1 is -2.5
+        self.assertIn(2.5, reticle[:, 0])
+        self.assertIn(2.5 + 15, reticle[:, 0])
+        self.assertNotIn(2.5 + 5, reticle[:, 0])
+        self.assertIn(-2.5, reticle[:, 1])
+        self.assertIn(-2.5 - 10, reticle[:, 1])
+
+    def test_cached(self):
+        first = utils.gridline_segments([5, 5], (0, 0), 100)
+        second = utils.gridline_segments((5.0, 5.0), [0, 0], 100.0)
+        self.assertIs(first, second)
+        self.assertFalse(first.flags.writeable)
+
+
+class WaferOutline(unittest.TestCase):
+    def test_cached(self):
+        first = utils.wafer_outline(150, 5, None, 57.5)
+        second = utils.wafer_outline(150.0, 5, 5, 57.5)
+        self.assertIs(first, second)
+
+    def test_flat(self):
+        outline = utils.wafer_outline(150, 5, 5, 57.5)
+        self.assertTrue(outline.has_flat)
+        self.assertEqual(outline.excl_rad, 70)
+        (x0, y0), (x1, y1) = outline.edge_mark
+        self.assertAlmostEqual(x1 - x0, 57.5)
+        self.assertAlmostEqual(x0**2 + y0**2, 75**2)
+        # The exclusion flat is 5mm above the wafer flat.
+        self.assertAlmostEqual(outline.excl_mark[0][1], y0 + 5)
+
+    def test_flat_excl_misses_edge_excl(self):
+        outline = utils.wafer_outline(150, 10, 1, 57.5)
+        self.assertIsNone(outline.excl_arc)
+        self.assertIsNone(outline.excl_mark)
+
+    def test_notch(self):
+        outline = utils.wafer_outline(200, 3)
+        self.assertFalse(outline.has_flat)
+        self.assertEqual(len(outline.edge_mark), 3)
+        self.assertEqual(outline.edge_mark[1], (0, -95))
+
+
+class ValuesChanged(unittest.TestCase):
+    def test_nan_is_unchanged(self):
+        nan = float("nan")
+        result = utils.values_changed([1, nan, nan, 3], [1, nan, 2, 4])
+        self.assertEqual(result.tolist(), [False, False, True, True])
+
+    def test_strings(self):
+        result = utils.values_changed(["a", "b"], ["a", "c"])
+        self.assertEqual(result.tolist(), [False, True])
+
+
+class GridIndexGrowth(unittest.TestCase):
+    def test_add(self):
+        index = utils.GridIndex([], [])
+        for position, (x, y) in enumerate([(0, 0), (5, -3), (-2, 7), (1, 1)]):
+            index.add([x], [y], [position])
+        self.assertEqual(index.lookup(5, -3), 1)
+        self.assertEqual(index.lookup(-2, 7), 2)
+        self.assertEqual(index.lookup(1, 1), 3)
+        self.assertEqual(index.lookup(1, 0), -1)
+        self.assertEqual(index.mask.sum(), 4)
+
+    def test_reserve_has_headroom(self):
+        index = utils.GridIndex([0, 9], [0, 9])
+        index.reserve(0, 0, 10, 9)
+        self.assertEqual(index.extent, (0, 0, 14, 9))
+        self.assertEqual(index.lookup(9, 9), 1)
+
+
+class GrowableArray(unittest.TestCase):
+    def test_extend(self):
+        array = utils.GrowableArray(np.array([1, 2]))
+        for value in range(3, 40):
+            array.extend([value])
+        self.assertEqual(array.data.tolist(), list(range(1, 40)))
+        self.assertEqual(len(array), 39)
+
+    def test_promote(self):
+        array = utils.GrowableArray(np.array([1, 2]))
+        array.extend([2.5])
+        self.assertEqual(array.data.tolist(), [1, 2, 2.5])
+
+    def test_does_not_modify_input(self):
+        data = np.array([1, 2, 3])
+        array = utils.GrowableArray(data)
+        array.extend([4])
+        self.assertEqual(data.tolist(), [1, 2, 3])